@@ -1,4 +1,8 @@
-import chromadb, re, os, json
+import re, os, json
+
+from sn_server import connect_collection
+from sn_record import prompt_from_meta
+from sn_embed import openai_embed, collection_name, check_collection, OPENAI_EMBED_DIM
 
 from openai import OpenAI
 import openai
@@ -29,17 +33,19 @@ def generate_with_openai(new_passage, template_questions, n_questions=5):
     return [line.strip(" -") for line in text.splitlines() if line.strip()]
 
 
-DB = "./sn_csat.db"; COL = "sn_csat_openai"
 EMBED_MODEL = os.environ.get("OPENAI_EMBED_MODEL", "text-embedding-3-large")
+EMBED_DIM = OPENAI_EMBED_DIM   # 구축 시와 같은 Matryoshka 차원을 사용해야 함
+DB = "./sn_csat.db"; COL = collection_name("sn_csat_openai", EMBED_DIM)
 TOP_K = 50                  # HNSW 1차 후보 (더 많은 후보 검색)
 GROUP_PICK = 2              # 지문 2개 선택
 
 
 cli = OpenAI()
-col = chromadb.PersistentClient(path=DB).get_collection(COL)
+col = connect_collection(DB, COL)   # 검색 서버 우선, 없으면 SN_INDEX_BACKEND 로 직접
+check_collection(col, EMBED_MODEL, EMBED_DIM)
 
 def embed(text):
-    return cli.embeddings.create(model=EMBED_MODEL, input=text).data[0].embedding
+    return openai_embed(cli, [text], EMBED_MODEL, EMBED_DIM)[0].tolist()
 
 def extract_group(doc_id: str):
     # 예: 23_11_37_2  →  23_11_37
@@ -186,7 +192,7 @@ for g in uniq_groups:
         all_sets.append({"meta": meta, "doc": doc})
 
  # — 검증 단계: 추출된 원본 문제 세트 확인 —
-old_questions = [s["meta"].get("question") for s in all_sets if s["meta"].get("question")]
+old_questions = [q for q in (prompt_from_meta(s["meta"]) for s in all_sets) if q]
 print("\n>>> 추출된 원본 문제 세트:")
 for idx, q in enumerate(old_questions, 1):
     print(f"{idx}. {q}")
@@ -1,26 +1,30 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
 import threading
-import chromadb
 import re
 import os
 import json
-from openai import OpenAI
 import subprocess
+from sn_server import connect_collection
+from sn_record import prompt_from_meta
+from sn_embed import (QueryCache, cached_query, openai_embed, collection_name,
+                      check_collection, OPENAI_EMBED_DIM)
 
 # 상수 정의
 DB = "./sn_csat.db"
-COL = "sn_csat_openai"
 EMBED_MODEL = os.environ.get("OPENAI_EMBED_MODEL", "text-embedding-3-large")
+EMBED_DIM = OPENAI_EMBED_DIM   # 구축 시와 같은 Matryoshka 차원을 사용해야 함
+COL = collection_name("sn_csat_openai", EMBED_DIM)
 TOP_K = 50
 GROUP_PICK = 2
 
 # 전역 변수
 cli = None
 col = None
+query_cache = QueryCache()   # 지문 해시 → 쿼리 벡터·검색 결과
 
 def embed(text):
-    return cli.embeddings.create(model=EMBED_MODEL, input=text).data[0].embedding
+    return openai_embed(cli, [text], EMBED_MODEL, EMBED_DIM)[0].tolist()
 
 def extract_group(doc_id: str):
     m = re.match(r"(\d{2}_\d{2}_\d{2})_", doc_id)
@@ -61,6 +65,8 @@ class SearchExpandGUI:
         self.api_key = tk.StringVar(value=os.environ.get("OPENAI_API_KEY", ""))
         
         self.setup_ui()
+        # 유형 필터만 바꾸면 캐시된 결과를 재정렬 (재임베딩·재검색 없음)
+        self.selected_type.trace_add("write", self.rerank_cached)
         
     def setup_ui(self):
         # 메인 프레임
@@ -199,12 +205,15 @@ class SearchExpandGUI:
             
         global cli, col
         try:
+            from openai import OpenAI   # 창을 띄운 뒤 키 설정 시점에 로드
             cli = OpenAI(api_key=key)
             # 연결 테스트
             cli.models.list()
             
-            # ChromaDB 컬렉션 초기화
-            col = chromadb.PersistentClient(path=DB).get_collection(COL)
+            # 벡터 컬렉션 초기화 (검색 서버가 있으면 원격, 없으면 SN_INDEX_BACKEND 로 직접)
+            col = connect_collection(DB, COL)
+            check_collection(col, EMBED_MODEL, EMBED_DIM)
+            query_cache.clear()
             
             messagebox.showinfo("성공", "API 키가 설정되었습니다.")
         except Exception as e:
@@ -287,32 +296,10 @@ class SearchExpandGUI:
         self.root.update()
         
         try:
-            # 임베딩 생성
-            q_vec = embed(self.query_text)
-            
-            # 유사 지문 검색
-            hits = col.query(query_embeddings=[q_vec], n_results=TOP_K)
-            ids = hits["ids"][0]
-            metas = hits["metadatas"][0]
-            distances = hits["distances"][0]
-            
-            # 선택된 유형 필터링
-            type_filter = self.selected_type.get()
-            if type_filter != "전체":
-                candidates = [(doc_id, meta, dist) for doc_id, meta, dist in zip(ids, metas, distances)
-                            if meta.get("type") == type_filter]
-            else:
-                candidates = list(zip(ids, metas, distances))
-                
-            # 유사도 계산 및 정렬
-            candidates_sim = [(doc_id, meta, dist, 1 - dist) for doc_id, meta, dist in candidates]
-            self.candidates_sorted = sorted(candidates_sim, key=lambda x: x[3], reverse=True)[:8]
-            
-            # 결과 표시
-            self.result_listbox.delete(0, tk.END)
-            for idx, (_id, meta, dist, sim) in enumerate(self.candidates_sorted):
-                display_text = f"{idx+1}. ID: {_id}, 유형: {meta.get('type')}, 유사도: {sim:.4f}"
-                self.result_listbox.insert(tk.END, display_text)
+            # 임베딩 + 유사 지문 검색 (같은 지문이면 캐시된 벡터·결과 재사용)
+            _, hits = cached_query(query_cache, col, self.query_text, embed, TOP_K,
+                                   EMBED_MODEL, EMBED_DIM)
+            self.show_candidates(hits)
                 
         except Exception as e:
             messagebox.showerror("오류", f"검색 중 오류가 발생했습니다: {str(e)}")
@@ -320,6 +307,42 @@ class SearchExpandGUI:
         finally:
             self.root.config(cursor="")
             
+    def show_candidates(self, hits):
+        """col.query 원결과를 현재 유형 필터로 걸러 표시 (임베딩·DB 호출 없음)"""
+        ids = hits["ids"][0]
+        metas = hits["metadatas"][0]
+        distances = hits["distances"][0]
+        
+        # 선택된 유형 필터링
+        type_filter = self.selected_type.get()
+        if type_filter != "전체":
+            candidates = [(doc_id, meta, dist) for doc_id, meta, dist in zip(ids, metas, distances)
+                        if meta.get("type") == type_filter]
+        else:
+            candidates = list(zip(ids, metas, distances))
+            
+        # 유사도 계산 및 정렬
+        candidates_sim = [(doc_id, meta, dist, 1 - dist) for doc_id, meta, dist in candidates]
+        self.candidates_sorted = sorted(candidates_sim, key=lambda x: x[3], reverse=True)[:8]
+        
+        # 결과 표시
+        self.result_listbox.delete(0, tk.END)
+        for idx, (_id, meta, dist, sim) in enumerate(self.candidates_sorted):
+            display_text = f"{idx+1}. ID: {_id}, 유형: {meta.get('type')}, 유사도: {sim:.4f}"
+            self.result_listbox.insert(tk.END, display_text)
+
+    def rerank_cached(self, *_):
+        """유형 필터 변경 시 캐시에 있는 검색 결과만 다시 정렬"""
+        if not col or not self.query_text:
+            return
+        text = self.text_input.get(1.0, tk.END).strip()
+        if text != self.query_text:
+            return
+        _, hits = cached_query(query_cache, col, text, embed, TOP_K,
+                               EMBED_MODEL, EMBED_DIM, compute=False)
+        if hits is not None:
+            self.show_candidates(hits)
+            
     def on_select(self, event):
         selected_indices = self.result_listbox.curselection()
         if not selected_indices:
@@ -367,7 +390,7 @@ class SearchExpandGUI:
                     all_sets.append({"meta": meta, "doc": doc})
                     
             # 원본 문제 추출
-            old_questions = [s["meta"].get("question") for s in all_sets if s["meta"].get("question")]
+            old_questions = [q for q in (prompt_from_meta(s["meta"]) for s in all_sets) if q]
             
             if not old_questions:
                 messagebox.showwarning("경고", "선택된 지문에서 문제를 찾을 수 없습니다.")
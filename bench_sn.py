@@ -0,0 +1,601 @@
+#!/usr/bin/env python3
+"""
+검색/구축 경로 벤치마크 스크립트
+- index : Chroma vs NumPy(flat / IVF-PQ) 시작 시간·쿼리 지연·recall 비교
+- quant : float32 / float16 / int8 저장 형식별 RAM·디스크 크기와 recall
+- dims  : text-embedding-3 Matryoshka 차원별 쿼리 지연·저장 크기·recall
+- startup : 엔트리포인트별 -X importtime 시작 비용과 예산(회귀 검사, 초과 시 exit 1)
+- pos   : 지문 품사 분석 순차(pos_set) vs 배치(pos_sets_batch) 시간과 결과 일치 여부
+- novelty : max_sem_sim 정확 계산 vs HNSW 근사(ef별) 시간·정확도 (합성 벡터)
+- neardup : 지문 MinHash/LSH 근사 중복 통합 수와, 추출 잡음을 넣은 사본의 재검출률
+- chunks : 청크 평균 인덱스 vs 청크 단위 인덱스(max / top‑m 집계) 크기·쿼리 지연·부분 지문 적중률
+- chunker : 정규식 vs Kiwi 문장 청크 분할 속도·청크 통계, --model 지정 시 모델 토크나이저 예산 분할,
+            max_seq_length 잘림 비율과 부분 지문 검색 적중률
+
+사용 예:
+    python bench_sn.py index --db ./sn_csat_2.db --col sn_csat_openai --json bench_index.json
+    python bench_sn.py quant --db ./sn_csat_2.db --col sn_csat_openai
+    python bench_sn.py dims --db ./sn_csat.db --col sn_csat_openai --dims 256 512 1024 3072
+    python bench_sn.py startup
+    KIWI_WORKERS=4 python bench_sn.py pos --src ./db
+    python bench_sn.py novelty -n 100000 --dim 1024 --ef 16 64 256
+    python bench_sn.py neardup --src ./db --threshold 0.8
+    python bench_sn.py chunks --db ./sn_csat_2.db --col sn_csat_openai   # sn_build.py --chunk-index 로 구축 후
+    python bench_sn.py chunker --src ./db --max-tok 256 --overlap 0 32 --model nlpai-lab/KURE-v1
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import subprocess
+from typing import Dict, List
+
+import numpy as np
+
+import sn_index
+import sn_embed
+import sn_text
+
+
+# 엔트리포인트별 시작 경로: (인터프리터 인자, import 예산 ms, 시작 시 로드되면 안 되는 모듈)
+STARTUP_ENTRIES = {
+    "sn_processor_search": (["sn_processor.py", "search"], 150,
+                            ("PyPDF2", "pdfplumber", "chromadb", "numpy")),
+    "sn_processor_split": (["sn_processor.py", "split"], 150,
+                           ("PyPDF2", "pdfplumber", "chromadb", "numpy")),
+    "apiembed_gui": (["-c", "import apiembed_generation_gui"], 400,
+                     ("chromadb", "openai")),
+    "localembed_gui": (["-c", "import localembed_generation_gui"], 400,
+                       ("chromadb", "openai", "sentence_transformers", "torch")),
+    "sn_index": (["-c", "import sn_index"], 250, ("chromadb",)),
+    "sn_server_client": (["-c", "import sn_server"], 150,
+                         ("chromadb", "openai", "sentence_transformers", "torch", "asyncio",
+                          "numpy")),
+    "sn_build": (["-c", "import sn_build"], 300,
+                 ("chromadb", "openai", "sentence_transformers", "tiktoken", "kiwipiepy")),
+}
+
+
+def percentiles(times: List[float]) -> Dict:
+    """지연 시간 목록(초) → p50/p99/mean (ms)"""
+    arr = np.asarray(times) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+    }
+
+
+def recall_at_k(truth: List[List[str]], got: List[List[str]], k: int) -> float:
+    """정답 top-k 대비 검색 결과 top-k 교집합 비율 평균"""
+    hits = [len(set(t[:k]) & set(g[:k])) / max(1, len(t[:k])) for t, g in zip(truth, got)]
+    return round(float(np.mean(hits)), 4) if hits else 0.0
+
+
+def sample_queries(vecs: np.ndarray, n: int, noise: float = 0.01, seed: int = 0) -> np.ndarray:
+    """저장된 벡터에 작은 잡음을 더해 쿼리 집합 생성"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vecs), min(n, len(vecs)), replace=False)
+    qs = np.asarray(vecs[np.sort(rows)], dtype=np.float32)
+    qs = qs + noise * rng.standard_normal(qs.shape).astype(np.float32)
+    return sn_index.normalize(qs)
+
+
+def time_queries(col, queries: np.ndarray, k: int):
+    """쿼리별 지연 시간과 결과 ID 목록"""
+    times, ids = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        res = col.query(query_embeddings=[q.tolist()], n_results=k)
+        times.append(time.perf_counter() - t0)
+        ids.append(res["ids"][0])
+    return times, ids
+
+
+def cold_start(db_path: str, name: str, backend: str, query_file: str, mode: str = "") -> Dict:
+    """새 프로세스에서 import → 컬렉션 오픈 → 첫 쿼리까지 걸린 시간"""
+    code = (
+        "import time; t0 = time.perf_counter()\n"
+        "import numpy as np, sn_index\n"
+        f"col = sn_index.open_collection({db_path!r}, {name!r}, backend={backend!r})\n"
+        f"if {mode!r}: col.mode = {mode!r}\n"
+        "t1 = time.perf_counter()\n"
+        f"col.query(query_embeddings=[np.load({query_file!r}).tolist()], n_results=8)\n"
+        "t2 = time.perf_counter()\n"
+        "print(t1 - t0, t2 - t1)\n"
+    )
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall = time.perf_counter() - t0
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1:]}
+    open_s, first_q = (float(x) for x in out.stdout.split())
+    return {"process_wall_ms": round(wall * 1000, 1),
+            "import_open_ms": round(open_s * 1000, 1),
+            "first_query_ms": round(first_q * 1000, 1)}
+
+
+def bench_index(args) -> Dict:
+    np_path = args.np_db or tempfile.mkdtemp(prefix="sn_npidx_")
+    np_col = sn_index.convert_from_chroma(args.db, args.col, np_path)
+    chroma_col = sn_index.open_collection(args.db, args.col, backend="chroma")
+    vecs = np.asarray(np_col._vecs)
+    queries = sample_queries(vecs, args.queries)
+    qfile = os.path.join(np_path, "bench_query.npy")
+    np.save(qfile, queries[0])
+
+    np_col.mode = "flat"
+    flat_t, truth = time_queries(np_col, queries, args.k)
+    chroma_t, chroma_ids = time_queries(chroma_col, queries, args.k)
+    np_col.mode = "ivfpq"
+    t0 = time.perf_counter()
+    np_col.build_index()
+    ivf_build = time.perf_counter() - t0
+    ivf_t, ivf_ids = time_queries(np_col, queries, args.k)
+
+    return {
+        "items": len(vecs), "dim": int(vecs.shape[1]), "queries": len(queries), "k": args.k,
+        "chroma": {"startup": cold_start(args.db, args.col, "chroma", qfile),
+                   "query": percentiles(chroma_t),
+                   f"recall@{args.k}": recall_at_k(truth, chroma_ids, args.k)},
+        "numpy_flat": {"startup": cold_start(np_path, args.col, "numpy", qfile, "flat"),
+                       "query": percentiles(flat_t),
+                       f"recall@{args.k}": 1.0},
+        "numpy_ivfpq": {"startup": cold_start(np_path, args.col, "numpy", qfile, "ivfpq"),
+                        "build_s": round(ivf_build, 3),
+                        "query": percentiles(ivf_t),
+                        f"recall@{args.k}": recall_at_k(truth, ivf_ids, args.k)},
+    }
+
+
+def bench_quant(args) -> Dict:
+    work = tempfile.mkdtemp(prefix="sn_quant_")
+    src = sn_index.convert_from_chroma(args.db, args.col, os.path.join(work, "src"))
+    vecs = np.asarray(src._vecs)
+    ids = list(src._ids)
+    queries = sample_queries(vecs, args.queries)
+
+    result = {"items": len(vecs), "dim": int(vecs.shape[1]), "k": args.k}
+    truth, base = None, None
+    for dtype, keep_full in (("float32", True), ("float16", True), ("int8", True),
+                             ("float16", False), ("int8", False)):
+        label = dtype if keep_full else f"{dtype}_nofull"
+        client = sn_index.NumpyClient(os.path.join(work, label), mode="flat",
+                                      dtype=dtype, keep_full=keep_full)
+        client.get_or_create_collection(args.col).add(ids=ids, embeddings=vecs)
+        col = client.get_collection(args.col)
+        times, got = time_queries(col, queries, args.k)
+        size = col.nbytes()
+        if truth is None:
+            truth, base = got, size
+        result[label] = {
+            "ram_bytes": size["ram"], "disk_bytes": size["disk"],
+            "ram_ratio": round(size["ram"] / base["ram"], 3),
+            "disk_ratio": round(size["disk"] / base["disk"], 3),
+            "query": percentiles(times),
+            f"recall@{args.k}": recall_at_k(truth, got, args.k),
+        }
+    return result
+
+
+def bench_dims(args) -> Dict:
+    """
+    전체 차원(3072)으로 구축된 컬렉션 벡터를 앞쪽 d차원으로 절단·재정규화해
+    dimensions=d 로 구축한 것과 같은 인덱스를 만들고 전체 차원 결과와 비교한다.
+    --live N 이면 OpenAI API 임베딩 지연도 차원별로 측정한다.
+    """
+    work = tempfile.mkdtemp(prefix="sn_dims_")
+    src = sn_index.convert_from_chroma(args.db, args.col, os.path.join(work, "src"))
+    full = np.asarray(src._vecs)
+    ids = list(src._ids)
+    queries = sample_queries(full, args.queries)
+    docs = [d for d in src._docs if d][:args.live]
+    openai_client = None
+    if docs:
+        from openai import OpenAI
+        openai_client = OpenAI(timeout=60)
+
+    result = {"items": len(full), "native_dim": int(full.shape[1]), "k": args.k}
+    truth = None
+    for dim in sorted(args.dims, reverse=True):
+        vecs = sn_embed.truncate_normalize(full, dim)
+        client = sn_index.NumpyClient(os.path.join(work, f"d{dim}"), mode="flat")
+        client.get_or_create_collection(args.col).add(ids=ids, embeddings=vecs)
+        col = client.get_collection(args.col)
+        times, got = time_queries(col, sn_embed.truncate_normalize(queries, dim), args.k)
+        if truth is None:
+            truth = got
+        entry = {"storage_bytes": col.nbytes()["disk"],
+                 "query": percentiles(times),
+                 f"recall@{args.k}": recall_at_k(truth, got, args.k)}
+        if openai_client is not None:
+            model_dim = None if dim == full.shape[1] else dim
+            t = []
+            for doc in docs:
+                t0 = time.perf_counter()
+                sn_embed.openai_embed(openai_client, [doc], sn_embed.OPENAI_EMBED_MODEL, model_dim)
+                t.append(time.perf_counter() - t0)
+            entry["embed_api"] = percentiles(t)
+        result[f"d{dim}"] = entry
+    return result
+
+
+def parse_importtime(stderr: str):
+    """-X importtime 출력 → (최상위 누적 합 µs, {모듈: 누적 µs}, 최상위 모듈 목록)"""
+    total, mods, top = 0, {}, []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue    # 헤더 줄
+        cum, name = int(parts[1]), parts[2]
+        mod = name.strip()
+        mods[mod] = cum
+        if len(name) - len(name.lstrip()) == 1:    # 들여쓰기 1칸 = 최상위 import
+            total += cum
+            top.append(mod)
+    return total, mods, top
+
+
+def bench_startup(args) -> Dict:
+    here = os.path.dirname(os.path.abspath(__file__))
+    result, ok = {}, True
+    for name, (argv, budget_ms, forbidden) in STARTUP_ENTRIES.items():
+        if args.only and name not in args.only:
+            continue
+        runs = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            out = subprocess.run([sys.executable, "-X", "importtime", *argv],
+                                 capture_output=True, text=True, cwd=here)
+            wall = time.perf_counter() - t0
+            total, mods, top = parse_importtime(out.stderr)
+            runs.append((total, wall, mods, top, out.returncode))
+        total, wall, mods, top, code = min(runs, key=lambda r: r[0])
+        budget = budget_ms * args.budget_scale
+        loaded = sorted(m for m in forbidden if m in mods)
+        entry_mod = argv[1].split()[-1] if argv[0] == "-c" else None
+        heavy = sorted((m for m in mods if m != entry_mod and "." not in m),
+                       key=lambda m: -mods[m])[:5]
+        entry_ok = code == 0 and total / 1000 <= budget and not loaded
+        ok = ok and entry_ok
+        result[name] = {
+            "import_ms": round(total / 1000, 1),
+            "process_wall_ms": round(wall * 1000, 1),
+            "budget_ms": budget,
+            "forbidden_loaded": loaded,
+            "heaviest": {m: round(mods[m] / 1000, 1) for m in heavy},
+            "ok": entry_ok,
+        }
+    result["ok"] = ok
+    return result
+
+
+def bench_pos(args) -> Dict:
+    """db/*.json 지문으로 순차 vs 배치 품사 분석 비교 (결과가 다르면 ok=False)"""
+    import glob
+    texts, keys = [], []
+    for fp in sorted(glob.glob(os.path.join(args.src, "*.json")))[:args.limit or None]:
+        with open(fp, encoding="utf-8") as f:
+            item = json.load(f)
+        texts.append(item.get("passage") or item.get("context_box") or "")
+        keys.append(sn_text.passage_hash(item))
+
+    sn_text.get_kiwi()    # 모델 로드 시간은 제외
+    t0 = time.perf_counter()
+    serial = [sn_text.pos_set(t) if t.strip() else set() for t in texts]
+    t_serial = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    batch = sn_text.pos_sets_batch(texts, keys)
+    t_batch = time.perf_counter() - t0
+
+    return {
+        "items": len(texts),
+        "unique_passages": len(set(keys)),
+        "kiwi_workers": sn_text.KIWI_WORKERS,
+        "serial_s": round(t_serial, 3),
+        "batch_s": round(t_batch, 3),
+        "speedup": round(t_serial / t_batch, 2) if t_batch else None,
+        "ok": serial == batch,
+    }
+
+
+def bench_novelty(args) -> Dict:
+    """군집형 합성 벡터로 exact / ANN(ef별) max_sem_sim 비교 (ANN 값은 전체 항목을 정확 값과 대조)"""
+    import sn_build
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(args.n // 200, 1), args.dim))
+    vecs = centers[rng.integers(0, len(centers), args.n)]
+    vecs = (vecs + 0.5 * rng.standard_normal(vecs.shape)).astype(np.float32)
+    groups = [f"g{i // 4}" for i in range(args.n)]     # 지문 1개당 4문항
+    tags = {g: {"NNG"} for g in set(groups)}
+
+    def run(scorer):
+        out = []
+        t0 = time.perf_counter()
+        for s in range(0, args.n, args.batch):
+            out += scorer.score(vecs[s:s + args.batch], groups[s:s + args.batch], tags)[0]
+        return np.asarray(out), time.perf_counter() - t0
+
+    exact, t_exact = run(sn_build.NoveltyScorer())
+    result = {"items": args.n, "dim": args.dim, "exact_s": round(t_exact, 2)}
+    for ef in args.ef:
+        approx, t_ann = run(sn_build.AnnNoveltyScorer(ef=ef, check=0))
+        err = np.abs(exact - approx)
+        result[f"ef{ef}"] = {
+            "time_s": round(t_ann, 2),
+            "speedup": round(t_exact / t_ann, 2),
+            "match_4dp": round(float(np.mean(np.round(exact, 4) == np.round(approx, 4))), 4),
+            "mean_abs_err": round(float(err.mean()), 6),
+            "max_abs_err": round(float(err.max()), 6),
+        }
+    return result
+
+
+def bench_neardup(args) -> Dict:
+    """
+    db/*.json 지문 → 근사 중복으로 합쳐진 그룹 수, 그리고 각 지문에 PDF 추출 잡음
+    (줄바꿈·하이픈 줄바꿈·쪽 머리말)을 넣은 사본이 원본 그룹으로 다시 묶이는 비율
+    """
+    import glob
+    import random
+    texts = {}
+    for fp in sorted(glob.glob(os.path.join(args.src, "*.json"))):
+        with open(fp, encoding="utf-8") as f:
+            item = json.load(f)
+        texts.setdefault(sn_text.passage_hash(item),
+                         item.get("passage") or item.get("context_box") or "")
+
+    index = sn_text.NearDupIndex(args.threshold)
+    t0 = time.perf_counter()
+    canon = {k: index.canonical(k, t) for k, t in texts.items()}
+    t_index = time.perf_counter() - t0
+    merged = index.merged()
+
+    rnd = random.Random(0)
+    hits, total = 0, 0
+    for k, text in texts.items():
+        if len(text) < 200:
+            continue
+        chars = list(text)
+        for _ in range(len(chars) // 80):
+            i = rnd.randrange(len(chars))
+            chars[i] += rnd.choice(["\n", "-\n", " "])
+        noisy = "대학수학능력시험 문제지 3\n" + "".join(chars)
+        total += 1
+        hits += index.canonical("noisy_" + k, noisy) == canon[k]
+    return {
+        "passages": len(texts),
+        "merged": merged,
+        "canonical_groups": len(set(canon.values())),
+        "index_ms": round(t_index * 1000, 1),
+        "noisy_recall": round(hits / total, 4) if total else None,
+        "threshold": args.threshold,
+    }
+
+
+def bench_chunks(args) -> Dict:
+    """
+    부분 지문 쿼리(청크 벡터 + 잡음)로 평균 풀링 인덱스와 청크 인덱스를 비교
+    적중 = 쿼리 청크의 부모 문항과 같은 지문 그룹 문항이 top‑k 안에 있음
+    """
+    pooled = sn_index.open_collection(args.db, args.col, backend=args.backend)
+    chunks = sn_index.open_collection(args.db, sn_index.chunk_collection_name(args.col),
+                                      backend=args.backend)
+    got = chunks.get(include=["embeddings", "metadatas"])
+    vecs = np.asarray(got["embeddings"], dtype=np.float32)
+    rng = np.random.default_rng(0)
+    rows = np.sort(rng.choice(len(vecs), min(args.queries, len(vecs)), replace=False))
+    queries = sample_queries(vecs[rows], len(rows))
+    want = [got["metadatas"][r]["group"] for r in rows]
+    parents = pooled.get(include=["metadatas"])
+    groups = {i: m.get("group") for i, m in zip(parents["ids"], parents["metadatas"])}
+
+    def hit_rate(ids_list):
+        return round(float(np.mean([w in {groups.get(i) for i in ids[:args.k]}
+                                    for w, ids in zip(want, ids_list)])), 4)
+
+    pooled_t, pooled_ids = time_queries(pooled, queries, args.k)
+    result = {
+        "parents": pooled.count(), "chunks": chunks.count(), "dim": int(vecs.shape[1]),
+        "queries": len(queries), "k": args.k,
+        "pooled": {"vector_mb": round(pooled.count() * vecs.shape[1] * 4 / 2 ** 20, 2),
+                   "query": percentiles(pooled_t), f"hit@{args.k}": hit_rate(pooled_ids)},
+    }
+    for agg in ("max", "topm"):
+        times, ids = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            res = sn_index.query_parents(chunks, [q.tolist()], args.k, agg=agg, m=args.m)
+            times.append(time.perf_counter() - t0)
+            ids.append(res["ids"][0])
+        result[f"chunk_{agg}"] = {
+            "vector_mb": round(chunks.count() * vecs.shape[1] * 4 / 2 ** 20, 2),
+            "query": percentiles(times), f"hit@{args.k}": hit_rate(ids)}
+    return result
+
+
+def bench_chunker(args) -> Dict:
+    """
+    db/*.json 문항(merge_text)을 정규식(regex·regex_nl) / Kiwi 청크 분할기로 나눠 속도·청크 통계 비교
+    --model 이 주어지면
+    - 그 모델 토크나이저로 예산을 잡은 분할(*_model)도 비교하고, 청크별 모델 토큰 수로
+      max_seq_length(--max-tok) 초과로 잘리는 청크 비율(truncated_rate)을 잰다
+    - 청크를 임베딩해 부분 지문 쿼리 적중률도 비교
+      (쿼리 = 지문 가운데 연속 2문장, 적중 = 같은 지문 그룹 문항이 top‑k 안에 있음)
+    """
+    import sn_build
+    items = list(sn_build.iter_items(args.src))[:args.limit or None]
+    docs = [sn_build.merge_text(item) for _, item in items]
+    groups = [sn_text.passage_hash(item) for _, item in items]
+    sn_text.get_kiwi()    # 모델 로드 시간은 제외
+    budgets = {"tiktoken": sn_build.TokenBudget()}
+    embedder = None
+    if args.model:
+        embedder = sn_build.LocalEmbedder(args.model, args.max_tok, chunk_tokenizer="model")
+        budgets["model"] = embedder.budget()
+
+    runs, stats = {}, {}
+    for tok, budget in budgets.items():
+        for chunker, overlap in [("regex", 0), ("regex_nl", 0)] + [("kiwi", ov) for ov in args.overlap]:
+            t0 = time.perf_counter()
+            chunks = sn_build.chunk_docs(docs, args.max_tok, chunker, overlap, budget)
+            elapsed = time.perf_counter() - t0
+            flat = [c for cs in chunks for c in cs]
+            toks = np.asarray(budget.lengths(flat))
+            name = (f"{chunker}_ov{overlap}" if chunker == "kiwi" else chunker) \
+                + ("_model" if tok == "model" else "")
+            runs[name] = chunks
+            stats[name] = {
+                "ms": round(elapsed * 1000, 1),
+                "docs_per_s": round(len(docs) / elapsed, 1) if elapsed else None,
+                "chunks": len(flat),
+                "chunks_per_doc": round(len(flat) / len(docs), 2),
+                "mean_tokens": round(float(toks.mean()), 1),     # 예산 토크나이저 기준
+                "max_tokens": int(toks.max()),
+                "sentence_end": round(float(np.mean(
+                    [c.rstrip()[-1:] in ".?!다요\"'”’)" for c in flat])), 4),
+            }
+            if "model" in budgets:
+                model = budgets["model"]
+                seq = np.asarray(model.lengths(flat)) + model.reserve
+                stats[name]["model_tokens_mean"] = round(float(seq.mean()), 1)
+                stats[name]["truncated"] = int((seq > args.max_tok).sum())
+                stats[name]["truncated_rate"] = round(float(np.mean(seq > args.max_tok)), 4)
+    result = {"docs": len(docs), "max_tok": args.max_tok, "chunkers": stats}
+    if not args.model:
+        return result
+
+    # 부분 지문 쿼리 (모든 분할기에 같은 쿼리 사용, 지문 그룹당 1개)
+    rng = np.random.default_rng(0)
+    passages = [item.get("passage") or item.get("context_box") or "" for _, item in items]
+    seen, q_text, q_group = set(), [], []
+    for sents, group in zip(sn_text.split_sents_batch(passages), groups):
+        if group in seen or len(sents) < 4:
+            continue
+        seen.add(group)
+        s = int(rng.integers(1, len(sents) - 2))
+        q_text.append(" ".join(sents[s:s + 2]))
+        q_group.append(group)
+    q_text, q_group = q_text[:args.queries], q_group[:args.queries]
+    groups = np.asarray(groups)
+
+    queries = np.asarray(embedder.embed(q_text), dtype=np.float32)
+    result["queries"] = len(q_text)
+    for name, chunks in runs.items():
+        flat = [c for cs in chunks for c in cs]
+        owner = np.repeat(np.arange(len(docs)), [len(cs) for cs in chunks])
+        t0 = time.perf_counter()
+        vecs = np.asarray(embedder.embed(flat), dtype=np.float32)
+        embed_s = time.perf_counter() - t0
+        pooled = np.stack([vecs[owner == d].mean(axis=0) for d in range(len(docs))])
+        pooled /= np.linalg.norm(pooled, axis=1, keepdims=True)
+        sims = queries @ vecs.T
+        chunk_max = np.full((len(queries), len(docs)), -np.inf, dtype=np.float32)
+        for d in range(len(docs)):
+            chunk_max[:, d] = sims[:, owner == d].max(axis=1)
+        stats[name]["embed_s"] = round(embed_s, 2)
+        for label, scores in (("pooled", queries @ pooled.T), ("chunk_max", chunk_max)):
+            order = np.argsort(-scores, axis=1)
+            hit = groups[order] == np.asarray(q_group)[:, None]
+            first = np.where(hit.any(axis=1), hit.argmax(axis=1), len(docs))
+            stats[name][label] = {"hit@1": round(float(np.mean(first < 1)), 4),
+                                  f"hit@{args.k}": round(float(np.mean(first < args.k)), 4),
+                                  "mrr": round(float(np.mean(1.0 / (first + 1))), 4)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="수능 DB 벤치마크")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("index", help="Chroma vs NumPy 인덱스 비교")
+    p.add_argument("--db", default="./sn_csat_2.db", help="Chroma 퍼시스턴스 디렉터리")
+    p.add_argument("--col", default="sn_csat_openai", help="컬렉션명")
+    p.add_argument("--np-db", help="NumPy 인덱스 저장 위치 (기본: 임시 디렉터리)")
+    p.add_argument("--queries", type=int, default=200, help="쿼리 수")
+    p.add_argument("-k", type=int, default=8, help="top-k")
+    p.add_argument("--json", help="결과 JSON 저장 경로")
+
+    p = sub.add_parser("quant", help="양자화 저장 형식 비교")
+    p.add_argument("--db", default="./sn_csat_2.db", help="Chroma 퍼시스턴스 디렉터리")
+    p.add_argument("--col", default="sn_csat_openai", help="컬렉션명")
+    p.add_argument("--queries", type=int, default=200, help="쿼리 수")
+    p.add_argument("-k", type=int, default=8, help="top-k")
+    p.add_argument("--json", help="결과 JSON 저장 경로")
+
+    p = sub.add_parser("dims", help="Matryoshka 차원 축소 비교")
+    p.add_argument("--db", default="./sn_csat.db", help="전체 차원 OpenAI 컬렉션 디렉터리")
+    p.add_argument("--col", default="sn_csat_openai", help="컬렉션명")
+    p.add_argument("--dims", type=int, nargs="+", default=[256, 512, 1024, 3072], help="비교 차원")
+    p.add_argument("--queries", type=int, default=200, help="쿼리 수")
+    p.add_argument("--live", type=int, default=0, help="API 임베딩 지연 측정 문서 수 (0=생략)")
+    p.add_argument("-k", type=int, default=8, help="top-k")
+    p.add_argument("--json", help="결과 JSON 저장 경로")
+
+    p = sub.add_parser("startup", help="엔트리포인트 시작 시간 회귀 검사")
+    p.add_argument("--only", nargs="+", choices=sorted(STARTUP_ENTRIES), help="측정할 엔트리포인트")
+    p.add_argument("--repeat", type=int, default=3, help="반복 측정 횟수 (최솟값 사용)")
+    p.add_argument("--budget-scale", type=float, default=1.0, help="느린 머신용 예산 배율")
+    p.add_argument("--json", help="결과 JSON 저장 경로")
+
+    p = sub.add_parser("pos", help="품사 분석 순차 vs 배치 비교")
+    p.add_argument("--src", default="./db", help="문항 JSON 폴더")
+    p.add_argument("--limit", type=int, default=0, help="사용할 JSON 수 (0=전부)")
+    p.add_argument("--json", help="결과 JSON 저장 경로")
+
+    p = sub.add_parser("novelty", help="max_sem_sim 정확 vs HNSW 근사 비교")
+    p.add_argument("-n", type=int, default=20000, help="합성 항목 수")
+    p.add_argument("--dim", type=int, default=256, help="벡터 차원")
+    p.add_argument("--ef", type=int, nargs="+", default=[16, 64, 256], help="비교할 HNSW ef")
+    p.add_argument("--batch", type=int, default=64, help="스트리밍 배치 크기")
+    p.add_argument("--json", help="결과 JSON 저장 경로")
+
+    p = sub.add_parser("neardup", help="근사 중복 지문 통합 점검")
+    p.add_argument("--src", default="./db", help="문항 JSON 폴더")
+    p.add_argument("--threshold", type=float, default=sn_text.NEAR_DUP_THRESHOLD,
+                   help="MinHash Jaccard 임계값")
+    p.add_argument("--json", help="결과 JSON 저장 경로")
+
+    p = sub.add_parser("chunks", help="청크 평균 vs 청크 단위 인덱스 비교")
+    p.add_argument("--db", default="./sn_csat_2.db", help="퍼시스턴스 디렉터리")
+    p.add_argument("--col", default="sn_csat_openai", help="문항 컬렉션명 (청크: <col>_chunks)")
+    p.add_argument("--backend", choices=["chroma", "numpy"], help="인덱스 백엔드")
+    p.add_argument("--queries", type=int, default=200, help="쿼리 수")
+    p.add_argument("-k", type=int, default=8, help="top-k")
+    p.add_argument("-m", type=int, default=2, help="top‑m 집계의 m")
+    p.add_argument("--json", help="결과 JSON 저장 경로")
+
+    p = sub.add_parser("chunker", help="정규식 vs Kiwi 문장 청크 분할 비교")
+    p.add_argument("--src", default="./db", help="문항 JSON 폴더")
+    p.add_argument("--max-tok", type=int, default=256,
+                   help="청크 토큰 예산 (= 로컬 모델 max_seq_length)")
+    p.add_argument("--overlap", type=int, nargs="+", default=[0, 32], help="비교할 Kiwi 겹침 토큰 수")
+    p.add_argument("--model", help="모델 토크나이저 예산·잘림 비율·검색 적중률 비교용 로컬 모델")
+    p.add_argument("--queries", type=int, default=200, help="쿼리 수 (지문 그룹당 1개)")
+    p.add_argument("-k", type=int, default=8, help="top-k")
+    p.add_argument("--limit", type=int, default=0, help="사용할 문항 수 (0=전부)")
+    p.add_argument("--json", help="결과 JSON 저장 경로")
+
+    args = parser.parse_args()
+    result = {"index": bench_index, "quant": bench_quant, "dims": bench_dims,
+              "startup": bench_startup, "pos": bench_pos,
+              "novelty": bench_novelty, "neardup": bench_neardup,
+              "chunks": bench_chunks, "chunker": bench_chunker}[args.command](args)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    if result.get("ok") is False:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+오프라인 벤치마크 묶음 (수집·구축·검색 경로 전체)
+네트워크·임베딩 모델 없이 재현 가능하도록
+- db/ 문항을 합성 확장기(expand_corpus)로 최대 10만 문항까지 늘리고
+- OpenAI / KURE‑v1 자리에 결정적 가짜 임베딩(FakeEmbedder)을 넣어
+아래 단계를 측정한 뒤 JSON 으로 저장한다. --compare 로 이전 결과와 비교해 회귀 검사.
+
+단계
+- pdf_extract  : pdforg/*_split 페이지 PDF 텍스트 추출 (pdfplumber, page / columns 캐시 cold·warm)
+- json_parse   : 확장 코퍼스 JSON 읽기 (sn_build.iter_items)
+- pos          : 지문 품사 집합 배치 분석 (Kiwi)
+- chunk        : 정규식 / Kiwi 청크 분할 (tiktoken 예산)
+- embed        : 가짜 openai(문서 전체) / local(청크 평균) 임베딩 처리량
+- novelty      : max_sem_sim / max_struct_sim 계산 (exact, hnswlib 있으면 ann)
+- insert       : 인덱스 백엔드별 upsert 처리량 (chroma / numpy)
+- query        : 부분 지문 쿼리 p50 / p99
+- group_expand : 검색 결과 지문 그룹의 전체 문항 조회 (GUI 세트 구성과 같은 col.get(where=group))
+- build        : sn_build.build 전 과정 (가짜 local 임베딩, numpy 백엔드) 단계별 리포트
+
+설치되지 않은 라이브러리(pdfplumber, kiwipiepy, tiktoken, chromadb, hnswlib)가 필요한 단계는
+"skipped" 사유를 남기고 나머지 단계를 계속 진행한다.
+tiktoken 은 cl100k_base 인코딩 파일이 캐시되어 있어야 오프라인에서 동작한다.
+
+사용 예:
+    python bench_suite.py --items 20000 --json bench_20k.json
+    python bench_suite.py --items 100000 --only json_parse chunk novelty insert query
+    python bench_suite.py --items 20000 --compare bench_20k.json --tolerance 0.2   # 회귀 시 exit 1
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import glob
+import hashlib
+import random
+import shutil
+import tempfile
+import argparse
+import platform
+import subprocess
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import sn_build
+import sn_index
+import sn_text
+from sn_embed import embed_metadata
+from sn_profile import StageProfiler
+
+STAGES = ("pdf_extract", "json_parse", "pos", "chunk", "embed", "novelty",
+          "insert", "query", "group_expand", "build")
+
+
+# ── ❶ 가짜 임베딩 ──────────────────────────────
+class FakeEmbedder:
+    """
+    결정적 가짜 임베딩 (네트워크·모델 없이 파이프라인 계측용)
+    UTF‑8 바이트 3‑gram 을 dim 개 버킷에 부호 해싱한 뒤 L2 정규화한다.
+    같은 텍스트는 같은 벡터, 겹치는 글자가 많을수록 코사인이 높다.
+    - name="openai": 문서 전체 임베딩 (text-embedding-3 자리)
+    - name="local" : max_tokens 청크 평균 (KURE‑v1 자리)
+    """
+    dim = None              # Matryoshka 축소 없음 (출력 차원은 out_dim)
+
+    def __init__(self, name: str = "local", out_dim: int = 1024, max_tokens: int = 256):
+        self.name = name
+        self.model = "fake-text-embedding-3" if name == "openai" else "fake-kure-v1"
+        self.out_dim = out_dim
+        self.max_tokens = max_tokens if name == "local" else None
+        self.on_usage = None
+
+    def metadata(self) -> Dict:
+        return {**embed_metadata(self.model), "embed_dim": self.out_dim}
+
+    def budget(self) -> sn_build.TokenBudget:
+        return sn_build.TokenBudget()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.out_dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            b = np.frombuffer(text.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+            if len(b) < 3:
+                b = np.pad(b, (0, 3 - len(b)))
+            h = (b[:-2] * 1000003) ^ (b[1:-1] * 8191) ^ (b[2:] * 131)
+            h = (h * 2654435761) & 0xFFFFFFFF
+            sign = np.where(h & 0x10000, 1.0, -1.0)
+            out[i] = np.bincount((h % self.out_dim).astype(np.int64), weights=sign,
+                                 minlength=self.out_dim)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1.0, norms)
+
+
+# ── ❷ 합성 코퍼스 ──────────────────────────────
+def _split_sents(text: str) -> List[str]:
+    return [s for s in re.split(r"(?<=[.?!])\s+|\n+", text) if s.strip()]
+
+
+def _sources_digest(paths: List[str]) -> str:
+    """원본 파일 (절대 경로, 크기, mtime) 목록의 SHA-1 — 원본이 바뀌면 합성 코퍼스를 다시 만듦"""
+    h = hashlib.sha1()
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"{os.path.abspath(path)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def expand_corpus(src_dir: str, out_dir: str, n_items: int, seed: int = 0) -> Dict:
+    """
+    db/*.json 문항을 n_items 개까지 합성 확장해 out_dir 에 JSON 으로 저장
+    - 원본 문항은 그대로 포함
+    - 사본 c 회차마다 원본 지문 그룹별로 문장 순서를 섞고 한 문장을 다른 지문 문장으로 바꾼
+      새 지문을 만들고, 그 그룹 문항들(id 앞에 syn{c}_)이 공유 → 지문당 문항 수 분포 유지
+    - 같은 (원본 파일 경로·크기·mtime, n_items, seed) 면 다시 만들지 않음 (.manifest)
+    """
+    paths = sorted(glob.glob(os.path.join(src_dir, "*.json")))
+    manifest_path = os.path.join(out_dir, ".manifest")   # iter_items 의 *.json 과 겹치지 않게
+    want = {"source": len(paths), "source_sha1": _sources_digest(paths),
+            "items": n_items, "seed": seed}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            if json.load(f) == want:
+                return want
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)      # 설정이 달라졌거나 지난 생성이 중간에 끊김
+    os.makedirs(out_dir, exist_ok=True)
+
+    groups: Dict[str, List[dict]] = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            item = json.load(f)
+        if item.get("question"):
+            groups.setdefault(sn_text.passage_hash(item), []).append(item)
+    if not groups:
+        raise ValueError(f"{src_dir} 에 question 이 있는 문항 JSON 이 없습니다.")
+    pool = [s for items in groups.values()
+            for s in _split_sents(items[0].get("passage") or items[0].get("context_box") or "")]
+
+    rnd = random.Random(seed)
+    written, copy = 0, 0
+    while written < n_items:
+        for items in groups.values():
+            if written >= n_items:
+                break
+            passage = None
+            if copy:
+                sents = _split_sents(items[0].get("passage") or items[0].get("context_box") or "")
+                rnd.shuffle(sents)
+                if sents and pool:
+                    sents[rnd.randrange(len(sents))] = rnd.choice(pool)
+                passage = " ".join(sents)
+            for item in items[:n_items - written]:
+                new = dict(item)
+                if copy:
+                    new["id"] = f"syn{copy}_{item['id']}"
+                    key = "passage" if item.get("passage") else "context_box"
+                    new[key] = passage
+                with open(os.path.join(out_dir, f"{new['id']}.json"), "w", encoding="utf-8") as f:
+                    json.dump(new, f, ensure_ascii=False)
+                written += 1
+        copy += 1
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(want, f)
+    return want
+
+
+# ── ❸ 단계 ────────────────────────────────────
+def _skipped(e: Exception) -> Dict:
+    return {"skipped": f"{type(e).__name__}: {e}"}
+
+
+def _rate(n: int, seconds: float) -> Optional[float]:
+    return round(n / seconds, 1) if seconds else None
+
+
+def stage_pdf_extract(ctx: Dict, args) -> Dict:
+    """page(전체 extract_text) / columns 레이아웃 캐시 없음(cold)·있음(warm) 페이지당 시간"""
+    from sn_processor import ExamTextExtractor
+    import pdfplumber  # noqa: F401  (미설치면 skipped)
+    pages = sorted(glob.glob(os.path.join(args.pdf_dir, "*_split", "*.pdf")))
+    pages = pages[:args.pdf_pages or None]
+    if not pages:
+        return {"skipped": f"{args.pdf_dir}/*_split/*.pdf 없음"}
+    cache_dir = os.path.join(ctx["work"], "layout_cache")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    out = {}
+    for name, extractor in (("page", ExamTextExtractor("page")),
+                            ("columns_cold", ExamTextExtractor("columns", cache_dir)),
+                            ("columns_warm", ExamTextExtractor("columns", cache_dir))):
+        t0 = time.perf_counter()
+        chars = sum(len(extractor.extract_text_from_page(p)) for p in pages)
+        elapsed = time.perf_counter() - t0
+        out[name] = {"pages": len(pages), "wall_s": round(elapsed, 3),
+                     "page_ms": round(elapsed / len(pages) * 1000, 3),
+                     "pages_per_s": _rate(len(pages), elapsed), "chars": chars}
+    return out
+
+
+def stage_json_parse(ctx: Dict, args) -> Dict:
+    t0 = time.perf_counter()
+    ctx["items"] = list(sn_build.iter_items(ctx["corpus"]))
+    elapsed = time.perf_counter() - t0
+    return {"items": len(ctx["items"]), "wall_s": round(elapsed, 3),
+            "items_per_s": _rate(len(ctx["items"]), elapsed)}
+
+
+def stage_pos(ctx: Dict, args) -> Dict:
+    passages = [item.get("passage") or item.get("context_box") or "" for _, item in ctx["items"]]
+    keys = [sn_text.passage_hash(item) for _, item in ctx["items"]]
+    sn_text.get_kiwi()    # 모델 로드 시간은 제외
+    t0 = time.perf_counter()
+    sn_text.pos_sets_batch(passages, keys)
+    elapsed = time.perf_counter() - t0
+    return {"passages": len(set(keys)), "wall_s": round(elapsed, 3),
+            "passages_per_s": _rate(len(set(keys)), elapsed),
+            "kiwi_workers": sn_text.KIWI_WORKERS}
+
+
+def stage_chunk(ctx: Dict, args) -> Dict:
+    docs = ctx["docs"]
+    sn_build._get_enc()
+    out = {}
+    for chunker in sn_build.CHUNKERS:
+        try:
+            if chunker == "kiwi":
+                sn_text.get_kiwi()
+            t0 = time.perf_counter()
+            chunks = sn_build.chunk_docs(docs, args.max_tok, chunker)
+            elapsed = time.perf_counter() - t0
+        except Exception as e:
+            out[chunker] = _skipped(e)
+            continue
+        out[chunker] = {"docs": len(docs), "wall_s": round(elapsed, 3),
+                        "docs_per_s": _rate(len(docs), elapsed),
+                        "chunks_per_doc": round(sum(map(len, chunks)) / len(docs), 2)}
+    return out
+
+
+def stage_embed(ctx: Dict, args) -> Dict:
+    out = {}
+    for name in ("openai", "local"):
+        embedder = FakeEmbedder(name, args.dim, args.max_tok)
+        prof = StageProfiler("bench_embed", out_dir=None)
+        t0 = time.perf_counter()
+        try:
+            vecs = np.concatenate([
+                sn_build.embed_docs(embedder, ctx["docs"][s:s + args.batch], prof)[0]
+                for s in range(0, len(ctx["docs"]), args.batch)])
+        except Exception as e:     # local 청크 분할은 tiktoken 필요
+            out[name] = _skipped(e)
+            continue
+        elapsed = time.perf_counter() - t0
+        out[name] = {"docs": len(vecs), "wall_s": round(elapsed, 3),
+                     "docs_per_s": _rate(len(vecs), elapsed),
+                     "stages": {k: v["wall_s"] for k, v in prof.report()["stages"].items()}}
+        if name == "openai":
+            ctx["vecs"] = vecs
+    return out
+
+
+def stage_novelty(ctx: Dict, args) -> Dict:
+    vecs = ctx["vecs"]
+    groups = [sn_text.passage_hash(item) for _, item in ctx["items"]]
+    tags = {}
+    for g, (_, item) in zip(groups, ctx["items"]):
+        # 품사 분석 대신 지문 어절 앞 글자 집합 (품사 집합처럼 작은 집합, Kiwi 없이 재현)
+        tags.setdefault(g, {w[:1] for w in (item.get("passage") or "").split()[:200]})
+    out = {}
+    for kind in ("exact", "ann"):
+        scorer = sn_build.make_scorer(kind, check=0)
+        if kind == "ann" and not isinstance(scorer, sn_build.AnnNoveltyScorer):
+            out[kind] = {"skipped": "hnswlib 미설치"}
+            continue
+        t0 = time.perf_counter()
+        for s in range(0, len(vecs), args.batch):
+            scorer.score(vecs[s:s + args.batch], groups[s:s + args.batch], tags)
+        elapsed = time.perf_counter() - t0
+        out[kind] = {"items": len(vecs), "wall_s": round(elapsed, 3),
+                     "items_per_s": _rate(len(vecs), elapsed)}
+    return out
+
+
+def stage_insert(ctx: Dict, args) -> Dict:
+    out = {}
+    ctx["cols"] = {}
+    metas = [sn_build.clean_metadata(item, path) for path, item in ctx["items"]]
+    ids = [item["id"] for _, item in ctx["items"]]
+    for backend in args.backends:
+        db_path = os.path.join(ctx["work"], f"db_{backend}")
+        shutil.rmtree(db_path, ignore_errors=True)     # --work 재사용 시 빈 컬렉션에서 시작
+        try:
+            col = sn_index.open_collection(
+                db_path, "bench", create=True,
+                backend=backend, metadata={"hnsw:space": "cosine"})
+        except ImportError as e:
+            out[backend] = _skipped(e)
+            continue
+        t0 = time.perf_counter()
+        for s in range(0, len(ids), sn_build.WRITE_BATCH):
+            e = s + sn_build.WRITE_BATCH
+            col.upsert(ids=ids[s:e], documents=ctx["docs"][s:e],
+                       embeddings=ctx["vecs"][s:e].tolist(), metadatas=metas[s:e])
+        elapsed = time.perf_counter() - t0
+        ctx["cols"][backend] = col
+        out[backend] = {"items": len(ids), "wall_s": round(elapsed, 3),
+                        "items_per_s": _rate(len(ids), elapsed)}
+    return out
+
+
+def _queries(ctx: Dict, n: int) -> np.ndarray:
+    """부분 지문 쿼리: 무작위 문항 지문의 연속 2문장을 가짜 임베딩"""
+    if "queries" not in ctx:
+        rnd = random.Random(1)
+        texts = []
+        for _, item in rnd.sample(ctx["items"], min(n, len(ctx["items"]))):
+            sents = _split_sents(item.get("passage") or item.get("context_box") or item["question"])
+            s = rnd.randrange(max(len(sents) - 1, 1))
+            texts.append(" ".join(sents[s:s + 2]))
+        ctx["queries"] = FakeEmbedder("openai", ctx["vecs"].shape[1]).embed(texts)
+    return ctx["queries"]
+
+
+def stage_query(ctx: Dict, args) -> Dict:
+    from bench_sn import percentiles, time_queries
+    out = {}
+    queries = _queries(ctx, args.queries)
+    for backend, col in ctx["cols"].items():
+        # 첫 쿼리는 지연 로드·IVF 학습을 포함하므로 따로 기록
+        first, _ = time_queries(col, queries[:1], args.k)
+        times, ids = time_queries(col, queries, args.k)
+        ctx.setdefault("hits", {})[backend] = ids
+        out[backend] = {"queries": len(times), "k": args.k,
+                        "first_query_ms": round(first[0] * 1000, 3), **percentiles(times)}
+    return out
+
+
+def stage_group_expand(ctx: Dict, args) -> Dict:
+    from bench_sn import percentiles
+    out = {}
+    for backend, col in ctx["cols"].items():
+        times, sizes = [], []
+        for ids in ctx["hits"][backend]:
+            t0 = time.perf_counter()
+            metas = col.get(ids=ids, include=["metadatas"])["metadatas"]
+            uniq = list(dict.fromkeys(m.get("group") for m in metas))
+            size = sum(len(col.get(where={"group": g}, include=["metadatas"])["ids"])
+                       for g in uniq)
+            times.append(time.perf_counter() - t0)
+            sizes.append(size)
+        out[backend] = {"queries": len(times), "items_per_query": round(float(np.mean(sizes)), 2),
+                        **percentiles(times)}
+    return out
+
+
+def stage_build(ctx: Dict, args) -> Dict:
+    prof = StageProfiler("bench_build", out_dir=None)
+    db_path = os.path.join(ctx["work"], "db_build")
+    shutil.rmtree(db_path, ignore_errors=True)
+    res = sn_build.build(ctx["corpus"], db_path, "bench_build",
+                         FakeEmbedder("local", args.dim, args.max_tok), batch_size=args.batch,
+                         backend="numpy", limit=args.build_items or None, prof=prof)
+    report = prof.report()
+    return {"items": res["items"], "wall_s": report["total"]["wall_s"],
+            "items_per_s": _rate(res["items"], report["total"]["wall_s"]),
+            "peak_rss_mb": report["total"]["peak_rss_mb"],
+            "stages": {k: {"wall_s": v["wall_s"], "items_per_s": v["items_per_s"]}
+                       for k, v in report["stages"].items()},
+            "writer": {k: {"wall_s": v["wall_s"], "cpu_s": v["cpu_s"], "items_per_s": v["items_per_s"]}
+                       for k, v in report["threads"].get("writer", {}).items()}}
+
+
+STAGE_FUNCS = {
+    "pdf_extract": stage_pdf_extract, "json_parse": stage_json_parse, "pos": stage_pos,
+    "chunk": stage_chunk, "embed": stage_embed, "novelty": stage_novelty,
+    "insert": stage_insert, "query": stage_query, "group_expand": stage_group_expand,
+    "build": stage_build,
+}
+# 앞 단계 결과를 쓰는 단계: 요청하지 않아도 먼저 실행 (결과는 기록)
+REQUIRES = {"pos": "json_parse", "chunk": "json_parse", "embed": "json_parse",
+            "novelty": "embed", "insert": "embed", "query": "insert", "group_expand": "query"}
+
+
+# ── ❹ 실행·비교 ────────────────────────────────
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(), "commit": commit or None,
+            "started": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def run_suite(args) -> Dict:
+    work = args.work or tempfile.mkdtemp(prefix="sn_bench_")
+    corpus = os.path.join(work, f"corpus_{args.items}")
+    print(f"🧪  Expanding {args.src} → {args.items} items ({corpus})")
+    t0 = time.perf_counter()
+    expand_corpus(args.src, corpus, args.items, args.seed)
+    result = {"env": environment(),
+              "config": {"items": args.items, "seed": args.seed, "dim": args.dim,
+                         "max_tok": args.max_tok, "batch": args.batch, "k": args.k},
+              "expand_s": round(time.perf_counter() - t0, 3), "stages": {}}
+
+    ctx = {"work": work, "corpus": corpus}
+    wanted = [s for s in STAGES if not args.only or s in args.only]
+    todo = []
+    for stage in wanted:
+        chain = [stage]
+        while chain[-1] in REQUIRES:
+            chain.append(REQUIRES[chain[-1]])
+        todo += [s for s in reversed(chain) if s not in todo]
+    for stage in todo:
+        missing = REQUIRES.get(stage)
+        if missing and "skipped" in result["stages"].get(missing, {}):
+            result["stages"][stage] = {"skipped": f"{missing} 단계 생략됨"}
+            continue
+        print(f"⏱  {stage} ...")
+        try:
+            result["stages"][stage] = STAGE_FUNCS[stage](ctx, args)
+        except Exception as e:   # 미설치 라이브러리 등으로 단계 하나가 실패해도 나머지는 측정
+            result["stages"][stage] = _skipped(e)
+        if stage == "json_parse" and "items" in ctx:
+            ctx["docs"] = [sn_build.merge_text(item) for _, item in ctx["items"]]
+    if not args.work:
+        shutil.rmtree(work, ignore_errors=True)
+    return result
+
+
+def _flatten(d: Dict, prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for k, v in d.items():
+        path = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            out.update(_flatten(v, path))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[path] = v
+    return out
+
+
+def compare(old: Dict, new: Dict, tolerance: float = 0.2) -> Dict:
+    """
+    같은 지표끼리 비교 (*_per_s 는 클수록, *_ms / wall_s 는 작을수록 좋음)
+    tolerance(비율) 이상 나빠진 지표를 regressions 에 모은다.
+    시간 차이가 1 ms / 0.1 s 이하인 지표(처리량은 해당 단계 wall_s 기준)는 측정 잡음으로 보고 제외한다.
+    """
+    before, after = _flatten(old.get("stages", {})), _flatten(new.get("stages", {}))
+    rows, regressions = {}, []
+    for key in sorted(before.keys() & after.keys()):
+        leaf = key.rsplit(".", 1)[-1]
+        wall = key.rsplit(".", 1)[0] + ".wall_s"
+        noise = wall in before and wall in after and abs(after[wall] - before[wall]) <= 0.1
+        if leaf.endswith("_per_s"):
+            worse = before[key] and after[key] < before[key] * (1 - tolerance) and not noise
+        elif leaf.endswith("_ms") or leaf == "wall_s":
+            floor = 1.0 if leaf.endswith("_ms") else 0.1
+            worse = after[key] > before[key] * (1 + tolerance) and after[key] - before[key] > floor
+        else:
+            continue
+        rows[key] = {"before": before[key], "after": after[key],
+                     "ratio": round(after[key] / before[key], 3) if before[key] else None}
+        if worse:
+            regressions.append(key)
+    return {"tolerance": tolerance, "metrics": rows, "regressions": regressions,
+            "ok": not regressions}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="수능 DB 오프라인 벤치마크 묶음")
+    parser.add_argument("--src", default="./db", help="원본 문항 JSON 폴더")
+    parser.add_argument("--items", type=int, default=20000, help="합성 확장 문항 수 (최대 10만 권장)")
+    parser.add_argument("--seed", type=int, default=0, help="합성 확장 시드")
+    parser.add_argument("--work", help="작업 폴더 (지정 시 합성 코퍼스 재사용, 기본: 임시 폴더)")
+    parser.add_argument("--only", nargs="+", choices=STAGES, help="측정할 단계 (선행 단계는 자동 실행)")
+    parser.add_argument("--pdf-dir", default="./pdforg", help="페이지 분할 PDF 상위 폴더")
+    parser.add_argument("--pdf-pages", type=int, default=0, help="추출할 페이지 수 (0=전부)")
+    parser.add_argument("--dim", type=int, default=1024, help="가짜 임베딩 차원")
+    parser.add_argument("--max-tok", type=int, default=256, help="청크 토큰 수")
+    parser.add_argument("--batch", type=int, default=sn_build.BATCH_SIZE, help="스트리밍 배치 크기")
+    parser.add_argument("--backends", nargs="+", choices=["chroma", "numpy"],
+                        default=["chroma", "numpy"], help="insert/query 인덱스 백엔드")
+    parser.add_argument("--queries", type=int, default=200, help="쿼리 수")
+    parser.add_argument("-k", type=int, default=8, help="top-k")
+    parser.add_argument("--build-items", type=int, default=5000,
+                        help="build 단계 문항 수 (0=확장 코퍼스 전부)")
+    parser.add_argument("--json", help="결과 JSON 저장 경로")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON (회귀 시 exit 1)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="회귀 판정 허용 비율")
+    args = parser.parse_args(argv)
+
+    result = run_suite(args)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            result["compare"] = compare(json.load(f), result, args.tolerance)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    if result.get("compare", {}).get("ok") is False:
+        print(f"❌  Regressions: {', '.join(result['compare']['regressions'])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
 import threading
-import chromadb
 import re
 import os
-import json
-from openai import OpenAI
 import subprocess
-from sentence_transformers import SentenceTransformer
-import numpy as np
+from sn_server import connect_collection, RemoteCollection
+from sn_embed import QueryCache, cached_query, check_collection
+from sn_record import prompt_from_meta
 
 # 상수 정의
 DB = "./sn_csat_2.db"          # 새 DB
@@ -20,26 +18,30 @@ GROUP_PICK = 2
 # 전역 변수
 cli = None
 col = None
+query_cache = QueryCache()   # 지문 해시 → 쿼리 벡터·검색 결과
 
 # 첫 호출 시 로컬 모델 로드 (CPU)
-_local_st = None
-def _get_local_model():
-    global _local_st
-    if _local_st is None:
-        _local_st = SentenceTransformer(LOCAL_MODEL, device="cpu")
-        try:
-            _local_st.max_seq_length = 256
-        except AttributeError:
-            pass
-    return _local_st
+_local_embedder = None
+def _get_local_embedder():
+    """컬렉션 구축 때와 같은 모델·청크 설정의 쿼리 임베딩 백엔드 (sn_build.query_embedder)"""
+    global _local_embedder
+    if _local_embedder is None:
+        from sn_build import query_embedder   # 첫 검색 시 torch 포함 로드
+        meta = dict(getattr(col, "metadata", None) or {})
+        meta.setdefault("embed_model", LOCAL_MODEL)
+        _local_embedder = query_embedder(meta)
+    return _local_embedder
 
 def embed(text: str):
     """
     로컬 SentenceTransformer(KURE‑v1) 임베딩만 사용 (1024‑dim)
     OpenAI 경로는 제거하여 Chroma 컬렉션(동일 차원)과 일관성 유지.
+    문서와 같이 청크로 나눠 청크 벡터를 평균하므로 긴 지문도 잘리지 않는다.
+    검색 서버에 연결된 경우 서버에 상주한 모델로 임베딩 (torch 로드 없음).
     """
-    st = _get_local_model()
-    return st.encode(text, normalize_embeddings=True).tolist()
+    if isinstance(col, RemoteCollection):
+        return col.embed([text])[0].tolist()
+    return _get_local_embedder().embed([text])[0].tolist()
 
 def extract_group(doc_id: str):
     m = re.match(r"(\d{2}_\d{2}_\d{2})_", doc_id)
@@ -47,23 +49,10 @@ def extract_group(doc_id: str):
 
 def load_question_from_meta(meta: dict):
     """
-    meta['file_path']를 열어 (질문 + 선택지) 하나의 문자열 반환.
-    실패 시 None.
+    meta['file_path']의 문항 레코드로 (질문 + 선택지) 하나의 문자열 반환.
+    같은 파일은 한 번만 읽어 캐시 (sn_record.load_record). 실패 시 None.
     """
-    try:
-        fp = meta.get("file_path")
-        if not fp or not os.path.exists(fp):
-            return None
-        with open(fp, encoding="utf-8") as f:
-            data = json.load(f)
-        q = data.get("question", "")
-        opts = data.get("options", [])
-        if not q:
-            return None
-        opt_str = " ".join(f"{opt.get('number')}. {opt.get('text')}" for opt in opts)
-        return f"{q}  {opt_str}"
-    except Exception:
-        return None
+    return prompt_from_meta(meta)
 
 def extract_marker_map(text: str, window: int = 25):
     """
@@ -129,6 +118,9 @@ class SearchExpandGUI:
         self.api_key = tk.StringVar(value=os.environ.get("OPENAI_API_KEY", ""))
         
         self.setup_ui()
+        # 필터/난이도만 바꾸면 캐시된 결과를 재정렬 (재임베딩·재검색 없음)
+        self.selected_type.trace_add("write", self.rerank_cached)
+        self.target_level.trace_add("write", self.rerank_cached)
         
     def setup_ui(self):
         # 메인 프레임
@@ -280,12 +272,15 @@ class SearchExpandGUI:
             
         global cli, col
         try:
+            from openai import OpenAI   # 창을 띄운 뒤 키 설정 시점에 로드
             cli = OpenAI(api_key=key)
             # 연결 테스트
             cli.models.list()
             
-            # ChromaDB 컬렉션 초기화
-            col = chromadb.PersistentClient(path=DB).get_collection(COL)
+            # 벡터 컬렉션 초기화 (검색 서버가 있으면 원격, 없으면 SN_INDEX_BACKEND 로 직접)
+            col = connect_collection(DB, COL)
+            check_collection(col, LOCAL_MODEL)
+            query_cache.clear()
             
             messagebox.showinfo("성공", "API 키가 설정되었습니다.")
         except Exception as e:
@@ -356,10 +351,11 @@ class SearchExpandGUI:
         if not col:
             # API 없이도 로컬 검색 가능하게 컬렉션만 초기화
             try:
-                client = chromadb.PersistentClient(path=DB)
-                globals()["col"] = client.get_collection(COL)
+                new_col = connect_collection(DB, COL)
+                check_collection(new_col, LOCAL_MODEL)
+                globals()["col"] = new_col
             except Exception as e:
-                messagebox.showerror("오류", f"ChromaDB 초기화 실패: {str(e)}")
+                messagebox.showerror("오류", f"벡터 DB 초기화 실패: {str(e)}")
                 return
             
         self.query_text = self.text_input.get(1.0, tk.END).strip()
@@ -373,40 +369,10 @@ class SearchExpandGUI:
         self.root.update()
         
         try:
-            # 임베딩 생성
-            q_vec = embed(self.query_text)
-            
-            # 유사 지문 검색
-            hits = col.query(query_embeddings=[q_vec], n_results=TOP_K)
-            ids = hits["ids"][0]
-            metas = hits["metadatas"][0]
-            distances = hits["distances"][0]
-            
-            # 선택된 유형 필터링
-            type_filter = self.selected_type.get()
-            if type_filter != "전체":
-                candidates = [(doc_id, meta, dist) for doc_id, meta, dist in zip(ids, metas, distances)
-                            if meta.get("type") == type_filter]
-            else:
-                candidates = list(zip(ids, metas, distances))
-            
-            # 난이도 기반 강화 랭킹
-            user_lvl = self.target_level.get()
-            enhanced = []
-            for doc_id, meta, dist in candidates:
-                sim = 1 - dist
-                diff = abs(meta.get("reading_level", 0.5) - user_lvl)
-                score = 0.6 * sim - 0.3 * diff
-                enhanced.append((doc_id, meta, dist, sim, score))
-            # score 기준 정렬
-            self.candidates_sorted = sorted(enhanced, key=lambda x: x[4], reverse=True)[:8]
-            
-            # 결과 표시
-            self.result_listbox.delete(0, tk.END)
-            for idx, (_id, meta, dist, sim, score) in enumerate(self.candidates_sorted):
-                display_text = (f"{idx+1}. ID: {_id}, 유형: {meta.get('type')}, "
-                                f"유사도: {sim:.3f}, 난이도: {meta.get('reading_level',0.5):.2f}")
-                self.result_listbox.insert(tk.END, display_text)
+            # 임베딩 + 유사 지문 검색 (같은 지문이면 캐시된 벡터·결과 재사용)
+            _, hits = cached_query(query_cache, col, self.query_text, embed, TOP_K,
+                                   LOCAL_MODEL)
+            self.show_candidates(hits)
                 
         except Exception as e:
             messagebox.showerror("오류", f"검색 중 오류가 발생했습니다: {str(e)}")
@@ -414,6 +380,50 @@ class SearchExpandGUI:
         finally:
             self.root.config(cursor="")
             
+    def show_candidates(self, hits):
+        """col.query 원결과를 현재 유형 필터·목표 난이도로 재정렬해 표시 (임베딩·DB 호출 없음)"""
+        ids = hits["ids"][0]
+        metas = hits["metadatas"][0]
+        distances = hits["distances"][0]
+        
+        # 선택된 유형 필터링
+        type_filter = self.selected_type.get()
+        if type_filter != "전체":
+            candidates = [(doc_id, meta, dist) for doc_id, meta, dist in zip(ids, metas, distances)
+                        if meta.get("type") == type_filter]
+        else:
+            candidates = list(zip(ids, metas, distances))
+        
+        # 난이도 기반 강화 랭킹
+        user_lvl = self.target_level.get()
+        enhanced = []
+        for doc_id, meta, dist in candidates:
+            sim = 1 - dist
+            diff = abs(meta.get("reading_level", 0.5) - user_lvl)
+            score = 0.6 * sim - 0.3 * diff
+            enhanced.append((doc_id, meta, dist, sim, score))
+        # score 기준 정렬
+        self.candidates_sorted = sorted(enhanced, key=lambda x: x[4], reverse=True)[:8]
+        
+        # 결과 표시
+        self.result_listbox.delete(0, tk.END)
+        for idx, (_id, meta, dist, sim, score) in enumerate(self.candidates_sorted):
+            display_text = (f"{idx+1}. ID: {_id}, 유형: {meta.get('type')}, "
+                            f"유사도: {sim:.3f}, 난이도: {meta.get('reading_level',0.5):.2f}")
+            self.result_listbox.insert(tk.END, display_text)
+
+    def rerank_cached(self, *_):
+        """필터/난이도 변경 시 캐시에 있는 검색 결과만 다시 정렬"""
+        if not col or not self.query_text:
+            return
+        text = self.text_input.get(1.0, tk.END).strip()
+        if text != self.query_text:
+            return
+        _, hits = cached_query(query_cache, col, text, embed, TOP_K,
+                               LOCAL_MODEL, compute=False)
+        if hits is not None:
+            self.show_candidates(hits)
+            
     def on_select(self, event):
         selected_indices = self.result_listbox.curselection()
         if not selected_indices:
@@ -0,0 +1,971 @@
+#!/usr/bin/env python3
+"""
+통합 DB 구축 파이프라인
+load → dedup → analyze → chunk → embed → score → store 를 배치 단위로 흘려 보낸다.
+전체 docs / embs / metas 리스트를 메모리에 들고 있지 않으므로 대용량 코퍼스도
+배치 크기 + 유사도 계산용 벡터 행렬(N×dim float32) 정도의 메모리로 구축된다.
+
+- 임베딩 백엔드: openai (text-embedding-3, Matryoshka 축소) | local (SentenceTransformer, 청크‑평균)
+- 인덱스 백엔드: chroma | numpy (SN_INDEX_BACKEND 또는 --index-backend)
+- 저장: 백그라운드 스레드가 WRITE_BATCH 단위로 upsert (임베딩과 겹쳐 실행),
+        완료 ID 는 <db>/<컬렉션>.progress 에 기록 → --resume 으로 이어서 구축
+- 단계별 계측: sn_profile.StageProfiler (SN_PROFILE_DIR 에 JSON 리포트)
+
+사용 예:
+    python sn_build.py --src ./db                                  # 로컬 KURE, ./sn_csat_2.db
+    python sn_build.py --src ./db --embed local --max-tok 512      # Windows 설정과 동일
+    python sn_build.py --src ./db --embed openai --dim 512         # ./sn_csat.db, sn_csat_openai_d512
+    python sn_build.py --src ./db --resume                         # 중단된 구축 이어서
+    python sn_build.py --src ./db --max-tok 512 --rebuild          # 청크 설정을 바꿔 처음부터 다시
+    python sn_build.py --src ./big --novelty ann --ann-ef 128      # HNSW 근사 max_sem_sim
+    python sn_build.py --src ./db --chunk-index                    # + sn_csat_openai_chunks
+    python sn_build.py --src ./db --chunker kiwi --chunk-overlap 32  # Kiwi 문장 단위 청크
+    python sn_build.py --src ./db --chunk-tokenizer model          # KURE 토크나이저로 청크 예산
+"""
+
+import os
+import re
+import time
+import argparse
+import queue
+import threading
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from sn_index import open_collection, drop_collection, chunk_collection_name
+from sn_text import (NearDupIndex, NEAR_DUP_THRESHOLD, merge_text, readability_kor,
+                     get_encoder as _get_enc)
+from sn_record import QuestionRecord, iter_records, fill_pos
+from sn_profile import StageProfiler
+from sn_embed import (openai_embed, collection_name, embed_metadata, check_collection,
+                      QueryCache, NATIVE_DIMS, OPENAI_EMBED_MODEL, OPENAI_EMBED_DIM)
+# 무거운 모듈(tiktoken, sentence_transformers, openai, chromadb)은 처음 쓰일 때 로드
+
+LOCAL_EMBED_MODEL = os.environ.get("EMBED_MODEL", "nlpai-lab/KURE-v1")
+BATCH_SIZE = 64
+WRITE_BATCH = int(os.environ.get("SN_WRITE_BATCH", "256"))   # Chroma 최대 배치(수천)보다 작게
+BASE_COL_NAME = "sn_csat_openai"   # 기존 컬렉션명 유지
+DEFAULT_DB = {"openai": "./sn_csat.db", "local": "./sn_csat_2.db"}
+
+
+# ── ❶ 문항 변환 유틸 ─────────────────────────
+def clean_metadata(item: dict, path: str) -> Dict:
+    """None, dict, list 값을 제거한 메타데이터 (Chroma는 dict/list 허용하지 않음) + group, file_path"""
+    return QuestionRecord.coerce(item, path).metadata()
+
+
+# ── ❷ 청크 분할 ──────────────────────────────
+CHUNKERS = ("regex", "regex_nl", "kiwi")
+# 정규식 문장 경계: regex 는 기존 빌더 그대로(raw 문자열의 \\n 은 줄바꿈이 아니라 '\\'·'n' 뒤에서 자름),
+# regex_nl 은 실제 줄바꿈에서 자름. 이미 구축된 컬렉션과 쿼리 청크가 같도록 regex 는 바꾸지 않는다.
+SENT_SPLIT = {"regex": r"(?<=[.!?\\n])", "regex_nl": r"(?<=[.!?\n])"}
+
+
+def chunk_text(text: str, max_tokens: int = 256, chunker: str = "regex") -> List[str]:
+    """
+    주어진 문자열을 최대 max_tokens 토큰 길이로 나눠 리스트 반환.
+    문장 경계를 우선 고려하되, 길이 초과 시 강제로 자름.
+    """
+    enc = _get_enc()
+    sents = re.split(SENT_SPLIT[chunker], text)
+    chunks, current = [], ""
+    for s in sents:
+        if not s.strip():
+            continue
+        if len(enc.encode(current + s)) <= max_tokens:
+            current += s
+        else:
+            if current:
+                chunks.append(current.strip())
+            # 길면 문장 단위 무시하고 hard‑split
+            while len(enc.encode(s)) > max_tokens:
+                head_tokens = enc.encode(s)[:max_tokens]
+                chunks.append(enc.decode(head_tokens))
+                s = enc.decode(enc.encode(s)[max_tokens:])
+            current = s
+    if current:
+        chunks.append(current.strip())
+    return chunks or [text[:max_tokens]]
+
+
+class TokenBudget:
+    """
+    청크 토큰 수 계산기
+    - 기본: tiktoken cl100k_base (OpenAI text-embedding-3 과 같은 토크나이저)
+    - tokenizer 지정 시: 임베딩 모델 자체 HF fast 토크나이저로 배치 인코딩
+      모델이 붙이는 특수 토큰([CLS]/[SEP] 등) 수만큼 예산에서 뺀다 (reserve)
+    """
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer
+        self.name = "tiktoken" if tokenizer is None else "model"
+        self.reserve = 0 if tokenizer is None else tokenizer.num_special_tokens_to_add(pair=False)
+
+    def lengths(self, texts: List[str]) -> List[int]:
+        if self.tokenizer is None:
+            return [len(t) for t in _get_enc().encode_ordinary_batch(texts)]
+        ids = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(t) for t in ids]
+
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        """토큰 경계에서 max_tokens 개씩 강제 분할"""
+        if self.tokenizer is None:
+            enc = _get_enc()
+            tokens = enc.encode(text)
+            return [enc.decode(tokens[s:s + max_tokens]).strip()
+                    for s in range(0, len(tokens), max_tokens)]
+        # 모델 토크나이저 decode 는 띄어쓰기를 복원하지 못하므로 원문을 오프셋으로 자름
+        offsets = self.tokenizer(text, add_special_tokens=False,
+                                 return_offsets_mapping=True)["offset_mapping"]
+        return [text[offsets[s][0]:offsets[min(s + max_tokens, len(offsets)) - 1][1]].strip()
+                for s in range(0, len(offsets), max_tokens)]
+
+
+def pack_sents(sents: List[str], lens: List[int], max_tokens: int,
+               overlap: int = 0, budget: Optional[TokenBudget] = None) -> List[str]:
+    """
+    문장을 순서대로 max_tokens 예산까지 채워 청크로 묶음 (lens = 문장별 토큰 수)
+    - overlap > 0 이면 직전 청크 끝 문장들(합계 overlap 토큰 이하)을 다음 청크 앞에 반복
+    - max_tokens 를 넘는 문장 하나는 budget 토크나이저 경계에서 강제 분할
+    """
+    budget = budget or TokenBudget()
+    chunks: List[str] = []
+    cur: List[str] = []
+    cur_lens: List[int] = []
+    for sent, n in zip(sents, lens):
+        if cur and sum(cur_lens) + n > max_tokens:
+            chunks.append(" ".join(cur))
+            keep, total = 0, 0
+            for m in reversed(cur_lens[1:]):       # 청크 전체를 반복하지는 않음
+                if total + m > overlap:
+                    break
+                keep, total = keep + 1, total + m
+            cur, cur_lens = cur[len(cur) - keep:], cur_lens[len(cur_lens) - keep:]
+            if sum(cur_lens) + n > max_tokens:
+                cur, cur_lens = [], []
+        if n > max_tokens:                         # 이 시점에 cur 는 비어 있음
+            pieces = budget.split(sent, max_tokens)
+            chunks.extend(pieces[:-1])
+            sent = pieces[-1]
+            n = budget.lengths([sent])[0]
+        cur.append(sent)
+        cur_lens.append(n)
+    if cur:
+        chunks.append(" ".join(cur))
+    return chunks
+
+
+def chunk_docs(docs: List[str], max_tokens: int = 256, chunker: str = "regex",
+               overlap: int = 0, budget: Optional[TokenBudget] = None) -> List[List[str]]:
+    """
+    문서별 청크 리스트
+    - regex: 기존 빌더의 문장부호 정규식 문장 (tiktoken 예산이면 기존 chunk_text 그대로)
+    - regex_nl: regex 에 실제 줄바꿈 경계 추가
+    - kiwi : Kiwi split_into_sents 문장
+    문장 → 토큰 예산 패킹 (+ overlap 토큰 겹침), 문장 토큰 수는 budget 배치 인코딩으로 한 번만 계산
+    budget: 예산 토크나이저 (기본 tiktoken, 모델 토크나이저면 특수 토큰 수를 뺀 예산)
+    """
+    budget = budget or TokenBudget()
+    if chunker in SENT_SPLIT and budget.tokenizer is None:
+        return [chunk_text(doc, max_tokens, chunker) for doc in docs]
+    if chunker in SENT_SPLIT:
+        doc_sents = [[s.strip() for s in re.split(SENT_SPLIT[chunker], doc) if s.strip()]
+                     for doc in docs]
+    elif chunker == "kiwi":
+        from sn_text import split_sents_batch
+        doc_sents = split_sents_batch(docs)
+    else:
+        raise ValueError(f"알 수 없는 청크 분할기: {chunker} (가능: {', '.join(CHUNKERS)})")
+    size = max_tokens - budget.reserve
+    flat = [s for sents in doc_sents for s in sents]
+    # 청크 안에서 문장은 공백으로 이어지므로 앞 공백을 포함해 센다 (예산 보수적)
+    flat_lens = budget.lengths([" " + s for s in flat])
+    out, pos = [], 0
+    for doc, sents in zip(docs, doc_sents):
+        lens = flat_lens[pos:pos + len(sents)]
+        pos += len(sents)
+        out.append(pack_sents(sents, lens, size, overlap, budget) or [doc[:max_tokens]])
+    return out
+
+
+# ── ❸ 임베딩 백엔드 ──────────────────────────
+class OpenAIEmbedder:
+    """OpenAI 임베딩 (문서 전체를 한 번에, 지수 백오프 재시도)"""
+    name = "openai"
+    max_tokens = None       # 청크 분할 없음
+
+    def __init__(self, model: str = OPENAI_EMBED_MODEL, dim: Optional[int] = OPENAI_EMBED_DIM,
+                 max_retry: int = 5, backoff: int = 2, on_usage=None):
+        self.model = model
+        self.dim = dim
+        self.max_retry = max_retry
+        self.backoff = backoff
+        self.on_usage = on_usage
+        self._client = None
+
+    def metadata(self) -> Dict:
+        return embed_metadata(self.model, self.dim)
+
+    def budget(self) -> TokenBudget:
+        return TokenBudget()    # text-embedding-3 토크나이저 = cl100k_base
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        from openai import OpenAI, RateLimitError, APIError, APIConnectionError, Timeout
+        if self._client is None:
+            self._client = OpenAI(timeout=60)   # 60‑sec client‑side timeout
+        for attempt in range(1, self.max_retry + 1):
+            try:
+                return openai_embed(self._client, texts, self.model, self.dim,
+                                    on_usage=self.on_usage)
+            except (RateLimitError, APIError, APIConnectionError, Timeout) as e:
+                wait = self.backoff ** attempt
+                print(f"⚠️  Embed attempt {attempt}/{self.max_retry} failed: {e} → retry in {wait}s")
+                time.sleep(wait)
+        raise RuntimeError(f"Embedding failed after {self.max_retry} attempts")
+
+
+class LocalEmbedder:
+    """
+    SentenceTransformer CPU 임베딩 (max_tokens 청크로 나눈 뒤 청크 벡터 평균)
+    chunk_tokenizer="model" 이면 청크 예산을 tiktoken 대신 모델 자체 토크나이저로 계산
+    (max_seq_length 초과로 잘리는 청크·예산을 덜 채운 청크가 없어짐)
+    """
+    name = "local"
+    dim = None
+
+    def __init__(self, model: str = LOCAL_EMBED_MODEL, max_tokens: int = 256,
+                 device: str = "cpu", batch_size: int = 4, chunk_tokenizer: str = "tiktoken"):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.device = device            # Apple MPS scratch‑pad OOM 회피를 위해 기본 CPU
+        self.batch_size = batch_size
+        self.chunk_tokenizer = chunk_tokenizer
+        self._model = None
+
+    def metadata(self) -> Dict:
+        return embed_metadata(self.model)
+
+    def budget(self) -> TokenBudget:
+        if self.chunk_tokenizer == "model":
+            return TokenBudget(self._get_model().tokenizer)
+        return TokenBudget()
+
+    def _get_model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model, device=self.device)
+            # Limit sequence length so attention buffer stays small
+            try:
+                self._model.max_seq_length = self.max_tokens
+                self._model.tokenizer.model_max_length = self.max_tokens
+            except AttributeError:
+                pass
+        return self._model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self._get_model().encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+
+
+EMBEDDERS = {"openai": OpenAIEmbedder, "local": LocalEmbedder}
+CHUNK_TOKENIZERS = ("tiktoken", "model")
+
+
+class CachedEmbedder:
+    """
+    임베딩 백엔드 + 텍스트별 벡터 LRU 캐시 (쿼리용)
+    embed(texts) 는 캐시에 없는 텍스트만 한 번의 배치로 임베딩하고,
+    그 외 속성(model, dim, metadata, budget …)은 원 백엔드에 위임한다.
+    쿼리도 문서와 같은 embed_docs 경로(청크 → 청크 벡터 평균)로 임베딩하므로
+    긴 지문 쿼리가 max_seq_length 에서 잘리지 않고 저장된 문서와 같은 표현이 된다.
+    chunker / overlap 은 컬렉션 구축 때와 같아야 한다 (query_embedder 가 메타데이터에서 읽음).
+    """
+
+    def __init__(self, embedder, cache: Optional[QueryCache] = None,
+                 chunker: str = "regex", overlap: int = 0):
+        self.embedder = embedder
+        self.cache = cache if cache is not None else QueryCache()
+        self.chunker = chunker
+        self.overlap = overlap
+
+    def __getattr__(self, name):
+        return getattr(self.embedder, name)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        scope = ("vec", self.embedder.model, self.embedder.dim, self.embedder.max_tokens,
+                 self.chunker, self.overlap)
+        keys = [self.cache.key(t, *scope) for t in texts]
+        vecs = [self.cache.get(k) for k in keys]
+        todo = [i for i, v in enumerate(vecs) if v is None]
+        if todo:
+            new = embed_docs(self.embedder, [texts[i] for i in todo], None,
+                             chunker=self.chunker, overlap=self.overlap)[0]
+            for i, v in zip(todo, new):
+                vecs[i] = v
+                self.cache.put(keys[i], v)
+        return np.stack(vecs) if vecs else np.zeros((0, 0), dtype=np.float32)
+
+
+def chunk_metadata(embedder, chunker: str = "regex", overlap: int = 0) -> Dict:
+    """청크 평균 백엔드의 청크 설정 (컬렉션 메타데이터에 기록 → 쿼리도 같은 설정으로 임베딩)"""
+    if not embedder.max_tokens:
+        return {}
+    return {"embed_max_tok": embedder.max_tokens, "embed_chunker": chunker,
+            "embed_chunk_overlap": overlap,
+            "embed_chunk_tokenizer": getattr(embedder, "chunk_tokenizer", "tiktoken")}
+
+
+# 청크 설정이 기록되지 않은(이전) 컬렉션은 query_embedder 가 쓰는 기본값으로 구축된 것으로 본다
+_CHUNK_DEFAULTS = {"embed_chunker": "regex", "embed_chunk_overlap": 0,
+                   "embed_chunk_tokenizer": "tiktoken"}
+
+
+def check_chunk_settings(col, embedder, chunker: str = "regex", overlap: int = 0):
+    """
+    컬렉션 메타데이터의 청크 설정과 이번 구축 설정이 다르면 ValueError
+    get_or_create 는 처음 저장된 메타데이터를 유지하므로, 다른 설정으로 이어서 쓰면
+    청크 방식이 섞인 벡터에 첫 구축의 설정으로 쿼리를 임베딩하게 된다.
+    """
+    want = chunk_metadata(embedder, chunker, overlap)
+    if not want or not col.count():
+        return
+    have = {**_CHUNK_DEFAULTS, **(col.metadata or {})}
+    diff = {k: (have.get(k), v) for k, v in want.items() if have.get(k) != v}
+    if diff:
+        detail = ", ".join(f"{k} {a} → {b}" for k, (a, b) in diff.items())
+        raise ValueError(f"컬렉션 '{col.name}' 의 청크 설정이 다릅니다 ({detail}). "
+                         f"--rebuild 로 지우고 다시 구축하거나 다른 컬렉션명을 쓰세요.")
+
+
+def embedder_from_metadata(meta: Optional[Dict], max_tokens: int = 256):
+    """
+    컬렉션 메타데이터(embed_model, embed_dim, embed_max_tok …) → 같은 벡터를 만드는 임베딩 백엔드
+    - text-embedding-* : OpenAIEmbedder (축소 차원이면 같은 dimensions)
+    - 그 외           : LocalEmbedder (구축 때 청크 토큰 수, 기록이 없으면 max_tokens)
+    - 서명이 없으면 None
+    """
+    model = (meta or {}).get("embed_model")
+    if not model:
+        return None
+    if model.startswith("text-embedding-"):
+        dim = meta.get("embed_dim")
+        return OpenAIEmbedder(model, dim if dim and dim != NATIVE_DIMS.get(model) else None)
+    return LocalEmbedder(model, meta.get("embed_max_tok") or max_tokens,
+                         chunk_tokenizer=meta.get("embed_chunk_tokenizer", "tiktoken"))
+
+
+def query_embedder(meta: Optional[Dict], cache: Optional[QueryCache] = None,
+                   max_tokens: int = 256) -> Optional[CachedEmbedder]:
+    """컬렉션 메타데이터 → 구축 때와 같은 청크 설정의 캐시 쿼리 임베딩 백엔드 (서명이 없으면 None)"""
+    embedder = embedder_from_metadata(meta, max_tokens)
+    if embedder is None:
+        return None
+    return CachedEmbedder(embedder, cache, chunker=meta.get("embed_chunker", "regex"),
+                          overlap=int(meta.get("embed_chunk_overlap", 0)))
+
+
+# ── ❹ 최대 유사도 (의미·형식) ─────────────────
+class NoveltyScorer:
+    """
+    각 문항의 '앞서 나온 문항' 대비 최대 의미 유사도(코사인)와 최대 형식 유사도(품사 Jaccard)
+    기존 이중 루프와 같은 값을 배치 행렬곱으로 계산한다. 첫 문항은 1.0.
+    - 의미: 정규화 벡터 행렬과 내적
+    - 형식: 지문 그룹별 품사 0/1 벡터 → 교집합 = 내적, 합집합 = |A|+|B|−교집합
+    """
+
+    def __init__(self):
+        self._vecs = None               # (용량×dim) 정규화 벡터
+        self._n = 0
+        self._tags: Dict[str, int] = {}  # 품사 태그 → 열 번호
+        self._groups: Dict[str, int] = {}
+        self._gmat = np.zeros((0, 64), dtype=np.float32)
+
+    def known(self, group: str) -> bool:
+        return group in self._groups
+
+    @staticmethod
+    def _grow(mat: np.ndarray, rows: int, cols: int) -> np.ndarray:
+        if rows <= mat.shape[0] and cols <= mat.shape[1]:
+            return mat
+        # 모자란 축만 2배씩 늘림
+        r, c = mat.shape
+        r = max(rows, r * 2) if rows > r else r
+        c = max(cols, c * 2) if cols > c else c
+        out = np.zeros((r, c), dtype=mat.dtype)
+        out[:mat.shape[0], :mat.shape[1]] = mat
+        return out
+
+    def _keep(self, q: np.ndarray, n: int):
+        """정규화 벡터를 누적 행렬에 추가 (정확 계산용)"""
+        if self._vecs is None:
+            self._vecs = np.zeros((max(len(q), 1024), q.shape[1]), dtype=np.float32)
+        self._vecs = self._grow(self._vecs, n + len(q), q.shape[1])
+        self._vecs[n:n + len(q)] = q
+
+    def _add_group(self, group: str, tags: set):
+        for t in tags:
+            self._tags.setdefault(t, len(self._tags))
+        g = len(self._groups)
+        self._gmat = self._grow(self._gmat, g + 1, len(self._tags))
+        for t in tags:
+            self._gmat[g, self._tags[t]] = 1.0
+        self._groups[group] = g
+
+    def score(self, vecs: np.ndarray, groups: List[str],
+              tags_by_group: Dict[str, set]) -> Tuple[List[float], List[float]]:
+        """배치 점수 계산 후 배치를 누적 상태에 추가 (groups 순서 = 입력 순서)"""
+        q = np.asarray(vecs, dtype=np.float32)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(norms == 0, 1.0, norms)
+        b, n = len(q), self._n
+
+        self._keep(q, n)
+        self._n = n + b
+
+        sem = self._sem_max(q, n)
+
+        # 그룹은 처음 등장 순서로 번호를 매기므로 '앞선 그룹' = 번호 prefix
+        prefix, rows = [], []
+        for group in groups:
+            prefix.append(len(self._groups))
+            if group not in self._groups:
+                self._add_group(group, tags_by_group.get(group) or set())
+            rows.append(self._groups[group])
+        ng = len(self._groups)
+        gm = self._gmat[:ng, :max(len(self._tags), 1)]
+        sizes = gm.sum(axis=1)
+        # 앞서 나온 그룹이면 자기 그룹과의 Jaccard 1.0 이 최대 (품사 없으면 0.0)
+        struct = np.where(sizes[rows] > 0, 1.0, 0.0)
+        first = [k for k in range(b) if rows[k] >= prefix[k]]   # 이 배치에서 처음 나온 그룹
+        if first:
+            fr = [rows[k] for k in first]
+            inter = (gm[fr] @ gm.T).astype(np.float64)   # 0/1 합이므로 정확한 정수
+            union = sizes[fr][:, None] + sizes[None, :] - inter
+            jac = np.where(union > 0, inter / np.maximum(union, 1), 0.0)
+            jac[np.arange(ng)[None, :] >= np.asarray([prefix[k] for k in first])[:, None]] = -np.inf
+            struct[first] = jac.max(axis=1)
+
+        sem_max, struct_max = [], []
+        for k in range(b):
+            if n + k == 0:              # 첫 항목은 자기 자신뿐
+                sem_max.append(1.0)
+                struct_max.append(1.0)
+                continue
+            sem_max.append(float(sem[k]))
+            struct_max.append(float(struct[k]))
+        return sem_max, struct_max
+
+    def _sem_max(self, q: np.ndarray, n: int) -> np.ndarray:
+        """배치 각 항목(전역 순번 n+k)의 앞선 항목 대비 최대 코사인 (정확 계산)"""
+        b = len(q)
+        sem = q @ self._vecs[:n + b].T
+        sem[np.arange(b)[:, None] <= np.arange(n + b)[None, :] - n] = -np.inf
+        return sem.max(axis=1)
+
+
+class AnnNoveltyScorer(NoveltyScorer):
+    """
+    max_sem_sim 을 HNSW 근사 최근접 이웃으로 계산 (대규모 문항 은행용, O(n log n))
+    - 이전 배치: hnswlib(Chroma 가 쓰는 HNSW 구현) knn_query(k=1), ef 가 클수록 정확·느림
+    - 같은 배치 안: 정확 계산 (b×b)
+    - 무작위 표본 check 개는 끝에서 정확 값과 비교 → accuracy_report()
+    - 벡터는 인덱스에만 저장 (N×dim 사본 없음). 표본 벡터만 따로 두고,
+      정확 값은 get_items 로 블록 단위로 읽어 계산
+    max_struct_sim 은 지문 그룹 단위라 항목 수보다 훨씬 작으므로 정확 계산 유지.
+    """
+
+    READ_BLOCK = 4096   # accuracy_report 에서 get_items 로 한 번에 읽는 행 수
+
+    def __init__(self, ef: int = 64, m: int = 16, ef_construction: int = 100,
+                 check: int = 200, seed: int = 0):
+        super().__init__()
+        import hnswlib   # requirements.txt (hnswlib)
+        self._hnswlib = hnswlib
+        self.ef = ef
+        self.m = m
+        self.ef_construction = ef_construction
+        self.check = check
+        self._index = None
+        self._rng = np.random.default_rng(seed)
+        self._samples: List[Tuple[int, float, int, np.ndarray]] = []   # (전역 순번, 근사 값, 근사 이웃, 벡터)
+        self._seen = 0
+
+    def _ensure_index(self, dim: int, need: int):
+        if self._index is None:
+            self._index = self._hnswlib.Index(space="ip", dim=dim)
+            self._index.init_index(max_elements=max(need, 1024),
+                                   ef_construction=self.ef_construction, M=self.m)
+            self._index.set_ef(self.ef)
+        elif need > self._index.get_max_elements():
+            self._index.resize_index(max(need, self._index.get_max_elements() * 2))
+
+    def _sem_max(self, q: np.ndarray, n: int) -> np.ndarray:
+        b = len(q)
+        self._ensure_index(q.shape[1], n + b)
+        # 같은 배치 안의 앞선 항목: 정확
+        within = q @ q.T
+        within[np.triu_indices(b)] = -np.inf
+        best = within.max(axis=1)
+        label = n + within.argmax(axis=1)
+        # 이전 배치: HNSW (내적 거리 = 1 − 코사인)
+        if n:
+            labels, dists = self._index.knn_query(q, k=1)
+            prev = 1.0 - dists[:, 0]
+            use_prev = prev >= best
+            best = np.where(use_prev, prev, best)
+            label = np.where(use_prev, labels[:, 0], label)
+        self._index.add_items(q, np.arange(n, n + b))
+        self._sample(n, q, best, label)
+        return best
+
+    def _keep(self, q: np.ndarray, n: int):
+        """벡터는 HNSW 인덱스에만 둠 (_sem_max 에서 add_items)"""
+
+    def _sample(self, n: int, q: np.ndarray, best: np.ndarray, label: np.ndarray):
+        """저장소 표집(reservoir)으로 정확도 점검용 항목 선택 (첫 항목 제외)"""
+        for k in range(len(best)):
+            i = n + k
+            if i == 0 or self.check <= 0:
+                continue
+            self._seen += 1
+            item = (i, float(best[k]), int(label[k]), q[k].copy())
+            if len(self._samples) < self.check:
+                self._samples.append(item)
+            else:
+                j = int(self._rng.integers(self._seen))
+                if j < self.check:
+                    self._samples[j] = item
+
+    def accuracy_report(self) -> Dict:
+        """표본 항목의 근사 max_sem_sim 을 정확 값과 비교"""
+        if not self._samples:
+            return {"ef": self.ef, "m": self.m, "samples": 0}
+        pos = np.array([s[0] for s in self._samples])
+        approx = np.array([s[1] for s in self._samples])
+        nn = np.array([s[2] for s in self._samples])
+        sv = np.stack([s[3] for s in self._samples])
+        # 앞선 항목 전체를 인덱스에서 블록 단위로 읽어 표본별 정확 최댓값 갱신
+        exact = np.full(len(pos), -np.inf, dtype=np.float32)
+        arg = np.zeros(len(pos), dtype=np.int64)
+        for s in range(0, int(pos.max()), self.READ_BLOCK):
+            e = min(s + self.READ_BLOCK, int(pos.max()))
+            rows = np.asarray(self._index.get_items(list(range(s, e))), dtype=np.float32)
+            sims = sv @ rows.T
+            sims[np.arange(s, e)[None, :] >= pos[:, None]] = -np.inf
+            top = sims.max(axis=1)
+            better = top > exact
+            arg = np.where(better, s + sims.argmax(axis=1), arg)
+            exact = np.where(better, top, exact)
+        exact = exact.astype(np.float64)
+        errs = exact - approx          # 근사는 정확 값 이하
+        same_round = int((np.round(exact, 4) == np.round(approx, 4)).sum())
+        same_nn = int(((arg == nn) | (np.abs(errs) < 1e-6)).sum())
+        return {
+            "ef": self.ef,
+            "m": self.m,
+            "samples": len(self._samples),
+            "recall_at_1": round(same_nn / len(self._samples), 4),
+            "match_4dp": round(same_round / len(self._samples), 4),
+            "mean_abs_err": round(float(np.abs(errs).mean()), 6),
+            "max_abs_err": round(float(np.abs(errs).max()), 6),
+        }
+
+
+# ── ❺ 스트리밍 저장 ──────────────────────────
+class StreamWriter:
+    """
+    백그라운드 스레드에서 batch_size 단위로 col.upsert 하는 쓰기 큐
+    - put() 은 대기 중인 배치가 max_pending 개를 넘으면 기다림 (메모리 상한)
+    - 쓰기 스레드의 예외는 다음 put()/close() 에서 호출 스레드로 다시 발생
+    - upsert 가 끝난 ID 는 progress 파일에 한 줄씩 추가 (resume=True 면 읽어서 done 에 반영)
+    - chunk_col 이 있으면 문항보다 그 청크 행을 먼저 upsert (progress 에 있는 문항은 청크도 저장됨)
+    - 쓰기 시간은 prof.thread("writer") 의 "write" 단계에 기록 (메인 스레드 단계와 분리)
+    """
+
+    def __init__(self, col, batch_size: int = WRITE_BATCH, progress_path: Optional[str] = None,
+                 resume: bool = False, max_pending: int = 4,
+                 prof: Optional[StageProfiler] = None, chunk_col=None):
+        self.col = col
+        self.chunk_col = chunk_col
+        self.batch_size = batch_size
+        self.progress_path = progress_path
+        self.prof = prof.thread("writer") if prof is not None else None
+        self.lock = threading.Lock()     # 쓰기 중 col 읽기(resume 벡터 조회) 직렬화
+        self.done = set()
+        self.written = 0
+        if progress_path and resume and os.path.exists(progress_path):
+            with open(progress_path, encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        elif progress_path and os.path.exists(progress_path):
+            os.remove(progress_path)
+        self._buf = ([], [], [], [], [])   # ids, docs, embs, metas, 문항별 청크 행
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="sn-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            if self._error is not None:
+                continue                # 실패 이후 배치는 버림 (progress 에 남지 않음)
+            try:
+                if self.prof is not None:
+                    with self.prof.stage("write", items=len(chunk[0])):
+                        self._write(*chunk)
+                else:
+                    self._write(*chunk)
+            except Exception as e:
+                self._error = e
+
+    def _write(self, ids, docs, embs, metas, chunks):
+        rows = [row for item_rows in chunks if item_rows for row in item_rows]
+        with self.lock:
+            for s in range(0, len(rows), self.batch_size):
+                part = rows[s:s + self.batch_size]
+                self.chunk_col.upsert(
+                    ids=[r[0] for r in part], documents=[r[1] for r in part],
+                    embeddings=np.asarray([r[2] for r in part], dtype=np.float32).tolist(),
+                    metadatas=[r[3] for r in part])
+            self.col.upsert(ids=ids, documents=docs,
+                            embeddings=np.asarray(embs, dtype=np.float32).tolist(),
+                            metadatas=metas)
+        if self.progress_path:
+            with open(self.progress_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{_id}\n" for _id in ids))
+                f.flush()
+                os.fsync(f.fileno())
+        self.written += len(ids)
+
+    def _check(self):
+        if self._error is not None:
+            raise RuntimeError(f"DB 쓰기 실패 ({self.written}개 저장 후): {self._error}") \
+                from self._error
+
+    def put(self, ids: List[str], docs: List[str], embs, metas: List[Dict],
+            chunks: Optional[List[List[Tuple]]] = None):
+        """chunks: 문항별 [(청크 ID, 텍스트, 벡터, 메타데이터), ...] (청크 인덱스 사용 시)"""
+        self._check()
+        chunks = chunks if chunks is not None else [None] * len(ids)
+        for buf, values in zip(self._buf, (ids, docs, list(embs), metas, chunks)):
+            buf.extend(values)
+        while len(self._buf[0]) >= self.batch_size:
+            self._send(self.batch_size)
+
+    def _send(self, n: int):
+        chunk = tuple(buf[:n] for buf in self._buf)
+        for buf in self._buf:
+            del buf[:n]
+        self._queue.put(chunk)
+
+    def fetch(self, ids: List[str]) -> np.ndarray:
+        """이미 저장된 ID 의 벡터를 ids 순서대로 조회 (resume 시 유사도 계산용)"""
+        with self.lock:
+            got = self.col.get(ids=ids, include=["embeddings"])
+        row = {_id: k for k, _id in enumerate(got["ids"])}
+        missing = [_id for _id in ids if _id not in row]
+        if missing:
+            raise RuntimeError(f"progress 에 있으나 컬렉션에 없는 ID: {missing[:5]}")
+        embs = np.asarray(got["embeddings"], dtype=np.float32)
+        return embs[[row[_id] for _id in ids]]
+
+    def close(self):
+        """남은 버퍼를 보내고 쓰기 스레드 종료까지 대기"""
+        if self._buf[0] and self._error is None:
+            self._send(len(self._buf[0]))
+        self._queue.put(None)
+        self._thread.join()
+        self._check()
+
+
+# ── ❻ 파이프라인 ─────────────────────────────
+def chunk_meta_rows(parent_id: str, meta: Dict, chunks) -> List[Tuple]:
+    """문항 청크 → 청크 컬렉션 행 (ID, 텍스트, 벡터, 메타데이터)"""
+    base = {"parent_id": parent_id, "group": meta["group"]}
+    if "type" in meta:
+        base["type"] = meta["type"]
+    return [(f"{parent_id}#c{n}", text, vec, {**base, "chunk_no": n})
+            for n, (text, vec) in enumerate(chunks)]
+
+
+def iter_items(src_dir: str) -> Iterator[Tuple[str, QuestionRecord]]:
+    """JSON 파일을 하나씩 읽어 (경로, 문항 레코드) 생성 (question 없는 파일은 건너뜀)"""
+    for record in iter_records(src_dir):
+        yield record.path, record
+
+
+def embed_docs(embedder, docs: List[str], prof: Optional[StageProfiler] = None,
+               chunk_tok: Optional[int] = None, chunker: str = "regex", overlap: int = 0):
+    """
+    chunk → embed → (문서 벡터, 문서별 [(청크 텍스트, 청크 벡터)] 또는 None)
+    - embedder.max_tokens 가 있으면 청크 벡터 평균, 없으면 문서 전체 임베딩
+    - chunk_tok 이 주어지면 청크 단위 인덱스용 청크도 반환
+      (청크 평균 백엔드는 같은 청크 벡터 재사용, 문서 전체 백엔드는 chunk_tok 청크를 따로 임베딩)
+    - chunker / overlap: chunk_docs 참고
+    - prof 가 없으면 저장하지 않는 임시 계측기 (쿼리 임베딩)
+    """
+    prof = prof or StageProfiler("embed_docs", out_dir=None)
+    size = embedder.max_tokens or chunk_tok
+    if not size:
+        with prof.stage("embed", items=len(docs)):
+            return np.asarray(embedder.embed(docs), dtype=np.float32), None
+    with prof.stage("chunk", items=len(docs)):
+        doc_chunks = chunk_docs(docs, size, chunker, overlap, embedder.budget())
+    texts = [c for chunks in doc_chunks for c in chunks]
+    bounds = np.cumsum([0] + [len(c) for c in doc_chunks])
+    if embedder.max_tokens:
+        with prof.stage("embed", items=len(texts)):   # 청크 수
+            flat = np.asarray(embedder.embed(texts), dtype=np.float32)
+            # 평균 풀링
+            vecs = np.stack([np.mean(flat[s:e], axis=0)
+                             for s, e in zip(bounds[:-1], bounds[1:])])
+    else:
+        with prof.stage("embed", items=len(docs)):
+            vecs = np.asarray(embedder.embed(docs), dtype=np.float32)
+        with prof.stage("embed_chunks", items=len(texts)):
+            flat = np.asarray(embedder.embed(texts), dtype=np.float32)
+    if not chunk_tok:
+        return vecs, None
+    return vecs, [list(zip(doc_chunks[d], flat[s:e]))
+                  for d, (s, e) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+
+def build(src_dir: str, db_path: str, col_name: str, embedder,
+          batch_size: int = BATCH_SIZE, backend: Optional[str] = None,
+          limit: Optional[int] = None, prof: Optional[StageProfiler] = None,
+          write_batch: int = WRITE_BATCH, resume: bool = False,
+          novelty: str = "exact", ann_ef: int = 64, ann_check: int = 200,
+          near_dup: float = NEAR_DUP_THRESHOLD, chunk_index: bool = False,
+          chunk_tok: int = 256, chunker: str = "regex", chunk_overlap: int = 0,
+          rebuild: bool = False) -> Dict:
+    """
+    src_dir 의 문항 JSON → 벡터 컬렉션 (배치 스트리밍)
+
+    Args:
+        embedder: OpenAIEmbedder / LocalEmbedder (embed(texts) → ndarray, metadata())
+        backend: "chroma" | "numpy" (기본: SN_INDEX_BACKEND)
+        limit: 앞에서부터 limit 개 문항만 구축 (벤치마크용)
+        prof: 단계 계측기 (기본: 새 StageProfiler, 종료 시 리포트 저장)
+        write_batch: upsert 1회당 항목 수
+        resume: progress 파일에 기록된 ID 는 임베딩·저장 생략 (유사도 계산에는 포함)
+        novelty: "exact" | "ann" (max_sem_sim 을 HNSW 근사로, ann_ef·ann_check 표본 정확도 리포트)
+        near_dup: 근사 중복 지문 MinHash Jaccard 임계값 (0 이면 passage_hash 그대로 그룹)
+        chunk_index: {col_name}_chunks 컬렉션에 청크 벡터도 저장 (청크 평균 백엔드는
+            max_tokens 청크를 재사용, 문서 전체 백엔드는 chunk_tok 청크를 추가 임베딩)
+        chunker: "regex" | "regex_nl" | "kiwi" (Kiwi 문장 분리 + 토큰 예산 패킹, chunk_overlap 토큰 겹침)
+        rebuild: 기존 컬렉션(청크 컬렉션·progress 포함)을 지우고 새로 구축
+            (기존 컬렉션의 모델·차원·청크 설정이 다르면 rebuild 없이는 ValueError)
+    Returns:
+        {"items", "collection", "report", "stages", "novelty"(ann 일 때)}
+    """
+    own_prof = prof is None
+    prof = prof or StageProfiler("sn_build")
+    prof.meta.update(embed=embedder.name, model=embedder.model, dim=embedder.dim,
+                     max_tok=embedder.max_tokens, collection=col_name, db=db_path,
+                     chunker=chunker, chunk_overlap=chunk_overlap,
+                     chunk_tokenizer=getattr(embedder, "chunk_tokenizer", "tiktoken"))
+    if embedder.name == "openai" and embedder.on_usage is None:
+        embedder.on_usage = lambda usage: prof.count("embed", tokens=usage.total_tokens)
+
+    if rebuild:
+        for name in (col_name, chunk_collection_name(col_name)):
+            if drop_collection(db_path, name, backend):
+                print(f"🗑  기존 컬렉션 삭제: {db_path}:{name}")
+        progress = os.path.join(db_path, f"{col_name}.progress")
+        if os.path.exists(progress):
+            os.remove(progress)
+    # SN_INDEX_BACKEND=numpy 면 Chroma 대신 NumPy 인덱스 사용
+    col = open_collection(db_path, col_name, create=True, backend=backend,
+                          metadata={"hnsw:space": "cosine", **embedder.metadata(),
+                                    **chunk_metadata(embedder, chunker, chunk_overlap)})
+    check_collection(col, embedder.model, embedder.dim)   # 다른 모델·차원 컬렉션이면 중단
+    check_chunk_settings(col, embedder, chunker, chunk_overlap)   # 다른 청크 설정이면 중단
+
+    chunk_col = None
+    if chunk_index:
+        # 청크 단위 인덱스: 청크마다 벡터 1개 + parent_id (검색 시 sn_index.query_parents 로 집계)
+        chunk_col = open_collection(
+            db_path, chunk_collection_name(col_name), create=True, backend=backend,
+            metadata={"hnsw:space": "cosine", "parent_collection": col_name,
+                      **embedder.metadata()})
+
+    os.makedirs(db_path, exist_ok=True)
+    writer = StreamWriter(col, write_batch, os.path.join(db_path, f"{col_name}.progress"),
+                          resume=resume, prof=prof, chunk_col=chunk_col)
+    scorer = make_scorer(novelty, ann_ef, ann_check)
+    dedup = NearDupIndex(near_dup)
+    items = iter_items(src_dir)
+    if limit:
+        items = islice(items, limit)
+    total = 0
+    try:
+        while True:
+            with prof.stage("load") as st:
+                batch = list(islice(items, batch_size))
+                st["items"] += len(batch)
+            if not batch:
+                break
+
+            # 근사 중복 지문(추출 잡음) → 처음 나온 지문의 그룹으로 통합
+            with prof.stage("dedup", items=len(batch)):
+                canon = [dedup.canonical(record.group, record.passage_text)
+                         for _, record in batch]
+
+            # 메타데이터·읽기 난이도·품사 (새로 나온 지문 그룹만 Kiwi 분석)
+            # 지문 해시·병합 텍스트 등 파생 값은 레코드에 한 번만 계산돼 캐시된다
+            with prof.stage("analyze", items=len(batch)):
+                ids = [record.id for _, record in batch]   # 고유 ID는 기존 JSON의 id 사용
+                docs = [record.text for _, record in batch]
+                metas = []
+                new_records: Dict[str, QuestionRecord] = {}
+                for (_, record), group in zip(batch, canon):
+                    meta = record.metadata()
+                    if group != meta["group"]:
+                        meta["group_exact"] = meta["group"]   # 원래 해시는 추적용으로 보존
+                        meta["group"] = group
+                    meta["reading_level"] = record.reading_level
+                    metas.append(meta)
+                    if not scorer.known(group):
+                        new_records.setdefault(group, record)
+                fill_pos(new_records.values())
+                tags = {group: record.pos_tags for group, record in new_records.items()}
+
+            # 이전 실행에서 저장된 항목은 임베딩 대신 컬렉션 벡터를 다시 읽어 유사도 계산에만 사용
+            todo = [k for k, _id in enumerate(ids) if _id not in writer.done]
+            rows, chunk_rows = {}, None
+            if todo:
+                new, new_chunks = embed_docs(embedder, [docs[k] for k in todo], prof,
+                                             chunk_tok if chunk_index else None,
+                                             chunker, chunk_overlap)
+                rows.update(zip(todo, new))
+            if len(todo) < len(ids):
+                with prof.stage("resume", items=len(ids) - len(todo)):
+                    skip = [k for k in range(len(ids)) if k not in rows]
+                    rows.update(zip(skip, writer.fetch([ids[k] for k in skip])))
+            embs = np.stack([rows[k] for k in range(len(ids))])
+
+            with prof.stage("score", items=len(docs)):
+                sem, struct = scorer.score(embs, [m["group"] for m in metas], tags)
+                for meta, s, t in zip(metas, sem, struct):
+                    meta["max_sem_sim"] = round(s, 4)
+                    meta["max_struct_sim"] = round(t, 4)
+
+            # 저장은 쓰기 스레드가 WRITE_BATCH 단위로 수행 (여기서는 큐가 빌 때까지 기다린 시간만 잼)
+            with prof.stage("queue_wait", items=len(todo)):
+                if todo and chunk_index:
+                    chunk_rows = [chunk_meta_rows(ids[k], metas[k], new_chunks[j])
+                                  for j, k in enumerate(todo)]
+                writer.put([ids[k] for k in todo], [docs[k] for k in todo],
+                           embs[todo], [metas[k] for k in todo], chunk_rows)
+            total += len(todo)
+            if todo:
+                print(f"  → Queued {total} items (written {writer.written})")
+    finally:
+        # 실패해도 이미 임베딩한 항목은 저장·progress 기록 후 종료 (--resume 으로 이어서)
+        with prof.stage("flush"):       # 남은 배치 쓰기가 끝날 때까지 대기
+            writer.close()
+    if writer.done:
+        print(f"⏩  Resumed: skipped {len(writer.done)} items already stored")
+    if dedup.merged():
+        prof.meta["near_dup_merged"] = dedup.merged()
+        print(f"🧬  Near-duplicate passages merged into canonical groups: {dedup.merged()}")
+    novelty_report = None
+    if isinstance(scorer, AnnNoveltyScorer):
+        novelty_report = prof.meta["novelty"] = scorer.accuracy_report()
+        print(f"🎯  ANN novelty (ef={scorer.ef}): recall@1 {novelty_report.get('recall_at_1')}, "
+              f"max |err| {novelty_report.get('max_abs_err')} on {novelty_report['samples']} samples")
+    print(f"✅  {total} items stored in {db_path}:{col_name}")
+    print("⏱  Stage timing: " + prof.summary())
+    report_path = prof.save() if own_prof else None
+    if report_path:
+        print(f"📊  Profile report → {report_path}")
+    return {"items": total, "collection": col_name, "report": report_path,
+            "stages": prof.report()["stages"], "novelty": novelty_report}
+
+
+def make_scorer(novelty: str = "exact", ef: int = 64, check: int = 200) -> NoveltyScorer:
+    """max 유사도 계산기 선택 (hnswlib 이 없으면 정확 계산으로 대체)"""
+    if novelty == "ann":
+        try:
+            return AnnNoveltyScorer(ef=ef, check=check)
+        except ImportError:
+            print("⚠️  hnswlib 미설치 → 정확 계산(exact) 사용")
+    return NoveltyScorer()
+
+
+def make_embedder(kind: str, model: Optional[str] = None, dim: Optional[int] = None,
+                  max_tokens: Optional[int] = None, device: str = "cpu",
+                  chunk_tokenizer: str = "tiktoken"):
+    """CLI 인자 → 임베딩 백엔드 인스턴스"""
+    if kind == "openai":
+        return OpenAIEmbedder(model or OPENAI_EMBED_MODEL, dim or OPENAI_EMBED_DIM)
+    return LocalEmbedder(model or LOCAL_EMBED_MODEL, max_tokens or 256, device,
+                         chunk_tokenizer=chunk_tokenizer)
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="수능 문항 벡터 DB 구축")
+    parser.add_argument("--src", default="./db", help="문항 JSON 폴더")
+    parser.add_argument("--embed", choices=sorted(EMBEDDERS), default="local",
+                        help="임베딩 백엔드 (기본 local)")
+    parser.add_argument("--model", help="임베딩 모델 (기본: OPENAI_EMBED_MODEL / EMBED_MODEL)")
+    parser.add_argument("--dim", type=int, help="OpenAI Matryoshka 축소 차원")
+    parser.add_argument("--max-tok", type=int, default=256, help="로컬 임베딩 청크 토큰 수")
+    parser.add_argument("--device", default="cpu", help="로컬 임베딩 장치")
+    parser.add_argument("--db", help="퍼시스턴스 디렉터리 (기본: openai ./sn_csat.db, local ./sn_csat_2.db)")
+    parser.add_argument("--col", default=BASE_COL_NAME, help="컬렉션명 (openai 축소 시 _d<dim> 접미사)")
+    parser.add_argument("--index-backend", choices=["chroma", "numpy"],
+                        help="인덱스 백엔드 (기본: SN_INDEX_BACKEND)")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="스트리밍 배치 크기")
+    parser.add_argument("--write-batch", type=int, default=WRITE_BATCH, help="upsert 1회당 항목 수")
+    parser.add_argument("--resume", action="store_true",
+                        help="<db>/<컬렉션>.progress 에 기록된 항목은 건너뛰고 이어서 구축")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="기존 컬렉션을 지우고 새로 구축 (모델·차원·청크 설정을 바꿀 때)")
+    parser.add_argument("--novelty", choices=["exact", "ann"], default="exact",
+                        help="max_sem_sim 계산 방식 (ann: HNSW 근사, 대규모 코퍼스용)")
+    parser.add_argument("--ann-ef", type=int, default=64, help="HNSW 검색 ef (클수록 정확·느림)")
+    parser.add_argument("--ann-check", type=int, default=200,
+                        help="정확 값과 비교할 표본 수 (0=점검 생략)")
+    parser.add_argument("--near-dup", type=float, default=NEAR_DUP_THRESHOLD,
+                        help="근사 중복 지문 통합 임계값 (문자 5‑gram Jaccard, 0=비활성)")
+    parser.add_argument("--chunk-index", action="store_true",
+                        help="<컬렉션>_chunks 에 청크 단위 벡터도 저장 (부분 지문 검색용)")
+    parser.add_argument("--chunk-tok", type=int, default=256,
+                        help="openai 백엔드 청크 인덱스의 청크 토큰 수 (local 은 --max-tok 사용)")
+    parser.add_argument("--chunker", choices=CHUNKERS, default="regex",
+                        help="청크 분할기 (regex_nl: 줄바꿈도 문장 경계, kiwi: Kiwi 문장 분리 + 토큰 예산 패킹)")
+    parser.add_argument("--chunk-overlap", type=int, default=0,
+                        help="kiwi 청크 간 겹칠 최대 토큰 수 (앞 청크 끝 문장 반복)")
+    parser.add_argument("--chunk-tokenizer", choices=CHUNK_TOKENIZERS, default="tiktoken",
+                        help="local 청크 예산 토크나이저 (model: 임베딩 모델 자체 토크나이저)")
+    parser.add_argument("--limit", type=int, help="앞에서부터 N개 문항만 구축")
+    args = parser.parse_args(argv)
+    if args.chunk_overlap and args.chunker != "kiwi":
+        parser.error("--chunk-overlap 은 --chunker kiwi 에서만 사용할 수 있습니다.")
+    if args.rebuild and args.resume:
+        parser.error("--rebuild 와 --resume 은 함께 쓸 수 없습니다.")
+
+    embedder = make_embedder(args.embed, args.model, args.dim, args.max_tok, args.device,
+                             args.chunk_tokenizer)
+    col_name = collection_name(args.col, embedder.dim)
+    print(f"🔧  Using embedding model: {embedder.model} ({embedder.name}, "
+          f"dim={embedder.dim or 'full'}, max_tok={embedder.max_tokens or '-'})")
+    build(args.src, args.db or DEFAULT_DB[args.embed], col_name, embedder,
+          batch_size=args.batch, backend=args.index_backend, limit=args.limit,
+          write_batch=args.write_batch, resume=args.resume,
+          novelty=args.novelty, ann_ef=args.ann_ef, ann_check=args.ann_check,
+          near_dup=args.near_dup, chunk_index=args.chunk_index, chunk_tok=args.chunk_tok,
+          chunker=args.chunker, chunk_overlap=args.chunk_overlap, rebuild=args.rebuild)
+
+
+if __name__ == "__main__":
+    main()
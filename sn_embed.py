@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+임베딩 공통 유틸
+- OpenAI text-embedding-3 계열 Matryoshka 차원 축소 (dimensions 파라미터)
+- 축소/절단 후 일관된 L2 재정규화
+- 컬렉션이 구축된 모델·차원과 쿼리 모델·차원이 다르면 검색 거부
+- 쿼리 벡터 / col.query 원결과 LRU 캐시 (같은 지문 재검색 시 재임베딩 생략)
+
+환경변수
+- OPENAI_EMBED_MODEL : OpenAI 임베딩 모델 (기본 text-embedding-3-large)
+- OPENAI_EMBED_DIM   : 축소 차원 (예: 256 / 512 / 1024, 미설정 시 모델 기본 차원)
+- SN_QUERY_CACHE_SIZE: 쿼리 캐시 항목 수 (기본 64, 0이면 비활성)
+"""
+
+import os
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+OPENAI_EMBED_MODEL = os.environ.get("OPENAI_EMBED_MODEL", "text-embedding-3-large")
+OPENAI_EMBED_DIM = int(os.environ.get("OPENAI_EMBED_DIM", "0")) or None
+QUERY_CACHE_SIZE = int(os.environ.get("SN_QUERY_CACHE_SIZE", "64"))
+
+# 모델별 기본 출력 차원
+NATIVE_DIMS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+    "nlpai-lab/KURE-v1": 1024,
+}
+# dimensions 파라미터(Matryoshka 절단)를 지원하는 모델
+MATRYOSHKA_MODELS = ("text-embedding-3-large", "text-embedding-3-small")
+
+
+def expected_dim(model: str, dim: Optional[int] = None) -> Optional[int]:
+    """축소 차원이 있으면 그 값, 없으면 모델 기본 차원 (모르면 None)"""
+    return dim or NATIVE_DIMS.get(model)
+
+
+def truncate_normalize(vecs, dim: Optional[int] = None) -> np.ndarray:
+    """앞쪽 dim 차원만 남기고 행 단위 L2 재정규화 (Matryoshka 절단과 동일)"""
+    mat = np.asarray(vecs, dtype=np.float32)
+    if mat.ndim == 1:
+        mat = mat[None, :]
+    if dim:
+        mat = mat[:, :dim]
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def openai_embed(client, texts: List[str], model: str = OPENAI_EMBED_MODEL,
+                 dim: Optional[int] = None, on_usage=None) -> np.ndarray:
+    """
+    OpenAI 임베딩 호출 → 정규화된 (N×dim) float32 행렬
+    dim 이 주어지면 서버 측 dimensions 파라미터로 축소하고, 클라이언트에서도 재정규화한다.
+    on_usage 가 주어지면 응답의 usage(prompt_tokens/total_tokens)를 넘겨 호출한다.
+    """
+    kwargs = {}
+    if dim:
+        if model not in MATRYOSHKA_MODELS:
+            raise ValueError(f"{model} 은(는) dimensions 파라미터를 지원하지 않습니다.")
+        kwargs["dimensions"] = dim
+    res = client.embeddings.create(model=model, input=texts, **kwargs)
+    if on_usage is not None and getattr(res, "usage", None) is not None:
+        on_usage(res.usage)
+    return truncate_normalize([d.embedding for d in res.data], dim)
+
+
+def collection_name(base: str, dim: Optional[int] = None) -> str:
+    """축소 차원 컬렉션은 이름에 차원을 붙여 기본 컬렉션과 공존시킨다."""
+    return f"{base}_d{dim}" if dim else base
+
+
+def embed_metadata(model: str, dim: Optional[int] = None) -> Dict:
+    """컬렉션 메타데이터에 기록할 임베딩 서명"""
+    meta = {"embed_model": model}
+    if expected_dim(model, dim):
+        meta["embed_dim"] = expected_dim(model, dim)
+    return meta
+
+
+def collection_dim(col) -> Optional[int]:
+    """컬렉션 메타데이터의 embed_dim, 없으면 저장된 벡터 하나로 확인"""
+    meta = col.metadata or {}
+    if meta.get("embed_dim"):
+        return int(meta["embed_dim"])
+    got = col.get(limit=1, include=["embeddings"])
+    embs = got.get("embeddings")
+    if embs is not None and len(embs):
+        return len(embs[0])
+    return None
+
+
+def check_collection(col, model: str, dim: Optional[int] = None):
+    """
+    쿼리(또는 추가) 임베딩과 컬렉션의 모델·차원이 다르면 ValueError
+    서로 다른 차원/모델 벡터 간 코사인 값은 의미가 없으므로 조용히 검색하지 않는다.
+    """
+    want = expected_dim(model, dim)
+    have = collection_dim(col)
+    if want and have and want != have:
+        raise ValueError(
+            f"컬렉션 '{col.name}' 은(는) {have}차원으로 구축되었으나 "
+            f"현재 설정은 {model} {want}차원입니다. "
+            f"OPENAI_EMBED_DIM 설정을 맞추거나 DB를 다시 구축하세요."
+        )
+    built_model = (col.metadata or {}).get("embed_model")
+    if built_model and built_model != model:
+        raise ValueError(
+            f"컬렉션 '{col.name}' 은(는) {built_model} 로 구축되었으나 "
+            f"현재 쿼리 모델은 {model} 입니다."
+        )
+
+
+# ── 쿼리 캐시 ─────────────────────────────────────
+class QueryCache:
+    """텍스트 해시 → 쿼리 벡터 / col.query 원결과 LRU 캐시 (프로세스 내)"""
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    @staticmethod
+    def key(text: str, *scope) -> str:
+        """모델·차원·컬렉션 등 scope 와 텍스트를 묶은 SHA-1 키"""
+        raw = "\x1f".join([*(str(s) for s in scope), text])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        if key not in self._data:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key: str, value):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def cached_query(cache: QueryCache, col, text: str, embed_fn, n_results: int,
+                 *scope, compute: bool = True):
+    """
+    캐시된 (쿼리 벡터, col.query 결과) 반환
+    - 벡터는 텍스트+scope(모델·차원) 기준, 결과는 여기에 컬렉션·n_results 까지 포함한 키로 저장
+    - compute=False 면 캐시에 없을 때 (None, None) 반환 (임베딩·DB 호출 없음)
+    """
+    vec_key = cache.key(text, "vec", *scope)
+    hit_key = cache.key(text, "hits", col.name, n_results, *scope)
+    hits = cache.get(hit_key)
+    if hits is not None:
+        return cache.get(vec_key), hits
+    if not compute:
+        return None, None
+    vec = cache.get(vec_key)
+    if vec is None:
+        vec = embed_fn(text)
+        cache.put(vec_key, vec)
+    hits = col.query(query_embeddings=[vec], n_results=n_results)
+    cache.put(hit_key, hits)
+    return vec, hits
@@ -0,0 +1,963 @@
+#!/usr/bin/env python3
+"""
+NumPy 기반 인프로세스 벡터 인덱스
+- chromadb.PersistentClient 대신 설정으로 선택할 수 있는 경량 백엔드
+- 정규화된 float32 벡터를 추가 전용 raw 파일(memmap)로 저장, 메타데이터는 JSONL 로그
+  (쓰기 비용은 배치 크기에 비례, IVF-PQ 는 build_index 때만 학습)
+- 소규모 코퍼스: 정확한 flat top-k / 대규모 코퍼스: IVF-PQ + 정확 재정렬
+- 스크립트들이 사용하는 query / get / add 인터페이스를 그대로 제공
+
+백엔드 선택 (환경변수)
+- SN_INDEX_BACKEND : chroma(기본) | numpy
+- SN_INDEX_MODE    : auto(기본) | flat | ivfpq
+- SN_IVF_THRESHOLD : auto 모드에서 IVF-PQ로 전환하는 항목 수 (기본 20000)
+- SN_IVF_NPROBE    : IVF 검색 시 탐색할 리스트 수 (기본 16)
+- SN_INDEX_DTYPE   : float32(기본) | float16 | int8 (양자화 벡터로 1차 스캔)
+- SN_INDEX_KEEP_FULL : 1(기본) 이면 float32 원본을 디스크에 남겨 상위 후보만 재정렬,
+                       0 이면 원본을 지워 디스크까지 절감 (근사 점수 사용)
+  (DTYPE·KEEP_FULL 은 새 컬렉션에만 적용, 기존 컬렉션은 헤더에 저장된 형식을 따르며
+   형식 변경은 `python sn_index.py quantize` 로만 한다)
+
+청크 단위 인덱스 ({컬렉션}_chunks, 메타데이터 parent_id):
+- query_parents() 가 청크 검색 결과를 부모 문항별 max / top‑m 평균으로 집계
+- with_chunk_index() 로 감싼 컬렉션은 청크 컬렉션이 있으면 query 를 이 경로로 보낸다
+  (CLI search·검색 서버·GUI 공통)
+- SN_CHUNK_SEARCH  : 0 이면 청크 컬렉션이 있어도 문항 벡터로 검색 (기본 1)
+- SN_CHUNK_AGG     : max(기본) | topm,  SN_CHUNK_TOPM : topm 평균에 쓸 청크 수 (기본 2)
+
+기존 Chroma 컬렉션 변환:
+    python sn_index.py convert --db ./sn_csat_2.db --col sn_csat_openai
+"""
+
+import os
+import json
+import math
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+
+INDEX_BACKEND = os.environ.get("SN_INDEX_BACKEND", "chroma")
+INDEX_MODE = os.environ.get("SN_INDEX_MODE", "auto")
+IVF_THRESHOLD = int(os.environ.get("SN_IVF_THRESHOLD", "20000"))
+IVF_NPROBE = int(os.environ.get("SN_IVF_NPROBE", "16"))
+INDEX_DTYPE = os.environ.get("SN_INDEX_DTYPE", "float32")
+KEEP_FULL = os.environ.get("SN_INDEX_KEEP_FULL", "1") != "0"
+RERANK_FACTOR = 4   # 근사(IVF-PQ·양자화) 후보를 k × RERANK_FACTOR 개까지 정확 재정렬
+CHUNK_SEARCH = os.environ.get("SN_CHUNK_SEARCH", "1") != "0"
+CHUNK_AGG = os.environ.get("SN_CHUNK_AGG", "max")
+CHUNK_TOPM = int(os.environ.get("SN_CHUNK_TOPM", "2"))
+_CHUNK_META_KEYS = {"parent_id", "group", "type"}   # 청크 행 메타데이터 (sn_build.chunk_meta_rows)
+
+
+def normalize(mat) -> np.ndarray:
+    """행 단위 L2 정규화된 float32 행렬 반환 (1차원 입력은 1×D로 변환)"""
+    mat = np.asarray(mat, dtype=np.float32)
+    if mat.ndim == 1:
+        mat = mat[None, :]
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+# ── where 필터 (Chroma 문법의 부분집합) ─────────────────────
+def _match(meta: Dict, where: Optional[Dict]) -> bool:
+    """{"key": v}, {"key": {"$eq"|"$ne"|"$in"|"$nin"|"$gt"|...: v}}, $and/$or 지원"""
+    if not where:
+        return True
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(_match(meta, c) for c in cond):
+                return False
+            continue
+        if key == "$or":
+            if not any(_match(meta, c) for c in cond):
+                return False
+            continue
+        val = meta.get(key)
+        if not isinstance(cond, dict):
+            if val != cond:
+                return False
+            continue
+        for op, arg in cond.items():
+            if op == "$eq":
+                ok = val == arg
+            elif op == "$ne":
+                ok = val != arg
+            elif op == "$in":
+                ok = val in arg
+            elif op == "$nin":
+                ok = val not in arg
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if val is None:
+                    return False
+                ok = {"$gt": val > arg, "$gte": val >= arg,
+                      "$lt": val < arg, "$lte": val <= arg}[op]
+            else:
+                raise ValueError(f"지원하지 않는 where 연산자: {op}")
+            if not ok:
+                return False
+    return True
+
+
+# ── k-means / IVF-PQ ─────────────────────────────
+def _nearest(x: np.ndarray, cent: np.ndarray, block: int = 8192) -> np.ndarray:
+    """각 행에 가장 가까운(L2) 중심 인덱스"""
+    cn = (cent ** 2).sum(axis=1)
+    out = np.empty(len(x), dtype=np.int64)
+    for s in range(0, len(x), block):
+        xb = np.asarray(x[s:s + block], dtype=np.float32)
+        out[s:s + block] = np.argmax(2 * xb @ cent.T - cn, axis=1)
+    return out
+
+
+def _kmeans(x: np.ndarray, k: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """단순 Lloyd k-means → 중심 행렬(k×D) 반환"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    cent = x[rng.choice(len(x), k, replace=False)].astype(np.float32)
+    for _ in range(n_iter):
+        assign = _nearest(x, cent)
+        sums = np.zeros_like(cent)
+        np.add.at(sums, assign, x)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        counts[empty] = 1
+        cent = sums / counts[:, None]
+        if empty.any():   # 빈 클러스터는 임의 점으로 재시작
+            cent[empty] = x[rng.choice(len(x), int(empty.sum()))]
+    return cent
+
+
+class IVFPQ:
+    """
+    IVF(coarse k-means) + 잔차 PQ 근사 내적 검색
+    검색 결과는 근사 후보 행 번호이며, 최종 점수는 호출 측에서 원본 벡터로 재계산한다.
+    """
+
+    def __init__(self, centroids, codebooks, codes, order, offsets):
+        self.centroids = centroids      # (nlist, D)
+        self.codebooks = codebooks      # (m, ksub, D/m)
+        self.codes = codes              # (N, m) uint8
+        self.order = order              # 리스트별로 정렬된 행 번호
+        self.offsets = offsets          # (nlist+1,) order 내 리스트 경계
+
+    @classmethod
+    def train(cls, vecs: np.ndarray, nlist: Optional[int] = None,
+              m: Optional[int] = None, seed: int = 0) -> "IVFPQ":
+        n, d = vecs.shape
+        nlist = nlist or max(1, int(4 * math.sqrt(n)))
+        if m is None:
+            m = next(c for c in (d // 16, d // 8, d // 4, d // 2, d, 1) if c and d % c == 0)
+        ds = d // m
+        rng = np.random.default_rng(seed)
+        sample_n = min(n, max(nlist * 40, 256 * 40))
+        sample = np.asarray(vecs[np.sort(rng.choice(n, sample_n, replace=False))], dtype=np.float32)
+
+        centroids = _kmeans(sample, nlist, seed=seed)
+        res_sample = sample - centroids[_nearest(sample, centroids)]
+        ksub = min(256, sample_n)
+        codebooks = np.stack([
+            _kmeans(res_sample[:, j * ds:(j + 1) * ds], ksub, n_iter=10, seed=seed + j)
+            for j in range(m)
+        ])
+
+        assign = _nearest(vecs, centroids)
+        codes = np.empty((n, m), dtype=np.uint8)
+        for s in range(0, n, 8192):
+            res = np.asarray(vecs[s:s + 8192], dtype=np.float32) - centroids[assign[s:s + 8192]]
+            for j in range(m):
+                codes[s:s + 8192, j] = _nearest(res[:, j * ds:(j + 1) * ds], codebooks[j])
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(len(centroids) + 1))
+        return cls(centroids, codebooks, codes, order, offsets)
+
+    def search(self, q: np.ndarray, n_candidates: int, nprobe: int) -> np.ndarray:
+        """근사 점수 상위 n_candidates 개 행 번호 반환"""
+        m, _, ds = self.codebooks.shape
+        coarse = self.centroids @ q
+        nprobe = min(nprobe, len(coarse))
+        probe = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+        table = np.einsum("mkd,md->mk", self.codebooks, q.reshape(m, ds))
+        rows_all, scores_all = [], []
+        for lst in probe:
+            rows = self.order[self.offsets[lst]:self.offsets[lst + 1]]
+            if not len(rows):
+                continue
+            rows_all.append(rows)
+            scores_all.append(coarse[lst] + table[np.arange(m), self.codes[rows]].sum(axis=1))
+        if not rows_all:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate(rows_all)
+        scores = np.concatenate(scores_all)
+        if len(rows) > n_candidates:
+            top = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+            rows = rows[top]
+        return rows
+
+    def save(self, path: str):
+        np.savez(path, centroids=self.centroids, codebooks=self.codebooks,
+                 codes=self.codes, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQ":
+        z = np.load(path)
+        return cls(z["centroids"], z["codebooks"], z["codes"], z["order"], z["offsets"])
+
+
+# ── 양자화 ─────────────────────────────────────
+def quantize(vecs: np.ndarray, dtype: str):
+    """
+    정규화 벡터 양자화 → (codes, scale)
+    - float16: 절반 크기, scale 없음
+    - int8   : 행별 scale = max|v| / 127 (대칭 스칼라 양자화)
+    """
+    if dtype == "float16":
+        return vecs.astype(np.float16), None
+    if dtype == "int8":
+        scale = np.abs(vecs).max(axis=1) / 127.0
+        scale[scale == 0] = 1.0
+        codes = np.round(vecs / scale[:, None]).astype(np.int8)
+        return codes, scale.astype(np.float32)
+    raise ValueError(f"알 수 없는 양자화 형식: {dtype}")
+
+
+def dequantize(codes: np.ndarray, scale: Optional[np.ndarray]) -> np.ndarray:
+    out = np.asarray(codes, dtype=np.float32)
+    if scale is not None:
+        out = out * scale[:, None]
+    return out
+
+
+# ── 컬렉션 / 클라이언트 ─────────────────────────────
+class _RowFile:
+    """
+    행 단위 raw 배열 파일: 새 행은 끝에 이어 쓰고 기존 행은 제자리 덮어쓰기, 읽기는 memmap
+    (.npy 와 달리 헤더가 없어 전체를 다시 쓰지 않고 늘릴 수 있다)
+    """
+
+    def __init__(self, path: str, dtype, width: Optional[int] = None):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.rowbytes = self.dtype.itemsize * (width or 1)
+
+    def rows(self) -> int:
+        return os.path.getsize(self.path) // self.rowbytes if os.path.exists(self.path) else 0
+
+    def view(self, n: int):
+        if n == 0 or self.rows() < n:     # 파일 없음 (다른 dtype 으로 저장된 컬렉션 등)
+            return None
+        shape = (n, self.width) if self.width else (n,)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=shape)
+
+    def truncate(self, n: int):
+        """n 행 뒤의 내용(중단된 쓰기의 잔여분) 제거"""
+        if os.path.exists(self.path) and os.path.getsize(self.path) > n * self.rowbytes:
+            with open(self.path, "r+b") as f:
+                f.truncate(n * self.rowbytes)
+
+    def put(self, rows: np.ndarray, values: np.ndarray):
+        """rows(오름차순) 위치에 values 기록 — 연속 구간은 한 번에 쓴다"""
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        if not len(rows):
+            return
+        cuts = np.flatnonzero(np.diff(rows) != 1) + 1
+        with open(self.path, "r+b" if os.path.exists(self.path) else "w+b") as f:
+            for seg in np.split(np.arange(len(rows)), cuts):
+                f.seek(int(rows[seg[0]]) * self.rowbytes)
+                f.write(values[seg[0]:seg[-1] + 1].tobytes())
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class NumpyCollection:
+    """
+    Chroma Collection과 같은 모양의 query/get/add/upsert를 제공하는 NumPy 컬렉션
+
+    저장 형식 (<이름>.npidx.*): 쓰기 비용이 배치 크기에만 비례하도록 모두 추가 전용
+    - .json       : 헤더 (컬렉션 메타데이터, 차원, 저장 형식 dtype·keep_full, IVF 이후 덮어쓴 행)
+    - .jsonl      : [id, 문서, 메타데이터] 행 로그 (같은 ID 는 나중 줄이 우선, 커지면 압축)
+    - .f32        : float32 원본 벡터 (ID 가 처음 나온 순서 = 행 번호)
+    - .<dtype>.bin, .int8.scale.bin : 양자화 벡터 / int8 행별 scale
+    - .ivf.npz    : IVF-PQ 인덱스 (build_index 때만 학습, 이후 추가·수정된 행은 정확 스캔)
+    저장 형식은 헤더 값이 생성자 인자·환경변수보다 우선한다 (바꾸려면 convert_format).
+    """
+
+    def __init__(self, path: str, name: str, metadata: Optional[Dict] = None,
+                 embedding_function=None, mode: Optional[str] = None,
+                 nprobe: Optional[int] = None, dtype: Optional[str] = None,
+                 keep_full: Optional[bool] = None):
+        self.name = name
+        self.embedding_function = embedding_function
+        self.mode = mode or INDEX_MODE
+        self.nprobe = nprobe or IVF_NPROBE
+        self.dtype = dtype or INDEX_DTYPE
+        self.keep_full = KEEP_FULL if keep_full is None else keep_full
+        if self.dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"알 수 없는 양자화 형식: {self.dtype}")
+        self._base = os.path.join(path, f"{name}.npidx")
+        self._ivf = None
+        self._ivf_stale = set()  # IVF 학습 이후 덮어쓴 행 (IVF 코드가 낡아 정확 스캔)
+
+        self.metadata = metadata or {}
+        self._dim_ = None
+        self._ids: List[str] = []
+        self._docs: List[Optional[str]] = []
+        self._metas: List[Dict] = []
+        self._row: Dict[str, int] = {}
+        self._log_lines = 0
+        self._vecs = None       # float32 원본 (memmap, 재정렬용)
+        self._qvecs = None      # 양자화 벡터 (memmap, 1차 스캔용)
+        self._qscale = None     # int8 행별 scale
+        if os.path.exists(self._base + ".json"):
+            with open(self._base + ".json", encoding="utf-8") as f:
+                saved = json.load(f)
+            self.metadata = saved.get("metadata") or self.metadata
+            if "ids" in saved:
+                self._migrate(saved)
+            else:
+                self._dim_ = saved.get("dim")
+                self._ivf_stale = set(saved.get("ivf_stale", ()))
+                self._load_format(saved)
+                self._read_log()
+        self._map()
+
+    # ― 저장 ―
+    def _load_format(self, saved: Dict):
+        """헤더의 저장 형식 적용 (형식이 없는 헤더는 디스크에 있는 벡터 파일로 판단)"""
+        if "dtype" in saved:
+            self.dtype, self.keep_full = saved["dtype"], bool(saved.get("keep_full", True))
+        elif saved.get("dim") is not None:
+            quantized = [dt for dt in ("int8", "float16")
+                         if os.path.exists(f"{self._base}.{dt}.bin")]
+            self.dtype = quantized[0] if quantized else "float32"
+            self.keep_full = os.path.exists(self._base + ".f32")
+
+    def _files(self, dtype: Optional[str] = None, keep_full: Optional[bool] = None,
+               tmp: str = "") -> Dict[str, _RowFile]:
+        """dtype·keep_full(기본: 컬렉션의 저장 형식)에서 쓰는 벡터 파일들"""
+        if self._dim_ is None:
+            return {}
+        dtype = dtype or self.dtype
+        keep_full = self.keep_full if keep_full is None else keep_full
+        files = {}
+        if dtype == "float32" or keep_full:
+            files["full"] = _RowFile(self._base + ".f32" + tmp, np.float32, self._dim_)
+        if dtype != "float32":
+            files["codes"] = _RowFile(f"{self._base}.{dtype}.bin{tmp}", dtype, self._dim_)
+            if dtype == "int8":
+                files["scale"] = _RowFile(f"{self._base}.int8.scale.bin{tmp}", np.float32)
+        return files
+
+    def _map(self):
+        """벡터 파일 memmap 을 현재 행 수로 다시 연다 (쓰기 후 호출)"""
+        files = self._files()
+        n = len(self._ids)
+        self._vecs = files["full"].view(n) if "full" in files else None
+        self._qvecs = files["codes"].view(n) if "codes" in files else None
+        self._qscale = files["scale"].view(n) if "scale" in files else None
+
+    def _release(self):
+        # memmap 해제 후 파일 수정 (Windows 호환)
+        self._vecs = self._qvecs = self._qscale = None
+
+    def _read_log(self):
+        docs, metas = {}, {}
+        if os.path.exists(self._base + ".jsonl"):
+            with open(self._base + ".jsonl", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        _id, doc, meta = json.loads(line)
+                    except ValueError:      # 중단된 쓰기의 마지막 줄
+                        break
+                    self._log_lines += 1
+                    if _id not in self._row:
+                        self._row[_id] = len(self._ids)
+                        self._ids.append(_id)
+                    docs[_id], metas[_id] = doc, meta
+        self._docs = [docs[_id] for _id in self._ids]
+        self._metas = [metas[_id] for _id in self._ids]
+        for rf in self._files().values():
+            rf.truncate(len(self._ids))
+
+    def _save_header(self):
+        tmp = self._base + ".json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"name": self.name, "metadata": self.metadata, "format": 2,
+                       "dim": self._dim_, "dtype": self.dtype,
+                       "keep_full": self.dtype == "float32" or self.keep_full,
+                       "ivf_stale": sorted(self._ivf_stale)},
+                      f, ensure_ascii=False)
+        os.replace(tmp, self._base + ".json")
+
+    def _append_log(self, rows: List[int]):
+        with open(self._base + ".jsonl", "a", encoding="utf-8") as f:
+            for r in rows:
+                f.write(json.dumps([self._ids[r], self._docs[r], self._metas[r]],
+                                   ensure_ascii=False) + "\n")
+        self._log_lines += len(rows)
+        # 덮어쓰기로 쌓인 옛 줄이 절반을 넘으면 현재 상태만 다시 기록
+        if self._log_lines > 2 * len(self._ids) + 1024:
+            self._rewrite_log()
+
+    def _rewrite_log(self):
+        tmp = self._base + ".jsonl.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for row in zip(self._ids, self._docs, self._metas):
+                f.write(json.dumps(list(row), ensure_ascii=False) + "\n")
+        os.replace(tmp, self._base + ".jsonl")
+        self._log_lines = len(self._ids)
+
+    def _put_vectors(self, rows: np.ndarray, vecs: np.ndarray,
+                     files: Optional[Dict[str, _RowFile]] = None):
+        """정규화 벡터를 행 위치에 기록 (양자화도 해당 행만)"""
+        self._release()
+        files = self._files() if files is None else files
+        if "full" in files:
+            files["full"].put(rows, vecs)
+        if "codes" in files:
+            codes, scale = quantize(vecs, files["codes"].dtype.name)
+            files["codes"].put(rows, codes)
+            if scale is not None:
+                files["scale"].put(rows, scale)
+
+    def _store_all(self, vecs: Optional[np.ndarray], dtype: str, keep_full: bool):
+        """
+        벡터 전체를 dtype·keep_full 형식으로 다시 기록
+        임시 파일에 모두 쓴 뒤 제자리로 바꾸고 헤더를 갱신하며, 옛 형식 파일은 그 다음에 지운다
+        (도중에 실패해도 헤더와 벡터 파일이 어긋나지 않음).
+        """
+        if vecs is not None and len(vecs):
+            vecs = np.array(vecs, dtype=np.float32)   # memmap 이면 파일을 바꾸기 전에 복사
+            if len(vecs) != len(self._ids):
+                raise ValueError(f"{self.name}: 벡터 {len(vecs)}개 != 항목 {len(self._ids)}개")
+            self._dim_ = int(vecs.shape[1])
+        keep_full = dtype == "float32" or keep_full
+        self._release()
+        old = {rf.path for rf in self._files().values()}
+        new = self._files(dtype, keep_full)
+        tmp = self._files(dtype, keep_full, tmp=".tmp")
+        try:
+            if vecs is not None and len(vecs):
+                for rf in tmp.values():
+                    rf.remove()
+                self._put_vectors(np.arange(len(vecs)), vecs, tmp)
+                for key, rf in tmp.items():
+                    os.replace(rf.path, new[key].path)
+            self.dtype, self.keep_full = dtype, keep_full
+            self._save_header()
+        finally:
+            for rf in tmp.values():
+                rf.remove()
+            self._map()
+        for path in old - {rf.path for rf in new.values()}:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def convert_format(self, dtype: str, keep_full: bool = True):
+        """저장 형식 변경 (quantize 명령) — 디스크에 있는 현재 형식에서 벡터를 읽어 다시 기록"""
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"알 수 없는 양자화 형식: {dtype}")
+        if self.count() and not self._has_vectors():
+            raise ValueError(f"{self.name}: 벡터 파일이 없어 형식을 바꿀 수 없습니다.")
+        self._store_all(self._full() if self.count() else None, dtype, keep_full)
+
+    def _migrate(self, saved: Dict):
+        """이전 형식(.json 에 전체 ID·문서, .npy 벡터)을 추가 전용 형식으로 한 번 변환"""
+        self._ids = saved["ids"]
+        self._docs = saved["documents"]
+        self._metas = saved["metadatas"]
+        self._row = {_id: i for i, _id in enumerate(self._ids)}
+        vecs = None
+        legacy = [self._base + ".npy"] + [f"{self._base}.{dt}{sfx}.npy"
+                                          for dt, sfx in (("float16", ""), ("int8", ""),
+                                                          ("int8", ".scale"))]
+        # 이전 형식도 남아 있는 파일이 곧 저장 형식 (양자화 파일이 있으면 그 dtype)
+        dtype = "float16" if os.path.exists(legacy[1]) else \
+            "int8" if os.path.exists(legacy[2]) else "float32"
+        if os.path.exists(legacy[0]):
+            vecs = np.load(legacy[0])
+        elif os.path.exists(legacy[1]):
+            vecs = np.load(legacy[1]).astype(np.float32)
+        elif os.path.exists(legacy[2]):
+            vecs = dequantize(np.load(legacy[2]), np.load(legacy[3]))
+        self._rewrite_log()
+        self._store_all(vecs, dtype, os.path.exists(legacy[0]))
+        for fp in legacy:
+            if os.path.exists(fp):
+                os.remove(fp)
+
+    def _has_vectors(self) -> bool:
+        return self._vecs is not None or self._qvecs is not None
+
+    def _dim(self) -> int:
+        return self._dim_
+
+    def _full(self, rows=None) -> np.ndarray:
+        """float32 벡터 (원본이 없으면 양자화 값을 복원)"""
+        if self._vecs is not None:
+            return np.asarray(self._vecs if rows is None else self._vecs[rows])
+        if rows is None:
+            return dequantize(self._qvecs, self._qscale)
+        scale = None if self._qscale is None else self._qscale[rows]
+        return dequantize(self._qvecs[rows], scale)
+
+    def _approx_scores(self, q: np.ndarray, rows=None, block: int = 16384) -> np.ndarray:
+        """양자화 벡터로 계산한 근사 내적 (블록 단위 복원으로 임시 메모리 제한)"""
+        n = len(self._qvecs) if rows is None else len(rows)
+        out = np.empty(n, dtype=np.float32)
+        for s in range(0, n, block):
+            sel = slice(s, s + block) if rows is None else rows[s:s + block]
+            scale = None if self._qscale is None else self._qscale[sel]
+            out[s:s + block] = dequantize(self._qvecs[sel], scale) @ q
+        return out
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self.embedding_function is None:
+            raise ValueError(f"{self.name}: embedding_function 없이 텍스트를 임베딩할 수 없습니다.")
+        return normalize(self.embedding_function(texts))
+
+    def _write(self, ids, embeddings, documents, metadatas, replace: bool):
+        if embeddings is None:
+            embeddings = self._embed(documents)
+        vecs = normalize(embeddings)
+        if self._has_vectors() and vecs.shape[1] != self._dim():
+            raise ValueError(f"임베딩 차원 불일치: {vecs.shape[1]} != {self._dim()}")
+        if not replace:
+            dup = [i for i in ids if i in self._row]
+            if dup:
+                raise ValueError(f"중복 ID: {dup[:5]}")
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{} for _ in ids]
+
+        # 배치 안에서 반복된 ID 는 마지막 항목만 기록
+        last = {_id: k for k, _id in enumerate(ids)}
+        keep = sorted(last.values())
+        rows = []
+        for k in keep:
+            _id = ids[k]
+            if _id in self._row:
+                r = self._row[_id]
+                self._docs[r] = documents[k]
+                self._metas[r] = metadatas[k]
+                if self._ivf_rows() > r:
+                    self._ivf_stale.add(r)
+            else:
+                r = self._row[_id] = len(self._ids)
+                self._ids.append(_id)
+                self._docs.append(documents[k])
+                self._metas.append(metadatas[k])
+            rows.append(r)
+        if not rows:
+            return
+        order = np.argsort(rows)
+        new_dim = self._dim_ is None
+        self._dim_ = int(vecs.shape[1])
+        # 벡터 → 행 로그 → 헤더 순서로 기록 (중단되면 로그에 없는 벡터 행은 다음 로드 때 잘림)
+        self._put_vectors(np.asarray(rows)[order], vecs[keep][order])
+        self._append_log(rows)
+        if new_dim or self._ivf_stale:
+            self._save_header()
+        self._map()
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None):
+        self._write(list(ids), embeddings, documents, metadatas, replace=False)
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None):
+        self._write(list(ids), embeddings, documents, metadatas, replace=True)
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def nbytes(self) -> Dict:
+        """검색 시 RAM 상주 벡터 바이트 / 디스크 벡터 파일 바이트"""
+        ram = 0 if self._qvecs is None else self._qvecs.nbytes
+        if self._qscale is not None:
+            ram += self._qscale.nbytes
+        if self._qvecs is None and self._vecs is not None:
+            ram = self._vecs.nbytes     # float32 모드는 전체를 스캔
+        disk = sum(os.path.getsize(rf.path) for rf in self._files().values()
+                   if os.path.exists(rf.path))
+        return {"ram": ram, "disk": disk}
+
+    # ― 조회 ―
+    def _rows_where(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        if not where:
+            return None
+        return np.array([i for i, meta in enumerate(self._metas) if _match(meta, where)],
+                        dtype=np.int64)
+
+    def _pack(self, rows, include, extra=None) -> Dict:
+        out = {"ids": [self._ids[r] for r in rows]}
+        if "documents" in include:
+            out["documents"] = [self._docs[r] for r in rows]
+        if "metadatas" in include:
+            out["metadatas"] = [self._metas[r] for r in rows]
+        if "embeddings" in include:
+            if not self._has_vectors():     # 빈 컬렉션
+                out["embeddings"] = np.zeros((0, 0), dtype=np.float32)
+            else:
+                out["embeddings"] = self._full(np.asarray(rows, dtype=np.int64))
+        if extra:
+            out.update(extra)
+        return out
+
+    def get(self, ids=None, where=None, limit=None, offset=None,
+            include=("documents", "metadatas")) -> Dict:
+        if ids is not None:
+            rows = [self._row[i] for i in ids if i in self._row]
+        else:
+            rows = range(len(self._ids))
+        if where:
+            rows = [r for r in rows if _match(self._metas[r], where)]
+        rows = list(rows)[offset or 0:]
+        if limit is not None:
+            rows = rows[:limit]
+        return self._pack(rows, include)
+
+    def _use_ivf(self) -> bool:
+        if self.mode == "ivfpq":
+            return True
+        return self.mode == "auto" and self.count() >= IVF_THRESHOLD
+
+    def build_index(self):
+        """IVF-PQ 인덱스를 (재)학습해 저장 (쓰기로는 다시 학습하지 않으므로 명시적으로 호출)"""
+        self._ivf = IVFPQ.train(self._vecs if self._vecs is not None else self._full())
+        self._ivf.save(self._base + ".ivf.npz")
+        self._ivf_stale = set()
+        self._save_header()
+        return self._ivf
+
+    def _ivf_rows(self) -> int:
+        """IVF 인덱스가 덮는 앞쪽 행 수 (인덱스가 없으면 0)"""
+        if self._ivf is None and os.path.exists(self._base + ".ivf.npz"):
+            self._ivf = IVFPQ.load(self._base + ".ivf.npz")
+        return 0 if self._ivf is None else len(self._ivf.codes)
+
+    def _get_ivf(self) -> IVFPQ:
+        if self._ivf is None:
+            if os.path.exists(self._base + ".ivf.npz"):
+                self._ivf = IVFPQ.load(self._base + ".ivf.npz")
+            else:
+                self.build_index()
+        return self._ivf
+
+    def _search_one(self, q: np.ndarray, k: int, rows: Optional[np.ndarray]):
+        if rows is None and self._use_ivf():
+            rows = self._get_ivf().search(q, k * RERANK_FACTOR, self.nprobe)
+            # IVF 학습 이후 추가·수정된 행은 근사 후보와 함께 정확 점수로 비교
+            fresh = np.arange(self._ivf_rows(), self.count())
+            if len(fresh) or self._ivf_stale:
+                rows = np.unique(np.concatenate(
+                    [rows, fresh, np.fromiter(self._ivf_stale, dtype=np.int64)]))
+        elif self._qvecs is not None:
+            # 양자화 벡터로 1차 스캔 → 상위 후보만 float32 원본으로 재계산
+            approx = self._approx_scores(q, rows)
+            n_cand = min(k * RERANK_FACTOR, len(approx))
+            if n_cand == 0:
+                return [], []
+            top = np.argpartition(-approx, n_cand - 1)[:n_cand]
+            if self._vecs is None:     # 원본 미보관 → 근사 점수 그대로 사용
+                cand = top if rows is None else rows[top]
+                return self._rank(cand, approx[top], k)
+            rows = top if rows is None else rows[top]
+        if rows is None:
+            return self._rank(np.arange(self.count()), self._vecs @ q, k)
+        rows = np.sort(rows)
+        return self._rank(rows, self._full(rows) @ q, k)
+
+    @staticmethod
+    def _rank(rows: np.ndarray, scores: np.ndarray, k: int):
+        k = min(k, len(rows))
+        if k == 0:
+            return [], []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top].tolist(), (1.0 - scores[top]).tolist()
+
+    def query(self, query_embeddings=None, query_texts=None, n_results: int = 10,
+              where=None, include=("documents", "metadatas", "distances")) -> Dict:
+        if query_embeddings is None:
+            query_embeddings = self._embed(query_texts)
+        qs = normalize(query_embeddings)
+        if not self._has_vectors():
+            empty = [[] for _ in qs]
+            return {"ids": empty, "documents": empty, "metadatas": empty, "distances": empty}
+        if qs.shape[1] != self._dim():
+            raise ValueError(f"쿼리 차원 불일치: {qs.shape[1]} != {self._dim()}")
+        rows = self._rows_where(where)
+        out = {"ids": [], "distances": []}
+        for key in ("documents", "metadatas"):
+            if key in include:
+                out[key] = []
+        for q in qs:
+            hit_rows, dists = self._search_one(q, n_results, rows)
+            packed = self._pack(hit_rows, include)
+            for key, val in packed.items():
+                out.setdefault(key, []).append(val)
+            out["distances"].append(dists)
+        return out
+
+
+class NumpyClient:
+    """chromadb.PersistentClient 와 같은 모양의 최소 클라이언트"""
+
+    def __init__(self, path: str, mode: Optional[str] = None, nprobe: Optional[int] = None,
+                 dtype: Optional[str] = None, keep_full: Optional[bool] = None):
+        self.path = path
+        self.options = {"mode": mode, "nprobe": nprobe, "dtype": dtype, "keep_full": keep_full}
+        os.makedirs(path, exist_ok=True)
+
+    def _exists(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.path, f"{name}.npidx.json"))
+
+    def get_collection(self, name: str, embedding_function=None) -> NumpyCollection:
+        if not self._exists(name):
+            raise ValueError(f"Collection {name} does not exist.")
+        return NumpyCollection(self.path, name, embedding_function=embedding_function,
+                               **self.options)
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None,
+                                 embedding_function=None) -> NumpyCollection:
+        col = NumpyCollection(self.path, name, metadata=metadata,
+                              embedding_function=embedding_function, **self.options)
+        if not self._exists(name):
+            col._save_header()
+        return col
+
+    def delete_collection(self, name: str):
+        for suffix in (".json", ".jsonl", ".f32", ".float16.bin", ".int8.bin",
+                       ".int8.scale.bin", ".ivf.npz",
+                       ".npy", ".float16.npy", ".int8.npy", ".int8.scale.npy"):   # 이전 형식
+            fp = os.path.join(self.path, f"{name}.npidx{suffix}")
+            if os.path.exists(fp):
+                os.remove(fp)
+
+
+def open_collection(db_path: str, name: str, create: bool = False,
+                    metadata: Optional[Dict] = None, embedding_function=None,
+                    backend: Optional[str] = None):
+    """
+    설정된 백엔드(SN_INDEX_BACKEND)로 컬렉션 열기
+
+    Args:
+        db_path: 퍼시스턴스 디렉터리
+        name: 컬렉션명
+        create: True 면 get_or_create_collection, False 면 get_collection
+        metadata: 생성 시 컬렉션 메타데이터
+        embedding_function: query_texts/documents 임베딩용 함수 (선택)
+        backend: "chroma" | "numpy" (기본: 환경변수)
+    """
+    backend = backend or INDEX_BACKEND
+    if backend == "numpy":
+        client = NumpyClient(db_path)
+    elif backend == "chroma":
+        import chromadb   # numpy 백엔드에서는 chromadb/SQLite를 로드하지 않음
+        client = chromadb.PersistentClient(path=db_path)
+    else:
+        raise ValueError(f"알 수 없는 인덱스 백엔드: {backend}")
+
+    kwargs = {}
+    if embedding_function is not None:
+        kwargs["embedding_function"] = embedding_function
+    if create:
+        return client.get_or_create_collection(name, metadata=metadata, **kwargs)
+    return client.get_collection(name, **kwargs)
+
+
+def drop_collection(db_path: str, name: str, backend: Optional[str] = None) -> bool:
+    """컬렉션 삭제 (없으면 False) — 다른 모델·차원으로 다시 구축할 때"""
+    backend = backend or INDEX_BACKEND
+    if backend == "numpy":
+        client = NumpyClient(db_path)
+        existed = client._exists(name)
+        client.delete_collection(name)
+        return existed
+    if backend != "chroma":
+        raise ValueError(f"알 수 없는 인덱스 백엔드: {backend}")
+    import chromadb
+    client = chromadb.PersistentClient(path=db_path)
+    try:
+        client.delete_collection(name)
+    except Exception:       # 버전마다 ValueError / NotFoundError
+        return False
+    return True
+
+
+def max_batch_size(col, default: int = 5000) -> int:
+    """
+    한 번의 add/upsert 에 넣을 수 있는 최대 항목 수
+    Chroma 는 클라이언트 설정값(get_max_batch_size), NumPy 백엔드는 제한이 없어 default
+    """
+    getter = getattr(getattr(col, "_client", None), "get_max_batch_size", None)
+    if getter is not None:
+        try:
+            return int(getter())
+        except Exception:
+            pass
+    return default
+
+
+def chunk_collection_name(name: str) -> str:
+    """문항 컬렉션에 딸린 청크 단위 컬렉션 이름"""
+    return f"{name}_chunks"
+
+
+def query_parents(chunk_col, query_embeddings, n_results: int = 10, agg: str = "max",
+                  m: int = 2, oversample: int = 8, where: Optional[Dict] = None) -> Dict:
+    """
+    청크 컬렉션을 검색해 부모 문항(parent_id) 단위로 집계한 Chroma 모양 결과
+    - agg="max"  : 부모의 청크 중 최고 유사도
+    - agg="topm" : 상위 m개 청크 유사도 평균 (검색된 청크가 m개 미만이면 있는 것만)
+    청크 n_results × oversample 개를 가져와 집계하므로, 긴 지문의 청크가 상위를 독차지해도
+    부모 n_results 개를 채울 수 있게 한다.
+
+    Returns:
+        {"ids": [[부모 ID...]], "distances": [[1 − 점수...]], "chunks": [[최고 청크 ID...]]}
+    """
+    if agg not in ("max", "topm"):
+        raise ValueError(f"알 수 없는 집계 방식: {agg}")
+    kwargs = {"where": where} if where else {}
+    res = chunk_col.query(query_embeddings=query_embeddings,
+                          n_results=n_results * oversample,
+                          include=["metadatas", "distances"], **kwargs)
+    out = {"ids": [], "distances": [], "chunks": []}
+    for cids, metas, dists in zip(res["ids"], res["metadatas"], res["distances"]):
+        sims: Dict[str, List[float]] = {}
+        best_chunk: Dict[str, str] = {}
+        for cid, meta, dist in zip(cids, metas, dists):   # 유사도 내림차순
+            parent = (meta or {}).get("parent_id", cid)
+            sims.setdefault(parent, []).append(1.0 - float(dist))
+            best_chunk.setdefault(parent, cid)
+        if agg == "max":
+            scores = {p: v[0] for p, v in sims.items()}
+        else:
+            scores = {p: sum(v[:m]) / len(v[:m]) for p, v in sims.items()}
+        ranked = sorted(scores, key=lambda p: -scores[p])[:n_results]
+        out["ids"].append(ranked)
+        out["distances"].append([1.0 - scores[p] for p in ranked])
+        out["chunks"].append([best_chunk[p] for p in ranked])
+    return out
+
+
+def _where_keys(where: Optional[Dict]) -> set:
+    keys = set()
+    for key, cond in (where or {}).items():
+        if key in ("$and", "$or"):
+            for c in cond:
+                keys |= _where_keys(c)
+        else:
+            keys.add(key)
+    return keys
+
+
+class ChunkedCollection:
+    """
+    문항 컬렉션 + 청크 컬렉션
+    query(query_embeddings=...) 는 청크를 검색해 부모 문항별로 집계(query_parents)한 뒤
+    부모의 문서·메타데이터를 붙여 col.query 와 같은 모양으로 반환한다.
+    query_texts 이거나 청크 메타데이터에 없는 키로 where 를 걸면 문항 컬렉션으로 검색하고,
+    그 밖의 속성(get / upsert / count / metadata …)은 모두 문항 컬렉션에 위임한다.
+    """
+
+    def __init__(self, col, chunk_col, agg: str = CHUNK_AGG, m: int = CHUNK_TOPM):
+        self.col = col
+        self.chunk_col = chunk_col
+        self.agg = agg
+        self.m = m
+
+    def __getattr__(self, name):
+        return getattr(self.col, name)
+
+    def query(self, query_embeddings=None, query_texts=None, n_results: int = 10,
+              where=None, include=("documents", "metadatas", "distances")) -> Dict:
+        if query_embeddings is None or not _where_keys(where) <= _CHUNK_META_KEYS:
+            kwargs = {"where": where} if where else {}
+            return self.col.query(query_embeddings=query_embeddings, query_texts=query_texts,
+                                  n_results=n_results, include=include, **kwargs)
+        res = query_parents(self.chunk_col, query_embeddings, n_results, self.agg, self.m,
+                            where=where)
+        want = [key for key in ("documents", "metadatas") if key in include]
+        got, found = {}, {}
+        uniq = list(dict.fromkeys(p for ids in res["ids"] for p in ids))
+        if uniq:
+            got = self.col.get(ids=uniq, include=want or ["metadatas"])
+            found = {_id: k for k, _id in enumerate(got["ids"])}
+        out = {"ids": [], "distances": [], "chunks": [], **{key: [] for key in want}}
+        for ids, dists, chunks in zip(res["ids"], res["distances"], res["chunks"]):
+            keep = [k for k, _id in enumerate(ids) if _id in found]   # 청크만 남은 부모는 제외
+            out["ids"].append([ids[k] for k in keep])
+            out["distances"].append([dists[k] for k in keep])
+            out["chunks"].append([chunks[k] for k in keep])
+            for key in want:
+                out[key].append([got[key][found[ids[k]]] for k in keep])
+        return out
+
+
+def with_chunk_index(col, db_path: str, backend: Optional[str] = None):
+    """{이름}_chunks 컬렉션이 있고 비어 있지 않으면 ChunkedCollection, 아니면 col 그대로"""
+    if not CHUNK_SEARCH or isinstance(col, ChunkedCollection):
+        return col
+    try:
+        chunk_col = open_collection(db_path, chunk_collection_name(col.name), backend=backend)
+    except Exception:       # 청크 컬렉션 없음 (Chroma 는 버전마다 ValueError / NotFoundError)
+        return col
+    return ChunkedCollection(col, chunk_col) if chunk_col.count() else col
+
+
+def convert_from_chroma(db_path: str, name: str, out_path: Optional[str] = None,
+                        page: int = 1000) -> NumpyCollection:
+    """기존 Chroma 컬렉션을 재임베딩 없이 NumPy 인덱스로 복사"""
+    src = open_collection(db_path, name, backend="chroma")
+    dst_client = NumpyClient(out_path or db_path)
+    dst_client.delete_collection(name)
+    dst = dst_client.get_or_create_collection(name, metadata=src.metadata)
+    total = src.count()
+    ids, docs, metas, vecs = [], [], [], []
+    for offset in range(0, total, page):
+        got = src.get(limit=page, offset=offset,
+                      include=["embeddings", "documents", "metadatas"])
+        ids.extend(got["ids"])
+        docs.extend(got["documents"])
+        metas.extend(got["metadatas"])
+        vecs.append(np.asarray(got["embeddings"], dtype=np.float32))
+    if ids:
+        dst.add(ids=ids, embeddings=np.concatenate(vecs), documents=docs, metadatas=metas)
+    if dst._use_ivf():
+        dst.build_index()
+    print(f"✅  {len(ids)} items converted → {dst._base}.*")
+    return dst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy 벡터 인덱스 도구")
+    parser.add_argument("command", choices=["convert", "build-index", "quantize"],
+                        help="실행할 명령")
+    parser.add_argument("--db", default="./sn_csat_2.db", help="퍼시스턴스 디렉터리")
+    parser.add_argument("--col", default="sn_csat_openai", help="컬렉션명")
+    parser.add_argument("--out", help="변환 결과 디렉터리 (기본: --db 와 동일)")
+    parser.add_argument("--dtype", choices=["float32", "float16", "int8"],
+                        help="저장 형식 (기본: SN_INDEX_DTYPE)")
+    parser.add_argument("--drop-full", action="store_true",
+                        help="양자화 후 float32 원본 삭제 (디스크 절감, 재정렬 생략)")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        convert_from_chroma(args.db, args.col, args.out)
+    elif args.command == "build-index":
+        col = NumpyClient(args.db).get_collection(args.col)
+        ivf = col.build_index()
+        print(f"✅  IVF-PQ built: nlist={len(ivf.centroids)}, m={ivf.codebooks.shape[0]}")
+    elif args.command == "quantize":
+        col = NumpyClient(args.db).get_collection(args.col)
+        col.convert_format(args.dtype or INDEX_DTYPE, keep_full=not args.drop_full)
+        size = col.nbytes()
+        print(f"✅  {col.dtype} stored: RAM {size['ram'] / 2**20:.1f} MiB, "
+              f"disk {size['disk'] / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
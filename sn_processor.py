@@ -12,29 +12,29 @@ import sys
 import json
 import re
 import argparse
-from typing import Dict, List, Optional, Tuple
+import hashlib
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import glob
 
-# PDF 처리 관련
-import PyPDF2
-import pdfplumber
+from sn_record import QuestionRecord, read_record
 
-# 데이터베이스 관련
-import chromadb
-from chromadb.config import Settings
+# PDF 처리(PyPDF2, pdfplumber)와 데이터베이스(chromadb) 모듈은
+# 해당 명령에서 처음 쓰일 때 로드 (예: search 는 PDF 라이브러리를 읽지 않음)
 
 
 class PDFSplitter:
     """PDF를 페이지별로 분할하는 클래스"""
     
     @staticmethod
-    def split_pdf(input_pdf: str, output_dir: str = None) -> int:
+    def split_pdf(input_pdf: str, output_dir: str = None, verbose: bool = True) -> int:
         """
         PDF를 페이지별로 분할
         
         Args:
             input_pdf: 입력 PDF 경로
             output_dir: 출력 디렉토리 (기본값: 입력파일명_split)
+            verbose: 페이지별 생성 로그 출력 여부
         
         Returns:
             분할된 페이지 수
@@ -45,11 +45,13 @@ class PDFSplitter:
         
         os.makedirs(output_dir, exist_ok=True)
         
+        import PyPDF2
         with open(input_pdf, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
             num_pages = len(pdf_reader.pages)
             
-            print(f"총 페이지 수: {num_pages}")
+            if verbose:
+                print(f"총 페이지 수: {num_pages}")
             
             # 각 페이지 분할
             for i in range(num_pages):
@@ -61,15 +63,141 @@ class PDFSplitter:
                 
                 with open(output_file, 'wb') as output:
                     pdf_writer.write(output)
-                print(f"생성됨: {output_file}")
+                if verbose:
+                    print(f"생성됨: {output_file}")
         
         return num_pages
 
 
+LAYOUTS = ("page", "columns")
+LAYOUT_CACHE_DIR = os.environ.get("SN_LAYOUT_CACHE", "./.layout_cache")
+LAYOUT_VERSION = 1   # 단어 상자 추출 방식(크롭·허용 오차)이 바뀌면 올려서 캐시 무효화
+
+
+def file_sha1(path: str) -> str:
+    """파일 내용 SHA-1"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+PAGE_CACHE_PATH = os.environ.get("SN_PAGE_CACHE", "./.page_cache.sqlite")   # "" 이면 사용 안 함
+EXTRACTOR_VERSION = 1   # 페이지 텍스트 추출·조립 규칙이 바뀌면 올려서 페이지 텍스트 캐시 무효화
+
+
+class PageTextCache:
+    """
+    페이지 텍스트 영구 캐시 (SQLite)
+    키: (페이지 PDF 내용 SHA-1, 추출기 버전) → 추출 텍스트
+    파싱 규칙(ExamJSONGenerator)만 고쳐 다시 extract 할 때 pdfplumber 를 거치지 않는다.
+    """
+    
+    def __init__(self, path: str = PAGE_CACHE_PATH):
+        import sqlite3
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)   # ingest 작업 프로세스끼리 공유
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS page_text ("
+            "page_hash TEXT, version TEXT, text TEXT, PRIMARY KEY (page_hash, version))")
+    
+    def get_many(self, hashes: List[str], version: str) -> Dict[str, str]:
+        """{페이지 해시: 텍스트} (캐시에 있는 것만)"""
+        found = {}
+        uniq = list(dict.fromkeys(hashes))
+        for start in range(0, len(uniq), 500):   # SQLite 변수 개수 제한
+            part = uniq[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT page_hash, text FROM page_text WHERE version = ? "
+                f"AND page_hash IN ({','.join('?' * len(part))})", [version, *part])
+            found.update(rows)
+        return found
+    
+    def put_many(self, rows: Dict[str, str], version: str):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO page_text (page_hash, version, text) VALUES (?, ?, ?)",
+                [(h, version, text) for h, text in rows.items()])
+    
+    def close(self):
+        self.conn.close()
+
+
+def find_gutter(chars: List[Dict], width: float, band: Tuple[float, float] = (0.35, 0.65)) -> float:
+    """
+    두 단 사이 여백의 x 좌표: 페이지 가운데 band 안에서 글자가 가장 적게 걸친 위치
+    """
+    lo, hi = int(width * band[0]), int(width * band[1])
+    if hi <= lo:
+        return width / 2
+    cover = [0] * (hi - lo)
+    for ch in chars:
+        for x in range(max(int(ch['x0']), lo), min(int(ch['x1']) + 1, hi)):
+            cover[x - lo] += 1
+    # 최소 겹침 구간 중 가장 긴 연속 구간의 가운데
+    best = min(cover)
+    span, start, run = (0, 0), None, None
+    for i, c in enumerate(cover + [best + 1]):
+        if c == best and start is None:
+            start = i
+        elif c != best and start is not None:
+            run = (start, i)
+            if run[1] - run[0] > span[1] - span[0]:
+                span = run
+            start = None
+    return lo + (span[0] + span[1]) / 2
+
+
+def words_to_text(words: List[List], line_tol: float = 3.0) -> str:
+    """단어 상자 [x0, top, x1, bottom, text] → 위→아래, 왼→오른 순서의 줄 텍스트"""
+    lines = []
+    for word in sorted(words, key=lambda w: (w[1], w[0])):
+        if lines and abs(word[1] - lines[-1][0]) <= line_tol:
+            lines[-1][1].append(word)
+        else:
+            lines.append((word[1], [word]))
+    return "\n".join(" ".join(w[4] for w in sorted(ws, key=lambda w: w[0])) for _, ws in lines)
+
+
+def page_columns(page) -> Dict:
+    """pdfplumber 페이지 → 단 여백 기준 크롭별 단어 상자 {width, height, gutter, columns}"""
+    width, height = float(page.width), float(page.height)
+    gutter = find_gutter(page.chars, width)
+    columns = []
+    for bbox in ((0, 0, gutter, height), (gutter, 0, width, height)):
+        words = page.crop(bbox).extract_words()
+        columns.append([[round(w['x0'], 2), round(w['top'], 2), round(w['x1'], 2),
+                         round(w['bottom'], 2), w['text']] for w in words])
+    return {"width": width, "height": height, "gutter": gutter, "columns": columns}
+
+
+def columns_text(layout: Dict) -> str:
+    """단어 상자 레이아웃 → 왼쪽 단 → 오른쪽 단 순서의 텍스트"""
+    return "\n".join(words_to_text(col) for col in layout['columns'] if col)
+
+
 class ExamTextExtractor:
     """시험 문제 텍스트 추출 및 파싱 클래스"""
     
-    def __init__(self):
+    def __init__(self, layout: str = "page", cache_dir: Optional[str] = LAYOUT_CACHE_DIR,
+                 text_cache: Optional[str] = PAGE_CACHE_PATH):
+        """
+        layout: "page"    — 페이지 전체 extract_text (기존 방식, 두 단이 섞일 수 있음)
+                "columns" — 단 여백을 찾아 pdfplumber 크롭으로 왼쪽 단 → 오른쪽 단 순서로 추출
+        cache_dir: columns 모드 단어 상자 캐시 폴더 (PDF 내용 해시별, None 이면 캐시 안 함)
+        text_cache: extract_all_text 페이지 텍스트 캐시 SQLite 경로 (None·"" 이면 캐시 안 함)
+        """
+        if layout not in LAYOUTS:
+            raise ValueError(f"알 수 없는 레이아웃: {layout}")
+        self.layout = layout
+        self.cache_dir = cache_dir
+        self.text_cache = text_cache
+        # 캐시 키의 추출기 버전: 레이아웃 방식 + 규칙 버전 (+ 단어 상자 추출 버전)
+        self.version = f"{layout}.{EXTRACTOR_VERSION}"
+        if layout == "columns":
+            self.version += f".l{LAYOUT_VERSION}"
         self.question_patterns = [
             r'^(\d{1,2})\.\s*(.+)',  # 1. 문제
             r'^(\d{1,2})\s+(.+)',    # 1 문제 (점 없이)
@@ -82,22 +210,96 @@ class ExamTextExtractor:
         
     def extract_text_from_page(self, pdf_path: str) -> str:
         """PDF 페이지에서 텍스트 추출"""
+        if self.layout == "columns":
+            return columns_text(self.page_layout(pdf_path)[0])
+        import pdfplumber
         with pdfplumber.open(pdf_path) as pdf:
             page = pdf.pages[0]
             return page.extract_text() or ""
     
+    def page_layout(self, pdf_path: str) -> List[Dict]:
+        """
+        페이지별 단 구분 단어 상자 [{width, height, gutter, columns: [[x0, top, x1, bottom, text], …]}]
+        비용이 큰 레이아웃 분석 결과라 PDF 내용 해시로 캐시하고, 텍스트 조립 규칙은 캐시 밖에서 적용
+        """
+        cache_path = None
+        if self.cache_dir:
+            cache_path = os.path.join(self.cache_dir,
+                                      f"{file_sha1(pdf_path)}.v{LAYOUT_VERSION}.json.gz")
+            if os.path.exists(cache_path):
+                import gzip
+                with gzip.open(cache_path, 'rt', encoding='utf-8') as f:
+                    return json.load(f)
+        
+        import pdfplumber
+        with pdfplumber.open(pdf_path) as pdf:
+            pages = [page_columns(page) for page in pdf.pages]
+        
+        if cache_path:
+            import gzip
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = cache_path + ".tmp"
+            with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+                json.dump(pages, f, ensure_ascii=False)
+            os.replace(tmp, cache_path)   # 병렬 작업 프로세스끼리 덮어써도 안전
+        return pages
+    
     def extract_all_text(self, pdf_dir: str) -> Dict[int, str]:
-        """모든 PDF 페이지에서 텍스트 추출"""
-        all_text = {}
-        pdf_files = sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))
+        """모든 PDF 페이지에서 텍스트 추출 ({페이지 번호: 텍스트})"""
+        return dict(self.iter_page_texts(pdf_dir))
+    
+    def iter_page_texts(self, source: str, chunk: int = 64) -> Iterator[Tuple[int, str]]:
+        """
+        (페이지 번호, 텍스트) 를 페이지 순서대로 생성 — 전체 텍스트를 메모리에 모으지 않음
+        - 분할 폴더(*page{n}.pdf): chunk 페이지씩 페이지 텍스트 캐시를 조회하고 없는 페이지만 추출
+        - PDF 파일 하나(수천 쪽 문제집 등): 페이지를 하나씩 추출하고 바로 해제
+        """
+        if os.path.isfile(source):
+            yield from self._iter_pdf_pages(source)
+            return
         
-        for pdf_file in pdf_files:
+        pages = []
+        for pdf_file in glob.glob(os.path.join(source, "*.pdf")):
             match = re.search(r'page(\d+)', pdf_file)
             if match:
-                page_num = int(match.group(1))
-                all_text[page_num] = self.extract_text_from_page(pdf_file)
+                pages.append((int(match.group(1)), pdf_file))
+        pages.sort()
         
-        return all_text
+        if not self.text_cache:
+            for page_num, pdf_file in pages:
+                yield page_num, self.extract_text_from_page(pdf_file)
+            return
+        
+        cache = PageTextCache(self.text_cache)
+        try:
+            for start in range(0, len(pages), chunk):
+                part = pages[start:start + chunk]
+                hashes = {pdf_file: file_sha1(pdf_file) for _, pdf_file in part}
+                cached = cache.get_many(list(hashes.values()), self.version)
+                new = {}
+                for page_num, pdf_file in part:
+                    digest = hashes[pdf_file]
+                    if digest not in cached and digest not in new:
+                        new[digest] = self.extract_text_from_page(pdf_file)
+                if new:
+                    cache.put_many(new, self.version)
+                for page_num, pdf_file in part:
+                    digest = hashes[pdf_file]
+                    yield page_num, cached.get(digest, new.get(digest))
+        finally:
+            cache.close()
+    
+    def _iter_pdf_pages(self, pdf_path: str) -> Iterator[Tuple[int, str]]:
+        import pdfplumber
+        with pdfplumber.open(pdf_path) as pdf:
+            for page_num, page in enumerate(pdf.pages, 1):
+                if self.layout == "columns":
+                    text = columns_text(page_columns(page))
+                else:
+                    text = page.extract_text() or ""
+                # 페이지 객체 캐시 해제 (쪽수와 무관하게 메모리 일정)
+                (getattr(page, "close", None) or page.flush_cache)()
+                yield page_num, text
     
     def parse_question(self, text: str) -> Optional[Dict]:
         """문제 파싱"""
@@ -161,9 +363,9 @@ class ExamTextExtractor:
 class ExamJSONGenerator:
     """시험 문제 JSON 생성 클래스"""
     
-    def __init__(self):
-        self.extractor = ExamTextExtractor()
-        self.passages = {}  # 지문 저장용
+    def __init__(self, layout: str = "page"):
+        self.extractor = ExamTextExtractor(layout)
+        self.passages = {}  # 지문 저장용 (마지막 find_passages_and_questions 결과)
         self.questions = {}  # 문제 저장용
         
     def determine_question_type(self, question_num: int) -> str:
@@ -191,21 +393,25 @@ class ExamJSONGenerator:
         }
         return type_to_code.get(question_type, "03")  # 기본값: 독서
     
-    def process_exam(self, pdf_dir: str, exam_info: Dict) -> List[Dict]:
-        """시험 전체 처리"""
-        all_text = self.extractor.extract_all_text(pdf_dir)
-        
-        # 지문과 문제 찾기
-        self.find_passages_and_questions(all_text)
-        
-        # JSON 데이터 생성
-        json_data_list = []
-        for q_num, q_data in sorted(self.questions.items()):
-            passage = self.passages.get(q_num, "")
+    def process_exam(self, pdf_dir: str, exam_info: Dict) -> List[QuestionRecord]:
+        """시험 전체 처리 (문항 번호 순, 같은 번호는 나중 것이 우선)"""
+        by_num = {}
+        for record in self.iter_exam(pdf_dir, exam_info):
+            by_num[int(record.id.rsplit("_", 1)[1])] = record
+        return [by_num[q_num] for q_num in sorted(by_num)]
+    
+    def iter_exam(self, source: str, exam_info: Dict) -> Iterator[QuestionRecord]:
+        """
+        시험(분할 폴더 또는 PDF 파일 하나)을 페이지 단위로 읽으며 문항 레코드를 문서 순서대로 생성
+        열린 지문·문제 상태만 들고 가므로 수천 쪽 문제집도 메모리가 일정하다.
+        (레코드는 dict 처럼 쓸 수 있고, JSON 으로 저장할 때는 to_dict())
+        """
+        pages = self.extractor.iter_page_texts(source)
+        for q_num, q_data, passage in self.iter_questions(pages):
             question_type = self.determine_question_type(q_num)
             subject_code = self.determine_subject_code(question_type)
             
-            json_data = {
+            yield QuestionRecord({
                 "id": f"{exam_info['id_prefix']}_{q_num:02d}",
                 "source": exam_info['source'],
                 "year": exam_info['year'],
@@ -219,111 +425,106 @@ class ExamJSONGenerator:
                 "options": q_data["options"],
                 "answer_rate": 0,
                 "difficulty": ""
-            }
-            json_data_list.append(json_data)
-        
-        return json_data_list
+            })
     
     def find_passages_and_questions(self, all_text: Dict[int, str]):
-        """지문과 문제 찾기"""
+        """지문과 문제 찾기 (결과는 self.passages / self.questions, 호출마다 새로 채움)"""
+        self.passages, self.questions = {}, {}
+        for q_num, q_data, passage in self.iter_questions(sorted(all_text.items())):
+            self.questions[q_num] = q_data
+            self.passages[q_num] = passage
+    
+    def iter_questions(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, Dict, str]]:
+        """
+        (페이지 번호, 텍스트) 스트림 → (문제 번호, {question, options}, 지문) 스트림
+        - [a~b] 지문 마커가 나오면 이전 지문을 닫고, 그 범위에 속한 문제를 지문과 함께 내보냄
+        - 문제 줄 뒤에서 선택지(①~⑤)를 모으다 다음 문제 줄이나 선택지 5개에서 종료
+          (종료시킨 다음 줄은 건너뜀 — 기존 일괄 파서와 같은 규칙)
+        - 페이지 경계를 넘는 지문·문제도 이어서 처리
+        """
         passage_pattern = r'\[(\d+)\s*[~∼]\s*(\d+)\]'
+        passage_nums = set()
+        passage_lines = []
+        waiting = []        # 현재 지문 범위의 완성된 문제 (지문이 닫히면 내보냄)
+        open_question = None
+        skip_next = False
         
-        # 모든 페이지 통합 처리
-        combined_text = ""
-        for page_num in sorted(all_text.keys()):
-            combined_text += f"\n===PAGE{page_num}===\n" + all_text[page_num]
+        def close_question():
+            q_num, q_text, options = open_question
+            q_data = {"question": q_text, "options": options}
+            if q_num in passage_nums:
+                waiting.append((q_num, q_data))
+                return []
+            return [(q_num, q_data, "")]
         
-        # 지문과 문제 추출 로직
-        current_passage = None
-        current_passage_nums = []
-        current_passage_text = ""
+        def close_passage():
+            passage = "".join(passage_lines).strip()
+            done = [(q_num, q_data, passage) for q_num, q_data in waiting]
+            waiting.clear()
+            return done
         
-        lines = combined_text.split('\n')
-        i = 0
+        def lines():
+            yield ""
+            for page_num, text in pages:
+                yield f"===PAGE{page_num}==="   # 페이지 경계 (기존 파서의 통합 텍스트와 같은 줄 구성)
+                yield from text.split('\n')
         
-        while i < len(lines):
-            line = lines[i]
+        for line in lines():
+            if skip_next:
+                skip_next = False
+                continue
+            
+            # 선택지 수집 중
+            if open_question:
+                if re.match(r'^(\d{1,2})\s*\.', line):
+                    yield from close_question()
+                    open_question = None
+                    continue
+                options = open_question[2]
+                for idx, marker in enumerate(['①', '②', '③', '④', '⑤']):
+                    if marker in line:
+                        option_text = self.extract_option_text([line], 0, marker)
+                        if option_text:
+                            options.append({
+                                "number": idx + 1,
+                                "text": option_text
+                            })
+                if len(options) >= 5:
+                    yield from close_question()
+                    open_question = None
+                    skip_next = True
+                continue
             
             # 페이지 마커 확인
-            page_match = re.match(r'===PAGE(\d+)===', line)
-            if page_match:
-                i += 1
+            if re.match(r'===PAGE(\d+)===', line):
                 continue
             
             # 지문 마커 찾기
             passage_match = re.search(passage_pattern, line)
             if passage_match:
-                # 이전 지문 저장
-                if current_passage_nums:
-                    for num in current_passage_nums:
-                        self.passages[num] = current_passage_text.strip()
+                # 이전 지문 닫기
+                yield from close_passage()
                 
                 # 새 지문 시작
                 start_num = int(passage_match.group(1))
                 end_num = int(passage_match.group(2))
-                current_passage_nums = list(range(start_num, end_num + 1))
-                current_passage_text = ""
-                i += 1
+                passage_nums = set(range(start_num, end_num + 1))
+                passage_lines = []
                 continue
             
             # 문제 번호 찾기
             question_match = re.match(r'^(\d{1,2})\s*\.\s*(.+)', line)
             if question_match:
-                q_num = int(question_match.group(1))
-                q_text = question_match.group(2)
-                
-                # 문제 및 선택지 수집
-                question_data = self.collect_question_and_options(lines, i)
-                if question_data:
-                    self.questions[q_num] = question_data
-                    i = question_data.get('end_index', i)
+                open_question = (int(question_match.group(1)), question_match.group(2), [])
             
             # 지문 텍스트 추가
-            elif current_passage_nums:
-                current_passage_text += line + "\n"
-            
-            i += 1
-        
-        # 마지막 지문 저장
-        if current_passage_nums:
-            for num in current_passage_nums:
-                self.passages[num] = current_passage_text.strip()
-    
-    def collect_question_and_options(self, lines: List[str], start_idx: int) -> Optional[Dict]:
-        """문제와 선택지 수집"""
-        match = re.match(r'^(\d{1,2})\s*\.\s*(.+)', lines[start_idx])
-        if not match:
-            return None
-        
-        q_text = match.group(2)
-        options = []
-        i = start_idx + 1
-        
-        # 선택지 찾기
-        while i < len(lines) and len(options) < 5:
-            line = lines[i]
-            
-            # 다음 문제가 나오면 중단
-            if re.match(r'^(\d{1,2})\s*\.', line):
-                break
-            
-            # 선택지 추출
-            for idx, marker in enumerate(['①', '②', '③', '④', '⑤']):
-                if marker in line:
-                    option_text = self.extract_option_text(lines, i, marker)
-                    if option_text:
-                        options.append({
-                            "number": idx + 1,
-                            "text": option_text
-                        })
-            
-            i += 1
+            elif passage_nums:
+                passage_lines.append(line + "\n")
         
-        return {
-            "question": q_text,
-            "options": options,
-            "end_index": i
-        }
+        # 마지막 문제·지문
+        if open_question:
+            yield from close_question()
+        yield from close_passage()
     
     def extract_option_text(self, lines: List[str], start_idx: int, marker: str) -> str:
         """선택지 텍스트 추출"""
@@ -344,100 +545,537 @@ class ExamJSONGenerator:
         
         return text.strip()
     
-    def save_json_files(self, json_data_list: List[Dict], output_dir: str):
-        """JSON 파일 저장"""
+    def save_json_files(self, json_data_list: List[QuestionRecord], output_dir: str,
+                        verbose: bool = True):
+        """JSON 파일 저장 (저장한 경로는 레코드의 path 로 남김)"""
         os.makedirs(output_dir, exist_ok=True)
         
         for data in json_data_list:
-            filename = f"{data['id']}.json"
+            record = QuestionRecord.coerce(data)
+            filename = f"{record.id}.json"
             filepath = os.path.join(output_dir, filename)
             
             with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+                json.dump(record.to_dict(), f, ensure_ascii=False, indent=2)
+            record.path = filepath
             
-            print(f"생성됨: {filepath}")
+            if verbose:
+                print(f"생성됨: {filepath}")
+
+
+def make_exam_info(exam_year: int, exam_month: int) -> Dict:
+    """시험 연도(학년도)·월 → process_exam 용 시험 정보"""
+    return {
+        'id_prefix': f"{exam_year % 100:02d}_{exam_month:02d}",
+        'source': f"{exam_year}학년도 대학수학능력시험",
+        'year': exam_year - 1 if exam_month == 11 else exam_year,
+        'month': exam_month,
+        'exam_type_code': 1 if exam_month == 11 else 2
+    }
+
+
+EXAM_NAME = re.compile(r'^(\d{2})_(\d{2})(?:_split)?$')   # 24_11.pdf / 24_11_split/
+
+
+def discover_exams(root: str) -> List[Dict]:
+    """
+    트리에서 시험 PDF(YY_MM.pdf)와 분할 폴더(YY_MM_split/)를 찾아 시험별로 묶기
+    원본 PDF 없이 분할 폴더만 있는 시험도 포함 (분할 단계 생략)
+    """
+    exams = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + [f[:-4] for f in filenames if f.lower().endswith('.pdf')]:
+            match = EXAM_NAME.match(name)
+            if not match:
+                continue
+            prefix = f"{match.group(1)}_{match.group(2)}"
+            exam = exams.setdefault(prefix, {
+                'prefix': prefix, 'pdf': None,
+                'split_dir': os.path.join(dirpath, f"{prefix}_split"),
+                'exam_year': 2000 + int(match.group(1)), 'exam_month': int(match.group(2))
+            })
+            if name == prefix:
+                exam['pdf'] = os.path.join(dirpath, f"{name}.pdf")
+                exam['split_dir'] = os.path.join(dirpath, f"{prefix}_split")
+    return [exams[k] for k in sorted(exams)]
+
+
+def exam_sources(exam: Dict) -> List[str]:
+    """최신 여부 판단에 쓰는 입력 파일 (원본 PDF, 없으면 분할 페이지들)"""
+    if exam['pdf']:
+        return [exam['pdf']]
+    return sorted(glob.glob(os.path.join(exam['split_dir'], "*.pdf")))
+
+
+def source_signature(paths: List[str]) -> List:
+    """파일별 (이름, 크기, mtime) — 빠른 변경 확인용"""
+    return [[os.path.basename(p), os.path.getsize(p), os.stat(p).st_mtime_ns] for p in paths]
+
+
+def source_hash(paths: List[str]) -> str:
+    """입력 파일 내용 SHA-1 (mtime 만 바뀐 경우 재처리를 막기 위함)"""
+    h = hashlib.sha1()
+    for p in paths:
+        with open(p, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    return h.hexdigest()
+
+
+SPLIT_STAMP = ".split.json"   # 분할 폴더 안: {"pdf_sha1": 원본 PDF 해시, "pages": 페이지 수}
+
+
+def split_exam(pdf: str, split_dir: str, digest: Optional[str] = None) -> Tuple[int, bool]:
+    """
+    원본 PDF → 분할 폴더 (원본 해시가 지난 분할 때와 같고 페이지 파일이 모두 있으면 재사용)
+    반환: (페이지 수, 새로 분할했는지)
+    """
+    digest = digest or file_sha1(pdf)
+    stamp_path = os.path.join(split_dir, SPLIT_STAMP)
+    base_name = os.path.splitext(os.path.basename(pdf))[0]
+    try:
+        with open(stamp_path, 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        stamp = {}
+    pages = stamp.get('pages')
+    if stamp.get('pdf_sha1') == digest and isinstance(pages, int) and all(
+            os.path.exists(os.path.join(split_dir, f"{base_name}_page{i + 1:02d}.pdf"))
+            for i in range(pages)):
+        return pages, False
+    if os.path.exists(stamp_path):
+        os.remove(stamp_path)       # 분할 도중 실패하면 다음 실행에서 다시 분할
+    for old in glob.glob(os.path.join(split_dir, "*.pdf")):
+        os.remove(old)
+    pages = PDFSplitter.split_pdf(pdf, split_dir, verbose=False)
+    with open(stamp_path, 'w', encoding='utf-8') as f:
+        json.dump({'pdf_sha1': digest, 'pages': pages}, f)
+    return pages, True
+
+
+def ingest_exam(exam: Dict, output_dir: str, layout: str = "page") -> Dict:
+    """
+    시험 하나 처리 (작업 프로세스에서 실행): 분할 → 텍스트 추출 → JSON 저장
+    원본 PDF 가 지난 분할 때와 달라졌을 때만 분할 폴더를 다시 만든다.
+    """
+    import time
+    t0 = time.perf_counter()
+    pages, resplit = None, False
+    if exam['pdf']:
+        pages, resplit = split_exam(exam['pdf'], exam['split_dir'],
+                                    exam.get('stamp', {}).get('hash'))
+    generator = ExamJSONGenerator(layout)   # 시험마다 새로 (지문·문제 상태 공유 없음)
+    json_data_list = generator.process_exam(
+        exam['split_dir'], make_exam_info(exam['exam_year'], exam['exam_month']))
+    generator.save_json_files(json_data_list, output_dir, verbose=False)
+    return {'prefix': exam['prefix'], 'pages': pages, 'resplit': resplit,
+            'ids': [d['id'] for d in json_data_list],
+            'seconds': round(time.perf_counter() - t0, 2)}
+
+
+def ingest(root: str, output_dir: str = "./db", workers: Optional[int] = None,
+           force: bool = False, layout: str = "page") -> List[Dict]:
+    """
+    트리의 모든 시험을 병렬 작업 프로세스로 분할·추출·JSON 생성
+    - 입력 파일 크기·mtime 이 지난번과 같으면 건너뜀, 달라도 내용 해시가 같으면 건너뜀
+      (레이아웃·추출기 버전이 지난번과 다르면 입력이 같아도 다시 추출)
+    - 처리 기록: output_dir/.ingest/{시험}.json
+    반환: 이번에 처리한 시험 결과 목록
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    
+    stamp_dir = os.path.join(output_dir, ".ingest")
+    os.makedirs(stamp_dir, exist_ok=True)
+    extractor = {'layout': layout, 'layout_version': LAYOUT_VERSION,
+                 'extractor_version': EXTRACTOR_VERSION}
+    todo = []
+    for exam in discover_exams(root):
+        sources = exam_sources(exam)
+        if not sources:
+            print(f"⚠️  {exam['prefix']}: PDF 없음 → 건너뜀")
+            continue
+        stamp_path = os.path.join(stamp_dir, f"{exam['prefix']}.json")
+        stamp = {}
+        if os.path.exists(stamp_path):
+            with open(stamp_path, 'r', encoding='utf-8') as f:
+                stamp = json.load(f)
+        outputs_ok = all(os.path.exists(os.path.join(output_dir, f"{_id}.json"))
+                         for _id in stamp.get('ids', []))
+        # 레이아웃·추출 규칙이 바뀌었으면 입력이 같아도 예전 텍스트를 쓰지 않음
+        outputs_ok = outputs_ok and stamp.get('extractor') == extractor
+        signature = source_signature(sources)
+        exam['stamp'] = {'signature': signature, 'stamp_path': stamp_path}
+        if not force and outputs_ok and stamp.get('signature') == signature:
+            print(f"⏭  {exam['prefix']}: 최신 (변경 없음)")
+            continue
+        digest = source_hash(sources)
+        exam['stamp']['hash'] = digest
+        if not force and outputs_ok and stamp.get('hash') == digest:
+            stamp['signature'] = signature   # 내용은 같고 mtime 만 바뀜
+            with open(stamp_path, 'w', encoding='utf-8') as f:
+                json.dump(stamp, f, ensure_ascii=False)
+            print(f"⏭  {exam['prefix']}: 최신 (내용 동일)")
+            continue
+        todo.append(exam)
+    
+    if not todo:
+        return []
+    
+    results = []
+    workers = workers or min(len(todo), os.cpu_count() or 1)
+    print(f"🚀  {len(todo)}개 시험 처리 (작업 프로세스 {workers}개)")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(ingest_exam, exam, output_dir, layout): exam for exam in todo}
+        for future in as_completed(futures):
+            exam = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌  {exam['prefix']}: {type(e).__name__}: {e}")
+                continue
+            stamp = {'signature': exam['stamp']['signature'], 'hash': exam['stamp']['hash'],
+                     'extractor': extractor, 'ids': result['ids']}
+            with open(exam['stamp']['stamp_path'], 'w', encoding='utf-8') as f:
+                json.dump(stamp, f, ensure_ascii=False)
+            reused = " · 분할 재사용" if result['pages'] and not result['resplit'] else ""
+            print(f"✅  {result['prefix']}: {len(result['ids'])}문항 ({result['seconds']}s{reused})")
+            results.append(result)
+    return results
+
+
+COLLECTION = "sn_questions"
+SEARCH_BATCH_SIZE = 256   # search_many 한 번의 query 호출에 넣는 쿼리 수
+EMBED_BATCH_SIZE = 64     # build_database 임베딩 배치
+
+
+def question_document(data) -> Tuple[str, Dict]:
+    """문항 레코드(또는 dict) → (임베딩할 문서, 메타데이터) — 그룹(지문 해시)과 증분 구축용 해시 포함"""
+    data = QuestionRecord.coerce(data)
+    
+    doc = f"지문: {data.get('passage', '')}\n"
+    doc += f"문제: {data.get('question', '')}\n"
+    doc += f"보기: {data.get('context_box', '')}"
+    
+    metadata = {
+        "id": data["id"],
+        "type": data.get("type", ""),
+        "source": data.get("source", ""),
+        "group": data.group   # 같은 지문 문항 묶음 (검색 서버 그룹 색인)
+    }
+    for key in ("year", "month"):   # 일부 JSON 에는 연·월이 없음
+        if data.get(key) is not None:
+            metadata[key] = data[key]
+    metadata["content_hash"] = content_hash(doc, metadata)
+    return doc, metadata
+
+
+DERIVED_FIELDS = ("group", "file_path", "content_hash")   # 원본 필드에서 계산되는 메타데이터
+
+
+def document_record(doc: str, metadata: Dict) -> Dict:
+    """question_document 의 역: JSON 파일이 없을 때 저장된 문서·메타데이터로 문항 복원"""
+    rest, _, context_box = doc.rpartition("\n보기: ")
+    passage, _, question = rest.rpartition("\n문제: ")
+    record = {k: v for k, v in (metadata or {}).items() if k not in ("content_hash", "group")}
+    record.update(passage=passage[len("지문: "):], question=question, context_box=context_box)
+    return record
+
+
+def content_hash(doc: str, metadata: Dict) -> str:
+    """
+    증분 구축용 문항 해시 (문서 텍스트 + 원본 메타데이터 필드)
+    group·file_path 같은 파생 필드는 빼므로, 파생 필드를 추가·변경해도 저장된 해시가 그대로다.
+    """
+    source = {k: v for k, v in metadata.items() if k not in DERIVED_FIELDS}
+    raw = doc + "\x1f" + json.dumps(source, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def read_queries(path: str) -> List[Tuple[str, str]]:
+    """
+    쿼리 파일 → [(쿼리 ID, 텍스트)]
+    - .jsonl: 한 줄에 {"id"?, "query" | "text" | "passage"} (지문처럼 여러 줄 텍스트용)
+    - 그 외: 비어 있지 않은 한 줄이 쿼리 하나 (ID 는 줄 번호)
+    """
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith('.jsonl'):
+                row = json.loads(line)
+                text = row.get('query') or row.get('text') or row.get('passage') or ''
+                queries.append((str(row.get('id', lineno)), text))
+            else:
+                queries.append((str(lineno), line))
+    return queries
 
 
 class SNDatabase:
     """수능 데이터베이스 클래스"""
     
-    def __init__(self, db_path: str = "./sn_csat.db"):
-        self.client = chromadb.PersistentClient(
-            path=db_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
-        self.collection = self.client.get_or_create_collection(name="sn_questions")
-    
-    def build_database(self, json_dir: str = "./db"):
-        """JSON 파일들로 데이터베이스 구축"""
-        json_files = glob.glob(os.path.join(json_dir, "*.json"))
-        
-        documents = []
-        metadatas = []
-        ids = []
+    def __init__(self, db_path: str = "./sn_csat.db", use_server: bool = True,
+                 embedder=None, backend: Optional[str] = None, rebuild: bool = False):
+        """
+        use_server: 검색 서버(sn_server.py)가 떠 있으면 서버에 상주한 컬렉션을 사용
+        (chromadb·임베딩 모델을 이 프로세스에서 로드하지 않음). 구축 시에는 False.
+        embedder: 문서·쿼리 임베딩 백엔드 (sn_build 의 OpenAIEmbedder / LocalEmbedder,
+        기본: 로컬 KURE‑v1). Chroma 기본 임베딩(ONNX MiniLM)은 쓰지 않는다.
+        backend: 인덱스 백엔드 "chroma" | "numpy" (기본: SN_INDEX_BACKEND)
+        rebuild: 기존 컬렉션을 지우고 새로 만든다 (다른 모델·차원·거리로 구축된 컬렉션 교체)
+        """
+        from sn_build import CachedEmbedder, make_embedder, chunk_metadata
+        from sn_embed import check_collection, collection_dim
         
-        for json_file in sorted(json_files):
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-                # 문서 생성
-                doc = f"지문: {data.get('passage', '')}\n"
-                doc += f"문제: {data.get('question', '')}\n"
-                doc += f"보기: {data.get('context_box', '')}"
-                
-                documents.append(doc)
-                metadatas.append({
-                    "id": data["id"],
-                    "year": data["year"],
-                    "month": data["month"],
-                    "type": data.get("type", ""),
-                    "source": data.get("source", "")
-                })
-                ids.append(data["id"])
+        self.embedder = CachedEmbedder(embedder or make_embedder("local"))
+        self.remote = False
+        self.collection = None
+        if rebuild:
+            from sn_index import drop_collection, chunk_collection_name
+            use_server = False
+            for name in (COLLECTION, chunk_collection_name(COLLECTION)):
+                if drop_collection(db_path, name, backend):
+                    print(f"🗑  기존 컬렉션 삭제: {db_path}:{name}")
+        if use_server:
+            from sn_server import get_client
+            server = get_client()
+            if server is not None:
+                try:
+                    self.collection = server.collection(db_path, COLLECTION)
+                    self.remote = True   # 쿼리 임베딩은 서버에 상주한 모델이 담당
+                except RuntimeError:
+                    self.collection = None   # 아직 구축 전 등 → 직접 연결
+        if self.collection is None:
+            from sn_index import open_collection
+            # 거리는 NumPy 백엔드와 같은 코사인으로 명시 (Chroma 기본값은 L2)
+            self.collection = open_collection(
+                db_path, COLLECTION, create=True, backend=backend,
+                metadata={"hnsw:space": "cosine", **self.embedder.metadata(),
+                          **chunk_metadata(self.embedder.embedder)})
+            from sn_index import NumpyCollection   # NumPy 인덱스는 항상 코사인
+            space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+            if space != "cosine" and not isinstance(self.collection, NumpyCollection):
+                print(f"⚠️  {COLLECTION} 컬렉션 거리가 {space} 입니다 (코사인 아님). "
+                      f"build-db --rebuild 로 다시 구축하세요.")
+        # 다른 모델·차원으로 구축된 컬렉션이면 여기서 바로 ValueError
+        try:
+            check_collection(self.collection, self.embedder.model, self.embedder.dim)
+        except ValueError as e:
+            raise ValueError(f"{e}\n→ build-db --rebuild 로 컬렉션을 지우고 다시 구축하세요.") from None
+        self.dim = collection_dim(self.collection)
+        if not self.remote:      # 청크 컬렉션이 있으면 검색은 청크 → 부모 문항 집계 (서버도 동일)
+            from sn_index import with_chunk_index
+            self.collection = with_chunk_index(self.collection, db_path, backend)
+    
+    def embed_queries(self, queries: List[str]):
+        """쿼리 배치 임베딩 (캐시 재사용), 컬렉션 차원과 다르면 ValueError"""
+        vecs = self.embedder.embed(queries)
+        if self.dim and vecs.shape[1] != self.dim:
+            raise ValueError(f"쿼리 벡터 {vecs.shape[1]}차원 ≠ 컬렉션 {self.dim}차원 "
+                             f"({self.embedder.model}). DB를 같은 모델로 다시 구축하세요.")
+        return vecs
+    
+    def _query(self, queries: List[str], **kwargs) -> Dict:
+        if self.remote:
+            return self.collection.query(query_texts=queries, **kwargs)
+        return self.collection.query(query_embeddings=self.embed_queries(queries).tolist(),
+                                     **kwargs)
+    
+    def build_database(self, json_dir: str = "./db") -> Dict:
+        """
+        JSON 파일들로 데이터베이스 구축 (증분 upsert, 여러 번 실행해도 안전)
+        반환: upsert_items 참고
+        """
+        return self.upsert_items(
+            read_record(json_file)
+            for json_file in sorted(glob.glob(os.path.join(json_dir, "*.json"))))
+    
+    def upsert_items(self, items: Iterable) -> Dict:
+        """
+        문항 레코드(또는 dict) 스트림을 증분 upsert (JSON 파일 없이 process_exam 결과를 바로 넣을 수 있음)
+        - 컬렉션 최대 배치 크기만큼 읽어 저장된 해시와 비교 → 새 문항·바뀐 문항만
+          배치 임베딩(구축 스크립트와 같은 백엔드·청크 평균) 후 upsert
+        - 문서·메타데이터 해시(content_hash)가 같은 문항은 임베딩·쓰기 생략
+        반환: {"added", "updated", "unchanged", "stages"}
+        """
+        from sn_build import embed_docs, check_chunk_settings
+        from sn_index import max_batch_size
+        from sn_profile import StageProfiler
+        prof = StageProfiler("sn_processor_build")
+        if not self.remote:     # 다른 청크 설정으로 구축된 컬렉션에 섞어 쓰지 않음
+            check_chunk_settings(self.collection, self.embedder.embedder,
+                                 self.embedder.chunker, self.embedder.overlap)
+        if hasattr(self.collection, "chunk_col"):
+            print(f"⚠️  {COLLECTION}_chunks 청크 컬렉션은 갱신되지 않습니다 "
+                  f"(sn_build.py --chunk-index 로 다시 구축하거나 SN_CHUNK_SEARCH=0).")
         
-        # 데이터베이스에 추가
-        self.collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+        batch = max_batch_size(self.collection)
+        counts = {"added": 0, "updated": 0, "unchanged": 0}
+        items = iter(items)
+        while True:
+            with prof.stage("load"):
+                rows = {}   # id → (문서, 메타데이터), 같은 ID 는 나중 항목이 우선
+                for data in islice(items, batch):
+                    rows[data["id"]] = question_document(data)
+            if not rows:
+                break
+            prof.count("load", items=len(rows))
+            
+            ids = list(rows)
+            with prof.stage("diff", items=len(ids)):
+                got = self.collection.get(ids=ids, include=["metadatas"])
+                stored = {_id: (meta or {}).get("content_hash")
+                          for _id, meta in zip(got['ids'], got['metadatas'])}
+                todo = [_id for _id in ids if stored.get(_id) != rows[_id][1]["content_hash"]]
+            added = sum(1 for _id in todo if _id not in stored)
+            counts["added"] += added
+            counts["updated"] += len(todo) - added
+            counts["unchanged"] += len(ids) - len(todo)
+            if not todo:
+                continue
+            
+            vecs = []
+            for start in range(0, len(todo), EMBED_BATCH_SIZE):
+                docs = [rows[_id][0] for _id in todo[start:start + EMBED_BATCH_SIZE]]
+                vecs.extend(embed_docs(self.embedder.embedder, docs, prof)[0].tolist())
+            with prof.stage("store", items=len(todo)):
+                self.collection.upsert(
+                    ids=todo,
+                    documents=[rows[_id][0] for _id in todo],
+                    embeddings=vecs,
+                    metadatas=[rows[_id][1] for _id in todo]
+                )
         
-        print(f"데이터베이스 구축 완료: {len(documents)}개 문제")
+        print(f"데이터베이스 구축 완료 ({self.embedder.model}): 추가 {counts['added']}, "
+              f"갱신 {counts['updated']}, 변경 없음 {counts['unchanged']} "
+              f"/ 총 {self.collection.count()}개 문제")
+        print("⏱  " + prof.summary())
+        return {**counts, "stages": prof.report()["stages"]}
     
     def search(self, query: str, n_results: int = 5):
         """데이터베이스 검색"""
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
+        results = self._query([query], n_results=n_results)
         
         return results
     
-    def get_by_id(self, question_id: str):
-        """ID로 문제 가져오기"""
-        result = self.collection.get(
-            ids=[question_id]
-        )
+    def search_many(self, queries: List[str], n_results: int = 5,
+                    batch_size: int = SEARCH_BATCH_SIZE) -> List[Dict]:
+        """
+        여러 쿼리를 배치로 검색 (batch_size 개씩 임베딩·검색을 한 번의 query 호출로)
+        반환: 쿼리 순서대로 [{"ids", "distances", "metadatas"}, ...]
+        """
+        hits = []
+        for start in range(0, len(queries), batch_size):
+            results = self._query(queries[start:start + batch_size],
+                                  n_results=n_results,
+                                  include=["metadatas", "distances"])
+            for ids, dists, metas in zip(results['ids'], results['distances'],
+                                         results['metadatas']):
+                hits.append({"ids": ids, "distances": dists, "metadatas": metas})
+        return hits
+    
+    def get_many(self, question_ids: List[str], json_dir: str = "./db") -> Dict[str, Dict]:
+        """
+        ID 목록의 문제를 한 번의 DB 조회로 확인한 뒤 JSON 일괄 로드 ({id: 문제})
+        JSON 파일이 없는 문항(추출→DB 직행)은 저장된 문서·메타데이터로 복원
+        """
+        uniq = list(dict.fromkeys(question_ids))
+        if not uniq:
+            return {}
+        found = self.collection.get(ids=uniq, include=["documents", "metadatas"])
         
-        if result['ids']:
-            json_path = f"./db/{question_id}.json"
+        records = {}
+        for question_id, doc, meta in zip(found['ids'], found['documents'], found['metadatas']):
+            json_path = os.path.join(json_dir, f"{question_id}.json")
             if os.path.exists(json_path):
                 with open(json_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        
-        return None
+                    records[question_id] = json.load(f)
+            else:
+                records[question_id] = document_record(doc, meta)
+        return records
+    
+    def get_by_id(self, question_id: str):
+        """ID로 문제 가져오기"""
+        return self.get_many([question_id]).get(question_id)
+
+
+def open_database(args, use_server: bool = True, rebuild: bool = False) -> SNDatabase:
+    """CLI 임베딩 인자 → SNDatabase (임베딩 모델은 첫 임베딩 때 로드)"""
+    from sn_build import make_embedder
+    return SNDatabase(use_server=use_server, rebuild=rebuild,
+                      embedder=make_embedder(args.embed, args.model, args.dim))
+
+
+def search_batch(args):
+    """쿼리 파일 전체를 배치 검색하고, 모든 결과 문제를 한 번에 불러와 JSONL 로 기록"""
+    import time
+    
+    queries = read_queries(args.queries_file)
+    if not queries:
+        print("쿼리 파일이 비어 있습니다.")
+        return
+    
+    db = open_database(args)
+    t0 = time.perf_counter()
+    hits = db.search_many([text for _, text in queries], args.n_results)
+    t1 = time.perf_counter()
+    records = db.get_many([doc_id for hit in hits for doc_id in hit['ids']],
+                          args.input or './db')
+    t2 = time.perf_counter()
+    
+    out = open(args.results, 'w', encoding='utf-8') if args.results else None
+    try:
+        for (query_id, text), hit in zip(queries, hits):
+            rows = []
+            for doc_id, dist, meta in zip(hit['ids'], hit['distances'], hit['metadatas']):
+                record = records.get(doc_id) or {}
+                rows.append({"id": doc_id, "distance": dist,
+                             "source": (meta or {}).get('source', ''),
+                             "type": (meta or {}).get('type', ''),
+                             "question": record.get('question', '')})
+            if out:
+                out.write(json.dumps({"query_id": query_id, "hits": rows},
+                                     ensure_ascii=False) + "\n")
+            else:
+                top = rows[0] if rows else {}
+                print(f"{query_id}\t{top.get('id', '-')}\t{top.get('distance', float('nan')):.4f}")
+    finally:
+        if out:
+            out.close()
+    
+    print(f"\n검색 {len(queries)}건: {t1 - t0:.2f}s "
+          f"({len(queries) / max(t1 - t0, 1e-9):.1f} q/s), 문제 {len(records)}개 로드: {t2 - t1:.2f}s")
+    if args.results:
+        print(f"결과 저장: {args.results}")
 
 
 def main():
     """메인 함수"""
     parser = argparse.ArgumentParser(description='수능 국어 PDF 처리 통합 도구')
-    parser.add_argument('command', choices=['split', 'extract', 'build-db', 'search'],
+    parser.add_argument('command', choices=['split', 'extract', 'build-db', 'search', 'ingest'],
                         help='실행할 명령')
     parser.add_argument('--input', '-i', help='입력 파일/디렉토리')
     parser.add_argument('--output', '-o', help='출력 디렉토리')
     parser.add_argument('--exam-year', type=int, help='시험 연도')
     parser.add_argument('--exam-month', type=int, help='시험 월')
     parser.add_argument('--query', '-q', help='검색 쿼리')
+    parser.add_argument('--queries-file', help='search: 쿼리 파일 (한 줄에 하나, 또는 .jsonl) 배치 검색')
+    parser.add_argument('--results', help='search --queries-file 결과 JSONL 경로 (없으면 요약 출력)')
+    parser.add_argument('--n-results', '-k', type=int, default=5, help='search: 쿼리당 결과 수')
+    parser.add_argument('--layout', choices=LAYOUTS, default='page',
+                        help='extract/ingest: page(페이지 전체) | columns(두 단 크롭, 단어 상자 캐시)')
+    parser.add_argument('--to-db', action='store_true',
+                        help='extract: JSON 파일 대신 DB 에 바로 증분 반영 (-o 를 주면 JSON 도 저장)')
+    parser.add_argument('--workers', type=int, help='ingest: 작업 프로세스 수 (기본: CPU 수)')
+    parser.add_argument('--force', action='store_true', help='ingest: 최신인 시험도 다시 처리')
+    parser.add_argument('--no-db', action='store_true', help='ingest: DB 갱신 생략')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='build-db: 기존 컬렉션을 지우고 새로 구축 (다른 모델·차원으로 구축된 경우)')
+    parser.add_argument('--embed', choices=['local', 'openai'], default='local',
+                        help='build-db/search 임베딩 백엔드 (DB 구축 때와 같아야 함)')
+    parser.add_argument('--model', help='임베딩 모델 (기본: 백엔드별 기본값)')
+    parser.add_argument('--dim', type=int, help='OpenAI 축소 차원 (text-embedding-3 계열)')
     
     args = parser.parse_args()
     
@@ -453,37 +1091,60 @@ def main():
     elif args.command == 'extract':
         # JSON 추출
         if not args.input:
-            print("PDF 디렉토리를 지정해주세요.")
+            print("PDF 디렉토리(또는 PDF 파일)를 지정해주세요.")
             return
         
         # 시험 정보 설정
-        exam_info = {
-            'id_prefix': f"{args.exam_year % 100:02d}_{args.exam_month:02d}",
-            'source': f"{args.exam_year}학년도 대학수학능력시험",
-            'year': args.exam_year - 1 if args.exam_month == 11 else args.exam_year,
-            'month': args.exam_month,
-            'exam_type_code': 1 if args.exam_month == 11 else 2
-        }
+        exam_info = make_exam_info(args.exam_year, args.exam_month)
         
-        generator = ExamJSONGenerator()
-        json_data_list = generator.process_exam(args.input, exam_info)
+        generator = ExamJSONGenerator(args.layout)
         
+        if args.to_db:
+            # 페이지를 읽는 대로 문항을 DB 에 증분 upsert (JSON 파일은 -o 를 줄 때만)
+            def with_json(items):
+                for data in items:
+                    generator.save_json_files([data], args.output, verbose=False)
+                    yield data
+            
+            items = generator.iter_exam(args.input, exam_info)
+            db = open_database(args, use_server=False)
+            db.upsert_items(with_json(items) if args.output else items)
+            return
+        
+        json_data_list = generator.process_exam(args.input, exam_info)
         output_dir = args.output or './db'
         generator.save_json_files(json_data_list, output_dir)
         
+    elif args.command == 'ingest':
+        # 트리의 모든 시험 일괄 처리 → DB 증분 갱신 한 번
+        output_dir = args.output or './db'
+        results = ingest(args.input or './pdforg', output_dir, args.workers, args.force,
+                         args.layout)
+        if results and not args.no_db:
+            db = open_database(args, use_server=False)
+            db.build_database(output_dir)
+        elif not results:
+            print("처리할 새 시험이 없습니다.")
+        
     elif args.command == 'build-db':
-        # 데이터베이스 구축
-        db = SNDatabase()
+        # 데이터베이스 구축 (서버를 거치지 않고 직접 쓴다)
+        db = open_database(args, use_server=False, rebuild=args.rebuild)
         db.build_database(args.input or './db')
         
     elif args.command == 'search':
         # 검색
+        if args.queries_file:
+            search_batch(args)
+            return
         if not args.query:
             print("검색어를 입력해주세요.")
             return
         
-        db = SNDatabase()
-        results = db.search(args.query)
+        db = open_database(args)
+        results = db.search(args.query, args.n_results)
+        
+        # 전체 문제 정보는 한 번에 가져오기
+        full = db.get_many(results['ids'][0])
         
         print(f"\n검색 결과 (쿼리: {args.query})")
         print("-" * 50)
@@ -493,8 +1154,7 @@ def main():
             print(f"   출처: {metadata.get('source', '')}")
             print(f"   유형: {metadata.get('type', '')}")
             
-            # 전체 문제 정보 가져오기
-            full_data = db.get_by_id(doc_id)
+            full_data = full.get(doc_id)
             if full_data:
                 print(f"   문제: {full_data.get('question', '')[:50]}...")
 
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+DB 구축 단계별 계측
+- 단계별 wall / CPU 시간(단계를 실행한 스레드의 CPU 시간), 처리량(items/sec), 단계 종료 시점 최대 RSS
+- OpenAI 임베딩 토큰 수 (응답 usage 기준)
+- 지정한 단계(hot stage) 하나만 cProfile 또는 pyinstrument 로 프로파일 덤프
+- 백그라운드 스레드는 thread(name) 로 얻은 별도 프로파일러에 기록 → 리포트의 threads 에 따로 표시
+- 구축 종료 시 JSON 리포트 저장
+
+환경변수
+- SN_PROFILE_DIR   : 리포트 저장 폴더 (기본 ./profiles, 빈 값이면 저장 안 함)
+- SN_PROFILE_STAGE : 프로파일할 단계명 (예: embed / score / write(쓰기 스레드), 미설정 시 생략)
+- SN_PROFILER      : cprofile(기본) | pyinstrument
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+PROFILE_DIR = os.environ.get("SN_PROFILE_DIR", "./profiles")
+PROFILE_STAGE = os.environ.get("SN_PROFILE_STAGE") or None
+PROFILER = os.environ.get("SN_PROFILER", "cprofile").lower()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """프로세스 최대 RSS(MB), 측정 불가 시 None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 는 KB, macOS 는 byte 단위
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:     # Windows
+        pass
+    try:
+        import psutil
+        mem = psutil.Process().memory_info()
+        return round(getattr(mem, "peak_wset", mem.rss) / 2 ** 20, 1)
+    except ImportError:
+        return None
+
+
+class StageProfiler:
+    """
+    with prof.stage("embed", items=len(docs)):
+        ...
+    prof.count("embed", tokens=n)   # 단계 안/밖에서 카운터 누적
+    writer = prof.thread("writer")  # 다른 스레드용 (단계 시간이 메인 스레드와 섞이지 않음)
+    prof.save()                     # JSON 리포트 경로 반환
+    """
+
+    def __init__(self, name: str, out_dir: Optional[str] = PROFILE_DIR,
+                 hot_stage: Optional[str] = PROFILE_STAGE, profiler: str = PROFILER):
+        self.name = name
+        self.out_dir = out_dir
+        self.hot_stage = hot_stage
+        self.profiler = profiler
+        self.meta: Dict = {}
+        self.stages: Dict[str, Dict] = {}
+        self.threads: Dict[str, "StageProfiler"] = {}
+        self._lock = threading.Lock()
+        self.started = time.strftime("%Y%m%d_%H%M%S")
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        self._dump = None
+
+    def _entry(self, name: str) -> Dict:
+        return self.stages.setdefault(
+            name, {"wall_s": 0.0, "cpu_s": 0.0, "items": 0, "tokens": 0})
+
+    def count(self, name: str, items: int = 0, tokens: int = 0):
+        with self._lock:
+            entry = self._entry(name)
+            entry["items"] += items
+            entry["tokens"] += tokens
+
+    def thread(self, name: str) -> "StageProfiler":
+        """name 스레드 전용 하위 프로파일러 (리포트 threads[name], 요약에는 따로 표시)"""
+        with self._lock:
+            child = self.threads.get(name)
+            if child is None:
+                child = self.threads[name] = StageProfiler(
+                    f"{self.name}_{name}", self.out_dir, self.hot_stage, self.profiler)
+                child.started = self.started
+            return child
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0):
+        with self._lock:
+            entry = self._entry(name)
+            entry["items"] += items
+        prof = self._start_profile() if name == self.hot_stage else None
+        # process_time 은 다른 스레드의 CPU 까지 더하므로 단계는 현재 스레드 기준으로 잰다
+        w0, c0 = time.perf_counter(), time.thread_time()
+        try:
+            yield entry
+        finally:
+            wall, cpu = time.perf_counter() - w0, time.thread_time() - c0
+            rss = peak_rss_mb()
+            with self._lock:
+                entry["wall_s"] += wall
+                entry["cpu_s"] += cpu
+                entry["peak_rss_mb"] = rss
+            if prof is not None:
+                self._stop_profile(prof, name)
+
+    # ── hot stage 프로파일 ─────────────────────
+    def _start_profile(self):
+        if self.profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("⚠️  pyinstrument 미설치 → cProfile 사용")
+            else:
+                prof = Profiler()
+                prof.start()
+                return prof
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+        return prof
+
+    def _stop_profile(self, prof, name: str):
+        base = self._path(name)
+        if base is None:
+            return
+        if hasattr(prof, "output_html"):    # pyinstrument
+            prof.stop()
+            self._dump = base + ".html"
+            with open(self._dump, "w", encoding="utf-8") as f:
+                f.write(prof.output_html())
+        else:
+            prof.disable()
+            self._dump = base + ".prof"     # python -m pstats / snakeviz 로 열람
+            prof.dump_stats(self._dump)
+        print(f"🔬  Profile of stage '{name}' → {self._dump}")
+
+    def _path(self, suffix: str) -> Optional[str]:
+        if not self.out_dir:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        return os.path.join(self.out_dir, f"{self.name}_{self.started}_{suffix}")
+
+    # ── 리포트 ─────────────────────────────────
+    def _stage_report(self) -> Dict:
+        stages = {}
+        with self._lock:
+            entries = {name: dict(e) for name, e in self.stages.items()}
+        for name, e in entries.items():
+            wall = e["wall_s"]
+            stages[name] = {
+                "wall_s": round(wall, 3),
+                "cpu_s": round(e["cpu_s"], 3),
+                "cpu_util": round(e["cpu_s"] / wall, 2) if wall else None,
+                "items": e["items"],
+                "items_per_s": round(e["items"] / wall, 2) if wall and e["items"] else None,
+                "tokens": e["tokens"] or None,
+                "peak_rss_mb": e.get("peak_rss_mb"),
+            }
+        return stages
+
+    def report(self) -> Dict:
+        stages = self._stage_report()
+        return {
+            "script": self.name,
+            "started": self.started,
+            "meta": self.meta,
+            "total": {
+                "wall_s": round(time.perf_counter() - self._t0, 3),
+                "cpu_s": round(time.process_time() - self._c0, 3),
+                "peak_rss_mb": peak_rss_mb(),
+                "tokens": sum(e["tokens"] for e in self.stages.values()) or None,
+            },
+            "stages": stages,
+            "threads": {name: child._stage_report() for name, child in self.threads.items()},
+            "profile_dump": self._dump or next(
+                (c._dump for c in self.threads.values() if c._dump), None),
+        }
+
+    def summary(self) -> str:
+        text = " | ".join(f"{k} {v['wall_s']:.2f}s" for k, v in list(self.stages.items()))
+        for name, child in self.threads.items():
+            text += f" ‖ {name}: {child.summary()}"
+        return text
+
+    def save(self) -> Optional[str]:
+        """JSON 리포트 저장 후 경로 반환 (SN_PROFILE_DIR 비었으면 None)"""
+        path = self._path("report.json")
+        if path is None:
+            return None
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        return path
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+문항 레코드 (추출기 · DB 구축 · GUI 공용)
+문항 JSON 을 __slots__ 객체 하나로 들고 다니며, 파생 값은 처음 쓰일 때 한 번만 계산해 캐시한다.
+
+- 원본 필드 : id, source, year, month, exam_type_code, subject_code, type,
+              passage, context_box, question, options, answer, answer_rate, difficulty
+              (그 밖의 키는 extra 에 보존, to_dict() 는 원래 키 순서 그대로 복원)
+- 파생 필드 : normalized_passage · group(passage_hash) · text(merge_text)
+              · reading_level(readability_kor) · pos_bits(Kiwi 품사 비트셋) · prompt_text
+- 원본 필드에 새 값을 대입하면 캐시된 파생 값은 모두 비워져 다음 접근 때 다시 계산된다.
+  (options 리스트를 제자리에서 고친 경우는 감지하지 못하므로 새 리스트를 대입할 것)
+- dict 처럼 get / [] / in / items 를 지원하므로 기존 dict 기반 함수에 그대로 넘길 수 있다.
+- load_record(path) : 파일 mtime 기준 캐시 (GUI 가 같은 JSON 을 반복해서 열지 않도록)
+"""
+
+import os
+import glob
+import json
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from sn_text import (group_key, pos_bits, bits_to_pos, pos_sets_batch,
+                     merge_text, readability_kor)
+
+FIELDS = ("id", "source", "year", "month", "exam_type_code", "subject_code", "type",
+          "passage", "context_box", "question", "options", "answer", "answer_rate", "difficulty")
+_FIELD_SET = frozenset(FIELDS)
+_set = object.__setattr__
+_CACHED = ("_normalized", "_group", "_text", "_reading_level", "_pos_bits", "_prompt")
+RECORD_CACHE_SIZE = int(os.environ.get("SN_RECORD_CACHE", "4096"))
+
+
+class QuestionRecord:
+    """문항 1개 (원본 필드 + 지연 계산·캐시되는 파생 값)"""
+
+    __slots__ = FIELDS + ("path", "extra", "_keys") + _CACHED
+
+    def __init__(self, fields: Dict, path: Optional[str] = None):
+        for name in FIELDS:
+            _set(self, name, fields.get(name))
+        _set(self, "path", path)
+        _set(self, "extra", {k: v for k, v in fields.items() if k not in _FIELD_SET})
+        _set(self, "_keys", tuple(fields))  # 원래 키 순서 (to_dict·metadata 용)
+        for name in _CACHED:
+            _set(self, name, None)
+
+    def __setattr__(self, name: str, value):
+        """원본 필드 대입 → 파생 값 캐시 무효화 (없던 키면 키 목록에 추가)"""
+        _set(self, name, value)
+        if name in _FIELD_SET:
+            for cached in _CACHED:
+                _set(self, cached, None)
+            if name not in self._keys:
+                _set(self, "_keys", self._keys + (name,))
+
+    @classmethod
+    def from_dict(cls, data: Dict, path: Optional[str] = None) -> "QuestionRecord":
+        return cls(data, path)
+
+    @classmethod
+    def coerce(cls, obj, path: Optional[str] = None) -> "QuestionRecord":
+        """레코드는 그대로, dict 는 레코드로 변환 (path 가 주어지면 갱신)"""
+        if isinstance(obj, cls):
+            if path is not None:
+                obj.path = path
+            return obj
+        return cls.from_dict(obj, path)
+
+    def to_dict(self) -> Dict:
+        """JSON 저장용 dict (원래 키 순서, 파생 값 제외)"""
+        return {k: self[k] for k in self._keys}
+
+    # ― dict 호환 ―
+    def __getitem__(self, key: str):
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key) if key in _FIELD_SET else self.extra[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def get(self, key: str, default=None):
+        return self[key] if key in self._keys else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._keys
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        return ((k, self[k]) for k in self._keys)
+
+    def __repr__(self) -> str:
+        return f"QuestionRecord({self.id!r}, path={self.path!r})"
+
+    # ― 파생 값 (처음 접근할 때 계산) ―
+    @property
+    def passage_text(self) -> str:
+        return self.passage or self.context_box or ""
+
+    @property
+    def normalized_passage(self) -> str:
+        """sn_text.canonical_passage 와 같은 값"""
+        if self._normalized is None:
+            self._normalized = " ".join(self.passage_text.split())
+        return self._normalized
+
+    @property
+    def group(self) -> str:
+        """sn_text.passage_hash 와 같은 값"""
+        if self._group is None:
+            self._group = group_key(self.normalized_passage)
+        return self._group
+
+    @property
+    def text(self) -> str:
+        """임베딩용 지문 + 문제 + 선택지 (sn_text.merge_text)"""
+        if self._text is None:
+            self._text = merge_text(self)
+        return self._text
+
+    @property
+    def reading_level(self) -> float:
+        if self._reading_level is None:
+            self._reading_level = readability_kor(self.passage_text)
+        return self._reading_level
+
+    @property
+    def pos_bits(self) -> int:
+        """지문 품사 비트셋 (여러 레코드는 fill_pos 로 한 번에)"""
+        if self._pos_bits is None:
+            fill_pos([self])
+        return self._pos_bits
+
+    @property
+    def pos_tags(self):
+        return bits_to_pos(self.pos_bits)
+
+    @property
+    def prompt_text(self) -> Optional[str]:
+        """생성 프롬프트용 '질문  1. 선택지 2. …' (질문이 없으면 None)"""
+        if self._prompt is None and self.question:
+            opt_str = " ".join(f"{opt.get('number')}. {opt.get('text')}"
+                               for opt in self.options or [])
+            self._prompt = f"{self.question}  {opt_str}"
+        return self._prompt
+
+    def metadata(self) -> Dict:
+        """벡터 DB 메타데이터 (sn_build.clean_metadata 와 같은 규칙)"""
+        meta = {}
+        for k, v in self.items():
+            if k in ("passage", "question", "options") or v is None:
+                continue
+            # primitive 타입만 허용
+            if isinstance(v, (str, int, float, bool)):
+                meta[k] = v
+        meta["group"] = self.group
+        if self.path is not None:
+            meta["file_path"] = self.path
+        return meta
+
+
+def fill_pos(records: Iterable[QuestionRecord]):
+    """아직 품사가 없는 레코드들의 품사 비트셋을 Kiwi 배치 한 번으로 채움 (같은 그룹은 1회 분석)"""
+    todo = [r for r in records if r._pos_bits is None]
+    if not todo:
+        return
+    tags = pos_sets_batch([r.passage_text for r in todo], [r.group for r in todo])
+    for record, tag_set in zip(todo, tags):
+        record._pos_bits = pos_bits(tag_set)
+
+
+# ── 파일 로드 ────────────────────────────────
+def read_record(path: str) -> QuestionRecord:
+    with open(path, encoding="utf-8") as f:
+        return QuestionRecord.from_dict(json.load(f), path)
+
+
+_loaded: "OrderedDict[str, Tuple[float, QuestionRecord]]" = OrderedDict()
+
+
+def load_record(path: str) -> Optional[QuestionRecord]:
+    """
+    JSON 파일 → 레코드 (mtime 이 같으면 캐시된 레코드와 파생 값 재사용, LRU)
+    파일이 없거나 읽을 수 없으면 None.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except (OSError, TypeError):
+        return None
+    hit = _loaded.get(path)
+    if hit and hit[0] == mtime:
+        _loaded.move_to_end(path)
+        return hit[1]
+    try:
+        record = read_record(path)
+    except (OSError, ValueError):
+        return None
+    _loaded[path] = (mtime, record)
+    if len(_loaded) > RECORD_CACHE_SIZE:
+        _loaded.popitem(last=False)
+    return record
+
+
+def record_from_meta(meta: Dict) -> Optional[QuestionRecord]:
+    """검색 결과 메타데이터의 file_path → 레코드 (없으면 None)"""
+    return load_record(meta.get("file_path")) if meta else None
+
+
+def prompt_from_meta(meta: Dict) -> Optional[str]:
+    """검색 결과 메타데이터 → 생성 프롬프트용 문항 문자열 (JSON 이 없으면 meta 의 question)"""
+    record = record_from_meta(meta)
+    return record.prompt_text if record else (meta or {}).get("question")
+
+
+def iter_records(src_dir: str) -> Iterator[QuestionRecord]:
+    """src_dir/*.json → 레코드 (question 없는 파일은 건너뜀)"""
+    for path in sorted(glob.glob(os.path.join(src_dir, "*.json"))):
+        record = read_record(path)
+        if not record.question:
+            print(f"⚠️  Skip {path} (missing question)")
+            continue
+        yield record
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+로컬 검색 서버 (asyncio HTTP, JSON)
+컬렉션·임베딩 모델·지문 그룹 색인을 프로세스에 상주시켜, CLI·GUI 가 매번
+chromadb.PersistentClient 와 SentenceTransformer 를 새로 띄우지 않도록 한다.
+
+엔드포인트 (POST, 본문·응답 모두 JSON)
+- /open    {db, collection}                         → {name, metadata, count}
+- /search  {db, collection, texts | embeddings, n_results, where?, include?}
+           → col.query 와 같은 모양 (texts 여러 개 = 배치 검색, 임베딩 1회 + 쿼리 1회)
+- /embed   {db, collection, texts}                  → {embeddings} (컬렉션 구축 모델로)
+- /get     {db, collection, ids? | where?, limit?, offset?, include?, full?}
+           → col.get 과 같은 모양 (full=true 면 원본 문항 JSON 을 items 로 함께 반환)
+- /group   {db, collection, groups}                 → {groups: {그룹: {ids, documents, metadatas}}}
+- /reload  {db, collection}                         → 컬렉션·그룹 색인 다시 열기 (재구축 후,
+                                                       쿼리·원본 문항 캐시도 비움)
+- GET /health                                       → {ok, collections}
+
+db 는 --preload / --allow-db 로 허용한 경로(기본 ./sn_csat.db, ./sn_csat_2.db)의
+이미 있는 디렉터리만 연다 (임의 경로에 PersistentClient 가 DB 를 만들지 않도록, 그 밖은 403).
+
+클라이언트
+- connect_collection(db, col): 서버가 떠 있으면 RemoteCollection(같은 query/get/count API),
+  아니면 sn_index.open_collection 으로 직접 연다 (GUI·CLI 는 이것만 바꾸면 얇은 클라이언트)
+- 연결은 http.client keep‑alive 로 재사용
+
+환경변수
+- SN_SERVER_URL : 서버 주소 (기본 http://127.0.0.1:8765)
+- SN_SERVER     : 0 이면 서버를 찾지 않고 항상 직접 연다
+
+사용 예:
+    python sn_server.py                                          # 127.0.0.1:8765
+    python sn_server.py --preload ./sn_csat_2.db:sn_csat_openai  # 시작 시 모델·컬렉션 로드
+"""
+
+import os
+import json
+import argparse
+import http.client
+from urllib.parse import urlparse
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 클라이언트(GUI·CLI)는 numpy 없이도 import 되도록 numpy·sn_embed·asyncio·sn_build(임베딩 백엔드)·
+# chromadb 는 서버 쪽·벡터를 다루는 메서드에서만 로드
+
+SERVER_URL = os.environ.get("SN_SERVER_URL", "http://127.0.0.1:8765")
+USE_SERVER = os.environ.get("SN_SERVER", "1") != "0"
+DEFAULT_INCLUDE = ("documents", "metadatas", "distances")
+DEFAULT_DBS = ("./sn_csat.db", "./sn_csat_2.db")
+
+
+def _jsonable(obj):
+    """json.dumps default: numpy 배열·스칼라 → 파이썬 값 (numpy 를 import 하지 않고 tolist 로)"""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"JSON 으로 변환할 수 없는 값: {type(obj).__name__}")
+
+
+# ── ❶ 서버 측 상주 상태 ─────────────────────────
+class RetrievalService:
+    """
+    (DB 경로, 컬렉션) 별로 컬렉션·쿼리 임베딩 백엔드·그룹 색인(group → ids)을 상주시킨다.
+    같은 모델을 쓰는 컬렉션은 임베딩 백엔드(모델 가중치)를 공유한다.
+    요청 처리는 서버의 단일 작업 스레드에서만 호출된다 (모델·컬렉션 접근 직렬화).
+    """
+
+    def __init__(self, backend: Optional[str] = None, query_max_tok: int = 256,
+                 json_dir: str = "./db", cache_size: int = 1024,
+                 allowed_dbs: Iterable[str] = DEFAULT_DBS):
+        from sn_embed import QueryCache
+        self.backend = backend
+        self.query_max_tok = query_max_tok
+        self.json_dir = json_dir
+        self.cache = QueryCache(cache_size)
+        self.allowed_dbs = {os.path.abspath(db) for db in allowed_dbs}
+        self._cols: Dict[Tuple[str, str], Dict] = {}
+        self._embedders: Dict[Tuple, object] = {}
+        self._records: Dict[str, Optional[dict]] = {}
+
+    # ― 컬렉션 ―
+    def _entry(self, req: Dict, reload: bool = False) -> Dict:
+        from sn_index import open_collection, with_chunk_index, ChunkedCollection
+        from sn_build import query_embedder
+        db, name = req.get("db"), req.get("collection")
+        if not db or not name:
+            raise ValueError("db 와 collection 을 지정하세요.")
+        key = (os.path.abspath(db), name)
+        if key[0] not in self.allowed_dbs:
+            raise PermissionError(f"허용되지 않은 DB 경로: {db} (--preload 또는 --allow-db 로 지정)")
+        if reload or key not in self._cols:
+            if not os.path.isdir(db):
+                raise ValueError(f"DB 디렉터리가 없습니다: {db}")
+            # {이름}_chunks 가 있으면 검색은 청크 → 부모 문항 집계 (query_parents)
+            col = with_chunk_index(open_collection(db, name, backend=self.backend), db, self.backend)
+            meta = col.metadata or {}
+            # 같은 모델·청크 설정이면 임베딩 백엔드 공유 (쿼리도 구축 때와 같은 청크 평균)
+            sig = tuple(meta.get(k) for k in ("embed_model", "embed_dim", "embed_max_tok",
+                                              "embed_chunker", "embed_chunk_overlap",
+                                              "embed_chunk_tokenizer"))
+            if sig[0] and sig not in self._embedders:
+                self._embedders[sig] = query_embedder(meta, self.cache, self.query_max_tok)
+            self._cols[key] = {"col": col, "embedder": self._embedders.get(sig),
+                               "sig": sig, "groups": None, "count": None}
+            chunks = f", chunks={col.chunk_col.count()}" if isinstance(col, ChunkedCollection) else ""
+            print(f"📂  Opened {db}:{name} ({col.count()} items{chunks}, "
+                  f"embed={sig[0] or 'collection'})")
+        return self._cols[key]
+
+    def _groups(self, entry: Dict) -> Dict[str, List[str]]:
+        """그룹 → ID 색인 (다른 프로세스가 추가해 항목 수가 바뀌면 다시 만든다)"""
+        col = entry["col"]
+        count = col.count()
+        if entry["groups"] is None or entry["count"] != count:
+            got = col.get(include=["metadatas"])
+            index: Dict[str, List[str]] = {}
+            for _id, meta in zip(got["ids"], got["metadatas"]):
+                if meta and meta.get("group"):
+                    index.setdefault(meta["group"], []).append(_id)
+            entry["groups"], entry["count"] = index, count
+        return entry["groups"]
+
+    # ― 엔드포인트 ―
+    def open(self, req: Dict) -> Dict:
+        entry = self._entry(req)
+        return {"name": entry["col"].name, "metadata": entry["col"].metadata or {},
+                "count": entry["col"].count()}
+
+    def reload(self, req: Dict) -> Dict:
+        """컬렉션을 다시 열고 쿼리 결과·원본 문항 캐시를 비운다 (재구축으로 내용이 바뀌었을 수 있음)"""
+        self._entry(req, reload=True)
+        self.cache.clear()
+        self._records.clear()
+        return self.open(req)
+
+    def embed(self, req: Dict) -> Dict:
+        entry = self._entry(req)
+        if entry["embedder"] is None:
+            raise ValueError("임베딩 모델 서명(embed_model)이 없는 컬렉션입니다.")
+        return {"embeddings": entry["embedder"].embed(list(req["texts"]))}
+
+    def search(self, req: Dict) -> Dict:
+        import numpy as np
+        entry = self._entry(req)
+        kwargs = {"n_results": int(req.get("n_results", 10)),
+                  "include": list(req.get("include") or DEFAULT_INCLUDE)}
+        if req.get("where"):
+            kwargs["where"] = req["where"]
+        if req.get("embeddings") is not None:
+            kwargs["query_embeddings"] = np.asarray(req["embeddings"], dtype=np.float32).tolist()
+        elif entry["embedder"] is not None:
+            kwargs["query_embeddings"] = entry["embedder"].embed(list(req["texts"])).tolist()
+        else:
+            kwargs["query_texts"] = list(req["texts"])
+        return entry["col"].query(**kwargs)
+
+    def get(self, req: Dict) -> Dict:
+        entry = self._entry(req)
+        col = entry["col"]
+        include = list(req.get("include") or ("documents", "metadatas"))
+        where = req.get("where")
+        ids = req.get("ids")
+        # 그룹 조회는 상주 색인으로 (where 전체 스캔 없이 ID 조회)
+        if ids is None and where and list(where) == ["group"] and isinstance(where["group"], str):
+            ids = self._groups(entry).get(where["group"], [])
+            where = None
+        kwargs = {"include": include}
+        for k, v in (("ids", ids), ("where", where), ("limit", req.get("limit")),
+                     ("offset", req.get("offset"))):
+            if v is not None:
+                kwargs[k] = v
+        if ids is not None and not ids:
+            got = {"ids": [], **{k: [] for k in include}}
+        else:
+            got = col.get(**kwargs)
+        got = dict(got)
+        if req.get("full"):
+            got["items"] = [self._record(_id, meta) for _id, meta in
+                            zip(got["ids"], got.get("metadatas") or [None] * len(got["ids"]))]
+        return got
+
+    def group(self, req: Dict) -> Dict:
+        entry = self._entry(req)
+        index = self._groups(entry)
+        out = {}
+        for g in req.get("groups", []):
+            ids = index.get(g, [])
+            got = entry["col"].get(ids=ids) if ids else {"ids": [], "documents": [], "metadatas": []}
+            out[g] = {"ids": got["ids"], "documents": got["documents"], "metadatas": got["metadatas"]}
+        return {"groups": out}
+
+    def health(self) -> Dict:
+        return {"ok": True, "collections": [f"{db}:{name}" for db, name in self._cols],
+                "cache": {"size": len(self.cache), "hits": self.cache.hits,
+                          "misses": self.cache.misses}}
+
+    def _record(self, _id: str, meta: Optional[Dict]) -> Optional[dict]:
+        """원본 문항 JSON (메타 file_path, 없으면 json_dir/{id}.json), 프로세스 내 캐시"""
+        if _id not in self._records:
+            path = (meta or {}).get("file_path") or os.path.join(self.json_dir, f"{_id}.json")
+            record = None
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    record = json.load(f)
+            self._records[_id] = record
+        return self._records[_id]
+
+
+# ── ❷ HTTP 서버 ───────────────────────────────
+ROUTES = {"/open": "open", "/reload": "reload", "/embed": "embed", "/search": "search",
+          "/get": "get", "/group": "group"}
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           500: "Internal Server Error"}
+
+
+async def _handle(service: RetrievalService, executor, reader, writer):
+    """한 연결에서 여러 요청을 순서대로 처리 (HTTP/1.1 keep‑alive)"""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            headers = {}
+            while True:
+                h = await reader.readline()
+                if h in (b"\r\n", b"\n", b""):
+                    break
+                k, _, v = h.decode("latin-1").partition(":")
+                headers[k.strip().lower()] = v.strip()
+
+            status, framed = 200, False
+            try:
+                parts = line.decode("latin-1").split()
+                if len(parts) < 2:
+                    raise ValueError(f"잘못된 요청 줄: {line[:80]!r}")
+                method, path = parts[:2]
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+                framed = True
+                if method == "GET" and path == "/health":
+                    payload = service.health()
+                elif method == "POST" and path in ROUTES:
+                    req = json.loads(body or b"{}")
+                    payload = await loop.run_in_executor(
+                        executor, getattr(service, ROUTES[path]), req)
+                else:
+                    status, payload = 404, {"error": f"{method} {path} 없음"}
+            except asyncio.IncompleteReadError:
+                raise
+            except PermissionError as e:
+                status, payload = 403, {"error": str(e)}
+            except (ValueError, KeyError, TypeError) as e:
+                status, payload = 400, {"error": f"{type(e).__name__}: {e}"}
+            except Exception as e:
+                status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+            data = json.dumps(payload, ensure_ascii=False, default=_jsonable).encode("utf-8")
+            writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                         f"Content-Type: application/json; charset=utf-8\r\n"
+                         f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+            await writer.drain()
+            # 요청 줄·길이를 읽지 못했으면 다음 요청 경계를 알 수 없으므로 연결 종료
+            if not framed or headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def serve(service: RetrievalService, host: str = "127.0.0.1", port: int = 8765):
+    """요청 처리는 작업 스레드 1개에서 직렬로 (I/O·연결 관리는 이벤트 루프)"""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    async def run():
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sn-server")
+        server = await asyncio.start_server(
+            lambda r, w: _handle(service, executor, r, w), host, port)
+        print(f"🚀  Serving on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("👋  Server stopped")
+
+
+# ── ❸ 클라이언트 ───────────────────────────────
+class SNClient:
+    """keep‑alive 연결 하나를 재사용하는 JSON 클라이언트 (끊긴 연결은 한 번 재연결)"""
+
+    def __init__(self, url: str = SERVER_URL, timeout: float = 60.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 8765
+        self.timeout = timeout
+        self._conn = None
+
+    def _request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        body = json.dumps(payload or {}, ensure_ascii=False, default=_jsonable).encode("utf-8")
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body if method == "POST" else None,
+                                   {"Content-Type": "application/json"})
+                res = self._conn.getresponse()
+                data = json.loads(res.read() or b"{}")
+                break
+            except (OSError, http.client.HTTPException):
+                self.close()
+                if attempt == 2:
+                    raise
+        if res.status != 200:
+            raise RuntimeError(f"검색 서버 오류 ({res.status}): {data.get('error')}")
+        return data
+
+    def call(self, path: str, **payload) -> Dict:
+        return self._request("POST", path, payload)
+
+    def health(self) -> Dict:
+        return self._request("GET", "/health")
+
+    def collection(self, db_path: str, name: str) -> "RemoteCollection":
+        return RemoteCollection(self, db_path, name)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class RemoteCollection:
+    """서버에 상주한 컬렉션을 Chroma Collection 처럼 쓰는 프록시 (query / get / count)"""
+
+    def __init__(self, client: SNClient, db_path: str, name: str):
+        self.client = client
+        self.db_path = db_path
+        self.name = name
+        info = self._call("/open")
+        self.metadata = info["metadata"]
+
+    def _call(self, path: str, **payload) -> Dict:
+        return self.client.call(path, db=self.db_path, collection=self.name, **payload)
+
+    def count(self) -> int:
+        return self._call("/open")["count"]
+
+    def query(self, query_embeddings=None, query_texts=None, n_results: int = 10,
+              where=None, include=DEFAULT_INCLUDE) -> Dict:
+        """query_texts 는 서버가 컬렉션 구축 모델로 한 번에 임베딩"""
+        payload = {"n_results": n_results, "include": list(include)}
+        if where:
+            payload["where"] = where
+        if query_embeddings is not None:
+            payload["embeddings"] = query_embeddings     # ndarray 도 _jsonable 이 변환
+        else:
+            payload["texts"] = list(query_texts)
+        return self._call("/search", **payload)
+
+    def get(self, ids=None, where=None, limit=None, offset=None,
+            include=("documents", "metadatas"), full: bool = False) -> Dict:
+        payload = {"include": list(include), "full": full}
+        for k, v in (("ids", ids), ("where", where), ("limit", limit), ("offset", offset)):
+            if v is not None:
+                payload[k] = list(v) if k == "ids" else v
+        return self._call("/get", **payload)
+
+    def embed(self, texts: List[str]):
+        """컬렉션 구축 모델로 임베딩 (float32 ndarray)"""
+        import numpy as np
+        return np.asarray(self._call("/embed", texts=list(texts))["embeddings"], dtype=np.float32)
+
+    def groups(self, groups: List[str]) -> Dict[str, Dict]:
+        """지문 그룹별 전체 문항 (서버의 그룹 색인 사용)"""
+        return self._call("/group", groups=list(groups))["groups"]
+
+
+_client: Optional[SNClient] = None
+_probed = False
+
+
+def get_client(url: str = SERVER_URL) -> Optional[SNClient]:
+    """서버가 떠 있으면 클라이언트, 아니면 None (프로세스당 한 번만 확인)"""
+    global _client, _probed
+    if not USE_SERVER:
+        return None
+    if not _probed:
+        _probed = True
+        probe = SNClient(url, timeout=0.5)
+        try:
+            probe.health()
+        except (OSError, http.client.HTTPException, RuntimeError, ValueError):
+            probe.close()
+        else:
+            probe.timeout = 60.0
+            probe.close()        # 짧은 타임아웃 연결은 닫고 다음 요청에서 다시 연결
+            _client = probe
+    return _client
+
+
+def connect_collection(db_path: str, name: str, backend: Optional[str] = None):
+    """
+    서버가 있으면 RemoteCollection, 없거나 서버가 열지 못하면 sn_index.open_collection
+    (둘 다 query / get / count / metadata 를 같은 모양으로 제공,
+    {이름}_chunks 청크 컬렉션이 있으면 어느 쪽이든 검색은 청크 → 부모 문항 집계)
+    """
+    client = get_client()
+    if client is not None:
+        try:
+            return client.collection(db_path, name)
+        except RuntimeError as e:
+            print(f"⚠️  검색 서버에서 컬렉션을 열지 못함 → 직접 연결: {e}")
+    from sn_index import open_collection, with_chunk_index
+    return with_chunk_index(open_collection(db_path, name, backend=backend), db_path, backend)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="수능 DB 로컬 검색 서버")
+    parser.add_argument("--host", default="127.0.0.1", help="바인드 주소 (기본: 로컬 전용)")
+    parser.add_argument("--port", type=int, default=urlparse(SERVER_URL).port or 8765,
+                        help="포트 (기본: SN_SERVER_URL 의 포트)")
+    parser.add_argument("--preload", nargs="*", default=[], metavar="DB:COL",
+                        help="시작 시 열어 둘 컬렉션 (임베딩 모델도 미리 로드)")
+    parser.add_argument("--index-backend", choices=["chroma", "numpy"],
+                        help="인덱스 백엔드 (기본: SN_INDEX_BACKEND)")
+    parser.add_argument("--query-max-tok", type=int, default=256,
+                        help="로컬 모델 청크 토큰 수 (컬렉션 메타데이터에 embed_max_tok 이 없을 때)")
+    parser.add_argument("--json-dir", default="./db", help="get full=true 시 원본 문항 JSON 폴더")
+    parser.add_argument("--allow-db", nargs="*", default=list(DEFAULT_DBS), metavar="DB",
+                        help="클라이언트가 열 수 있는 DB 경로 (--preload 의 DB 는 자동 포함)")
+    args = parser.parse_args(argv)
+
+    preload = [spec.rpartition(":")[::2] for spec in args.preload]
+    service = RetrievalService(args.index_backend, args.query_max_tok, args.json_dir,
+                               allowed_dbs=list(args.allow_db) + [db for db, _ in preload])
+    for db, name in preload:
+        entry = service._entry({"db": db, "collection": name})
+        service._groups(entry)
+        if entry["embedder"] is not None:
+            entry["embedder"].embed(["워밍업"])     # 모델 가중치 로드
+    serve(service, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+텍스트 전처리 공통 유틸
+- 지문 정규화 / 그룹 해시 (passage_hash)
+- 문항 병합 텍스트 (merge_text) · 간이 읽기 난이도 (readability_kor) · tiktoken 인코더
+- MinHash + LSH 근사 중복 지문 → 대표 그룹 (PDF 추출 잡음으로 해시만 다른 지문 통합)
+- Kiwi 형태소 분석기 (첫 사용 시 로드)
+- 지문 품사 집합 배치 계산 (멀티스레드, passage_hash 기준 중복 제거) · 품사 비트셋
+- Kiwi 문장 분리 배치 (줄바꿈도 문장 경계, 청크 분할용)
+
+환경변수
+- KIWI_WORKERS : Kiwi 내부 스레드 수 (기본 0 = 가용 코어 전부, 1 = 단일 스레드)
+- SN_NEAR_DUP  : 근사 중복 판정 Jaccard 임계값 (기본 0.8, 0 이면 비활성)
+"""
+
+import os
+import re
+import zlib
+import hashlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+KIWI_WORKERS = int(os.environ.get("KIWI_WORKERS", "0"))
+NEAR_DUP_THRESHOLD = float(os.environ.get("SN_NEAR_DUP", "0.8"))
+
+# ── 그룹 해시 생성 ─────────────────────────
+def canonical_passage(item: dict) -> str:
+    """passage 또는 context_box를 공백 1칸으로 정규화해 반환"""
+    txt = (item.get("passage") or item.get("context_box") or "")
+    return " ".join(txt.split())
+
+
+def passage_hash(item: dict, length: int = 12) -> str:
+    """
+    동일 지문이면 파일명이 달라도 동일 해시를 얻도록 SHA‑1 기반 그룹키 생성.
+    기본 12자(48bit) → 충돌 확률 1/2^48 ≈ 1.4e‑14
+    """
+    return group_key(canonical_passage(item), length)
+
+
+def group_key(canonical: str, length: int = 12) -> str:
+    """이미 정규화된 지문(canonical_passage 결과)의 그룹 해시"""
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:length]
+
+
+# ── 문항 텍스트 ─────────────────────────────
+def merge_text(item: dict) -> str:
+    """
+    지문 + 문제 + 선택지를 한 문자열로
+    None 이나 누락 필드는 빈 문자열로 처리해 오류를 방지한다.
+    """
+    passage = item.get("passage") or item.get("context_box") or ""
+    question = item.get("question") or ""
+    choices = " ".join(opt.get("text", "") for opt in item.get("options", []))
+    return f"{passage}\n{question}\n{choices}"
+
+
+def readability_kor(text: str) -> float:
+    """
+    간이 한국어 읽기 난이도 점수 (0=쉬움 → 1=어려움).
+    - 평균 문장 길이와 평균 어절(토큰) 길이를 결합.
+    - 필요에 따라 BLRD·AI-KLE 등 정식 지표로 교체 가능.
+    """
+    # 문장 분리
+    sents = re.split(r"[\.\\?!\\n]", text.strip())
+    sents = [s.strip() for s in sents if s.strip()]
+    if not sents:
+        return 0.0
+    # 평균 문장 길이(어절 수)
+    sent_lens = [len(sent.split()) for sent in sents]
+    avg_sent = sum(sent_lens) / len(sent_lens)
+    # 평균 어절 길이(음절 수)
+    words = text.split()
+    avg_word = sum(len(w) for w in words) / len(words) if words else 0
+    # 가중합 (조정 가능)
+    score = 0.6 * (avg_sent / 30) + 0.4 * (avg_word / 6)
+    # 0~1 로 클리핑
+    return round(min(max(score, 0), 1), 3)
+
+
+_enc = None   # tiktoken cl100k_base, 첫 사용 시 로드
+
+
+def get_encoder():
+    global _enc
+    if _enc is None:
+        import tiktoken
+        _enc = tiktoken.get_encoding("cl100k_base")
+    return _enc
+
+
+# ── 근사 중복 지문 (MinHash + LSH) ────────────
+_PRIME = (1 << 31) - 1     # a·x + b 가 uint64 안에서 넘치지 않도록 31bit 소수
+
+
+def dup_normalize(text: str) -> str:
+    """줄바꿈 하이픈 연결·공백을 모두 제거 (PDF 줄바꿈/띄어쓰기 차이 무시)"""
+    text = re.sub(r"-\s*\n\s*", "", text)
+    return re.sub(r"\s+", "", text)
+
+
+class NearDupIndex:
+    """
+    지문 문자 n‑gram MinHash 서명을 LSH 밴드 버킷에 넣어 근사 중복을 찾는다 (후보만 비교, 준선형).
+    처음 나온 지문이 대표가 되고, 이후 추정 Jaccard ≥ threshold 인 지문은 같은 대표 그룹으로 묶인다.
+    - num_perm=128, bands=32 (밴드당 4행) → Jaccard 0.8 쌍의 후보 검출 확률 ≈ 1
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, num_perm: int = 128,
+                 bands: int = 32, ngram: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm 은 bands 의 배수여야 합니다.")
+        self.threshold = threshold
+        self.bands = bands
+        self.ngram = ngram
+        import numpy as np   # 추출기 CLI 등 sn_text 만 쓰는 경로의 시작 시간에서 제외
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self._canon: Dict[str, str] = {}          # 그룹 해시 → 대표 그룹 해시
+        self._sigs: Dict[str, "np.ndarray"] = {}
+        self._buckets = defaultdict(list)         # (밴드, 밴드 값) → 그룹 해시들
+
+    def signature(self, text: str) -> Optional["np.ndarray"]:
+        """MinHash 서명 (n‑gram 이 없을 만큼 짧으면 None)"""
+        import numpy as np
+        norm = dup_normalize(text)
+        grams = {norm[i:i + self.ngram] for i in range(len(norm) - self.ngram + 1)}
+        if not grams:
+            return None
+        x = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams),
+                        dtype=np.uint64, count=len(grams)) % _PRIME
+        return ((self._a[:, None] * x[None, :] + self._b[:, None]) % _PRIME).min(axis=1) \
+            .astype(np.uint32)
+
+    def canonical(self, key: str, text: str) -> str:
+        """key(passage_hash) 의 대표 그룹 (처음 보는 key 면 색인에 추가)"""
+        if key in self._canon:
+            return self._canon[key]
+        sig = self.signature(text) if self.threshold > 0 else None
+        if sig is None:
+            self._canon[key] = key
+            return key
+        import numpy as np
+        bands = [(b, band.tobytes()) for b, band in enumerate(np.split(sig, self.bands))]
+        best, best_sim = None, self.threshold
+        for cand in {c for bk in bands for c in self._buckets.get(bk, ())}:
+            sim = float(np.mean(sig == self._sigs[cand]))
+            if sim >= best_sim:
+                best, best_sim = cand, sim
+        self._canon[key] = self._canon[best] if best else key
+        self._sigs[key] = sig
+        for bk in bands:
+            self._buckets[bk].append(key)
+        return self._canon[key]
+
+    def merged(self) -> int:
+        """대표가 아닌 다른 그룹으로 합쳐진 지문 수"""
+        return sum(k != v for k, v in self._canon.items())
+
+
+# ── 형태소 분석 ─────────────────────────────
+_kiwi = None  # Pure‑Python 형태소 분석기 (Java 불필요), 첫 사용 시 로드
+
+
+def get_kiwi():
+    global _kiwi
+    if _kiwi is None:
+        from kiwipiepy import Kiwi
+        _kiwi = Kiwi(num_workers=KIWI_WORKERS)
+    return _kiwi
+
+
+def pos_set(text: str) -> Set[str]:
+    "텍스트를 형태소 품사 시퀀스로 변환해 집합으로 반환"
+    return {tok.tag for tok in get_kiwi().tokenize(text)}
+
+
+# Kiwi 품사 태그 → 비트 위치 (문항 레코드에 집합 대신 int 하나로 보관)
+# 표에 없는 태그(Kiwi 버전 차이)는 처음 볼 때 새 비트를 받으므로 집합과 정확히 같은 정보를 담는다.
+# 새 태그의 비트 위치는 프로세스마다 다를 수 있어 비트셋은 저장하지 않고 프로세스 안에서만 쓴다.
+POS_TAGS = (
+    "NNG", "NNP", "NNB", "NR", "NP", "VV", "VA", "VX", "VCP", "VCN", "MM", "MAG", "MAJ", "IC",
+    "JKS", "JKC", "JKG", "JKO", "JKB", "JKV", "JKQ", "JX", "JC", "EP", "EF", "EC", "ETN", "ETM",
+    "XPN", "XSN", "XSV", "XSA", "XSM", "XR", "SF", "SP", "SS", "SSO", "SSC", "SE", "SO", "SW",
+    "SL", "SH", "SN", "SB", "UN", "W_URL", "W_EMAIL", "W_HASHTAG", "W_MENTION", "W_SERIAL",
+    "W_EMOJI", "Z_CODA", "Z_SIASTR", "USER0", "USER1", "USER2", "USER3", "USER4",
+    "VV-R", "VV-I", "VA-R", "VA-I", "VX-R", "VX-I", "XSA-R", "XSA-I",
+)
+_POS_BIT: Dict[str, int] = {tag: 1 << i for i, tag in enumerate(POS_TAGS)}
+
+
+def pos_bits(tags: Iterable[str]) -> int:
+    """품사 집합 → 비트셋 (처음 보는 태그는 다음 비트를 배정)"""
+    bits = 0
+    for tag in tags:
+        bit = _POS_BIT.get(tag)
+        if bit is None:
+            bit = _POS_BIT.setdefault(tag, 1 << len(_POS_BIT))
+        bits |= bit
+    return bits
+
+
+def bits_to_pos(bits: int) -> Set[str]:
+    """비트셋 → 품사 집합 (pos_bits 의 역, 같은 프로세스 안에서 정확히 복원)"""
+    return {tag for tag, bit in list(_POS_BIT.items()) if bits & bit}
+
+
+def pos_sets_batch(texts: List[str], keys: Optional[Iterable[str]] = None) -> List[Set[str]]:
+    """
+    여러 지문의 품사 집합을 한 번에 계산 (pos_set 을 하나씩 부른 것과 같은 결과)
+    - keys(예: passage_hash)가 같은 지문은 처음 나온 원문으로 한 번만 분석
+    - Kiwi 배치 tokenize 로 KIWI_WORKERS 스레드에서 병렬 분석
+    """
+    keys = list(keys) if keys is not None else list(texts)
+    first = {}
+    for key, text in zip(keys, texts):
+        first.setdefault(key, text)
+    todo = [(key, text) for key, text in first.items() if text.strip()]
+
+    tags = {}
+    if todo:
+        batches = get_kiwi().tokenize([text for _, text in todo])
+        for (key, _), tokens in zip(todo, batches):
+            tags[key] = {tok.tag for tok in tokens}
+    return [tags.get(key, set()) for key in keys]
+
+
+def split_sents_batch(texts: List[str]) -> List[List[str]]:
+    """
+    여러 문서를 Kiwi split_into_sents 로 문장 분리 (문서별 문장 문자열 리스트)
+    - 줄바꿈은 항상 경계로 보고 줄 단위로 나눈 뒤, 각 줄을 Kiwi 배치(KIWI_WORKERS)로 분리
+    - 빈 줄·공백 문장은 버림
+    """
+    owner, lines = [], []
+    for d, text in enumerate(texts):
+        for line in text.split("\n"):
+            if line.strip():
+                owner.append(d)
+                lines.append(line.strip())
+    sents: List[List[str]] = [[] for _ in texts]
+    if lines:
+        for d, found in zip(owner, get_kiwi().split_into_sents(lines)):
+            sents[d].extend(s.text.strip() for s in found if s.text.strip())
+    return sents